@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+文档转换进程池基准测试
+生成一批HTML文档，比较不同转换进程数下的吞吐（进程启动不计入），
+并测量重复提交命中转换缓存的耗时。需要安装 LibreOffice（soffice）
+
+用法: python benchmarks/bench_converter.py --docs 24 --workers 1,2,4
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'web_app'))
+
+import converter
+
+
+def make_documents(directory, count, tag):
+    """生成带标题、段落和表格的HTML文档；内容各不相同，避免命中缓存"""
+    paths = []
+    for number in range(count):
+        rows = ''.join(f'<tr><td>{tag}-{number}-{r}</td><td>{r * 17.5:.2f}</td></tr>' for r in range(40))
+        body = ''.join(f'<p>Paragraph {p} of document {tag}-{number}. ' + 'Lorem ipsum dolor sit amet. ' * 12 + '</p>'
+                       for p in range(30))
+        path = os.path.join(directory, f'{tag}_{number}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'<html><body><h1>Document {tag}-{number}</h1>{body}<table>{rows}</table></body></html>')
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文档转换进程池基准测试')
+    parser.add_argument('--docs', type=int, default=24, help='每种配置转换的文档数')
+    parser.add_argument('--workers', default='1,2,4', help='要测试的转换进程数，逗号分隔')
+    args = parser.parse_args()
+
+    if not converter.find_soffice():
+        raise SystemExit('未找到 soffice，请先安装 LibreOffice')
+
+    tmp = tempfile.mkdtemp()
+    # 使用独立的缓存目录，不影响 uploads/ 中的缓存
+    converter.CACHE_DIR = os.path.join(tmp, 'cache')
+    try:
+        mode = 'uno' if converter._uno_available() else 'cli'
+        print(f'CPU核数: {os.cpu_count()}, 转换方式: {mode}, 每轮文档数: {args.docs}')
+        print(f"{'进程数':>6} {'耗时(s)':>9} {'文档/秒':>8} {'加速比':>7}")
+        baseline = None
+        for workers in [int(w) for w in args.workers.split(',')]:
+            pool = converter.ConverterPool(size=workers)
+            # 预热：启动全部进程
+            wait([pool.submit(p) for p in make_documents(tmp, workers, f'warm{workers}')])
+            documents = make_documents(tmp, args.docs, f'w{workers}')
+            started = time.monotonic()
+            futures = [pool.submit(p) for p in documents]
+            wait(futures)
+            elapsed = time.monotonic() - started
+            failed = sum(1 for f in futures if f.exception())
+            baseline = baseline or elapsed
+            print(f'{workers:>6} {elapsed:>9.2f} {args.docs / elapsed:>8.2f} {baseline / elapsed:>7.2f}'
+                  + (f'  ({failed} 个失败)' if failed else ''))
+
+            started = time.monotonic()
+            wait([pool.submit(p) for p in documents])
+            print(f'{"":>6} 重复提交（命中缓存）: {time.monotonic() - started:.3f}s')
+            pool.shutdown()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+多进程页面分片基准测试
+生成多页合成文档（多帧TIFF），用固定延迟的模拟模型代替真实API调用，
+比较不同工作进程数下的总耗时，得到分片的扩展曲线
+
+用法: python benchmarks/bench_sharding.py --pages 48 --workers 1,2,4 --concurrency 8
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'zerox', 'py_zerox'))
+sys.path.insert(0, os.path.join(ROOT, 'web_app'))
+
+from PIL import Image, ImageDraw
+
+import ocr_pipeline
+import sharding
+
+# 模拟模型的单次调用延迟（秒），由 --latency 设置，通过环境变量传给工作进程
+LATENCY_ENV = 'BENCH_MODEL_LATENCY'
+
+
+async def fake_complete(model, messages, on_delta=None):
+    """模拟模型调用：固定延迟加少量抖动；on_delta 不为空时分段回调输出"""
+    latency = float(os.environ.get(LATENCY_ENV, '0.5'))
+    await asyncio.sleep(latency * random.uniform(0.9, 1.1))
+    text = '# Page\n\nSimulated markdown output. ' * 20
+    if on_delta:
+        for start in range(0, len(text), 64):
+            on_delta(text[start:start + 64])
+    return text, 1000, 400
+
+
+def install_fake_model():
+    """在当前进程（以及工作进程启动时）替换模型调用"""
+    ocr_pipeline._complete = fake_complete
+
+
+def make_document(path, pages):
+    """生成多页合成文档：200DPI的Letter页面，写满文本行和一张表格"""
+    frames = []
+    for number in range(1, pages + 1):
+        image = Image.new('RGB', (1700, 2200), 'white')
+        draw = ImageDraw.Draw(image)
+        draw.text((150, 120), f'PAGE {number}', fill='black')
+        for line in range(60):
+            y = 200 + line * 28
+            width = random.randint(900, 1400)
+            for x in range(150, 150 + width, 60):
+                draw.rectangle((x, y, x + random.randint(20, 50), y + 12), fill='black')
+        for row in range(8):
+            draw.line((150, 1950 + row * 25, 1550, 1950 + row * 25), fill='black', width=2)
+        frames.append(image)
+    frames[0].save(path, save_all=True, append_images=frames[1:], compression='tiff_lzw')
+
+
+async def run_once(file_path, output_dir, workers, concurrency):
+    started = time.monotonic()
+    result = await ocr_pipeline.run_pipeline(
+        file_path=file_path,
+        model='gpt-4o-mini',
+        output_dir=output_dir,
+        concurrency=concurrency,
+        skip_blank_duplicates=False,
+        hedge=False,
+        workers=workers,
+    )
+    return time.monotonic() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程页面分片基准测试')
+    parser.add_argument('--pages', type=int, default=48, help='合成文档页数')
+    parser.add_argument('--workers', default='1,2,4', help='要测试的工作进程数，逗号分隔')
+    parser.add_argument('--concurrency', type=int, default=8, help='总并发额度')
+    parser.add_argument('--latency', type=float, default=0.5, help='模拟模型调用延迟（秒）')
+    parser.add_argument('--repeat', type=int, default=2, help='每种配置重复次数，取最快一次')
+    args = parser.parse_args()
+
+    os.environ[LATENCY_ENV] = str(args.latency)
+    install_fake_model()
+    sharding.worker_initializer = install_fake_model
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, 'bench.tiff')
+        print(f'生成 {args.pages} 页合成文档...')
+        make_document(file_path, args.pages)
+
+        print(f'CPU核数: {os.cpu_count()}, 总并发: {args.concurrency}, 模拟延迟: {args.latency}s')
+        print(f"{'进程数':>6} {'耗时(s)':>9} {'页/秒':>8} {'加速比':>7}")
+        baseline = None
+        for workers in [int(w) for w in args.workers.split(',')]:
+            output_dir = os.path.join(tmp, f'out_{workers}')
+            if workers > 1:
+                # 预热进程池，启动开销不计入结果
+                asyncio.run(run_once(file_path, output_dir, workers, args.concurrency))
+            best = min(asyncio.run(run_once(file_path, output_dir, workers, args.concurrency))[0]
+                       for _ in range(args.repeat))
+            baseline = baseline or best
+            print(f'{workers:>6} {best:>9.2f} {args.pages / best:>8.1f} {baseline / best:>7.2f}')
+
+    sharding.shutdown_executors()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Web应用冷启动基准测试
+在新进程中启动Web应用，测量导入 app 的耗时、从启动进程到 /api/status 首次响应的耗时，
+并检查启动时是否已加载OCR引擎；--warmup 时再测量后台预热完成（/api/ready?engine=1 返回200）的耗时
+
+用法: python benchmarks/bench_startup.py --repeat 5 [--warmup] [--top 10]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+import urllib.error
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEB_APP = os.path.join(ROOT, 'web_app')
+
+# 子进程：导入 app 后报告导入耗时和已加载的引擎模块，然后开始监听
+CHILD = """
+import sys, time, json
+started = time.perf_counter()
+sys.path.insert(0, {web_app!r})
+import app
+print(json.dumps({{'import_seconds': time.perf_counter() - started,
+                  'engine_imported': 'litellm' in sys.modules}}), flush=True)
+app.app.run(host='127.0.0.1', port={port}, debug=False, use_reloader=False)
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, started, timeout, expect=200):
+    """轮询直到返回 expect 状态码，返回距 started 的秒数"""
+    while time.monotonic() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == expect:
+                    return time.monotonic() - started
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            pass
+        time.sleep(0.005)
+    return None
+
+
+def run_once(warmup, timeout):
+    port = free_port()
+    env = dict(os.environ, ZEROX_WARMUP='1' if warmup else '0')
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, '-c', CHILD.format(web_app=WEB_APP, port=port)],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        report = json.loads(process.stdout.readline() or '{}')
+        base = f'http://127.0.0.1:{port}'
+        report['first_status'] = wait_for(f'{base}/api/status', started, timeout)
+        if warmup:
+            report['engine_ready'] = wait_for(f'{base}/api/ready?engine=1', started, timeout)
+        return report
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def slowest_imports(top):
+    """python -X importtime 中累计耗时最多的模块"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import sys; sys.path.insert(0, {WEB_APP!r}); import app'],
+        cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def fmt(value):
+    return f'{value:.2f}' if value is not None else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web应用冷启动基准测试')
+    parser.add_argument('--repeat', type=int, default=5, help='启动次数，报告中位数')
+    parser.add_argument('--warmup', action='store_true', help='开启后台预热并测量引擎就绪耗时')
+    parser.add_argument('--timeout', type=float, default=60, help='单次等待上限（秒）')
+    parser.add_argument('--top', type=int, default=0, help='列出累计导入耗时最多的模块')
+    args = parser.parse_args()
+
+    print(f"{'次数':>4} {'导入app(s)':>11} {'首次status(s)':>14} {'引擎就绪(s)':>12} {'启动时已加载引擎':>16}")
+    runs = []
+    for index in range(args.repeat):
+        report = run_once(args.warmup, args.timeout)
+        runs.append(report)
+        print(f"{index + 1:>4} {fmt(report.get('import_seconds')):>11} {fmt(report.get('first_status')):>14} "
+              f"{fmt(report.get('engine_ready')):>12} {'是' if report.get('engine_imported') else '否':>16}")
+
+    for key, label in (('import_seconds', '导入app'), ('first_status', '首次status'), ('engine_ready', '引擎就绪')):
+        values = [r[key] for r in runs if r.get(key) is not None]
+        if values:
+            print(f'{label}中位数: {statistics.median(values):.2f}s')
+
+    if args.top:
+        print(f'\n累计导入耗时最多的 {args.top} 个模块:')
+        for micros, name in slowest_imports(args.top):
+            print(f'{micros / 1000:>10.1f}ms  {name}')
+
+
+if __name__ == '__main__':
+    main()
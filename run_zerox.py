@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Zerox OCR 命令行入口
+PDF和图片走页级流水线（每页写入断点，失败后可用 --resume 续跑），其余格式交给zerox转换
+"""
+
+import os
+import sys
+import json
+import uuid
+import shutil
+import asyncio
+import argparse
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 添加Zerox OCR包和Web应用模块到路径
+sys.path.insert(0, os.path.join(ROOT, 'zerox', 'py_zerox'))
+sys.path.insert(0, os.path.join(ROOT, 'web_app'))
+
+from ocr_pipeline import run_pipeline, resume_pipeline, supports_pipeline, PipelineError
+from job_queue import create_queue
+from scheduler import LANES, DEFAULT_LANE
+from settings import UPLOAD_FOLDER, apply_config_to_env
+
+
+def parse_pages(value):
+    """解析页码参数，如 1,3,5-8"""
+    if not value:
+        return None
+    pages = []
+    for part in value.split(','):
+        if '-' in part:
+            start, end = part.split('-', 1)
+            pages.extend(range(int(start), int(end) + 1))
+        else:
+            pages.append(int(part))
+    return pages
+
+
+def job_output_dir(output, file):
+    """每个文件使用输出目录下的独立子目录，避免断点和分片清理覆盖其他文件的结果"""
+    name = os.path.basename(file.split('?', 1)[0].rstrip('/')) or 'document'
+    return os.path.join(output, name.replace('.', '_'))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Zerox OCR 命令行工具')
+    parser.add_argument('file', nargs='?', help='要处理的文件路径或URL')
+    parser.add_argument('--model', default='gemini/gemini-1.5-flash', help='使用的模型')
+    parser.add_argument('--output', default='./output_test',
+                        help='输出目录，每个文件的结果写入以文件名命名的子目录')
+    parser.add_argument('--concurrency', type=int, default=10, help='并发页数')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='页面分片的工作进程数，并发额度在进程间平分')
+    parser.add_argument('--pages', help='只处理指定页面，如 1,3,5-8')
+    parser.add_argument('--maintain-format', action='store_true', help='保持跨页格式（顺序处理）')
+    parser.add_argument('--text-layer', choices=['off', 'hybrid', 'prompt'], default='off',
+                        help='PDF文本层快速通道')
+    parser.add_argument('--routing', action='store_true', help='按页面复杂度路由模型')
+    parser.add_argument('--resume', action='store_true',
+                        help='续跑失败的任务，只重新处理缺失或失败的页面；'
+                             '指定文件时续跑其子目录，否则 --output 为任务目录')
+    parser.add_argument('--enqueue', action='store_true',
+                        help='提交到共享任务队列，由工作进程处理（文件会复制到上传目录，工作进程须能访问同一目录）')
+    parser.add_argument('--queue', help='队列URL，默认读取 ZEROX_QUEUE_URL 或使用输出目录中的 jobs.db')
+    parser.add_argument('--priority', choices=LANES, default=DEFAULT_LANE,
+                        help='提交到队列时的优先级通道（直接运行时不排队）')
+    parser.add_argument('--client', help='公平调度使用的客户端标识，默认为当前用户名')
+    parser.add_argument('--schema', metavar='NAME|FILE',
+                        help='结构化提取：已保存的Schema名称或JSON Schema文件，只输出其中的字段')
+    parser.add_argument('--estimate', nargs='*', metavar='MODEL',
+                        help='只预估耗时、Token和调用次数，不处理；可列出多个模型对比，默认使用 --model')
+    return parser.parse_args()
+
+
+def load_schema_arg(value):
+    """--schema 参数：.json 文件读取为Schema，否则按已保存的名称读取"""
+    from extraction import load_schema, check_schema
+
+    if not value:
+        return None
+    if value.endswith('.json') and os.path.exists(value):
+        with open(value, 'r', encoding='utf-8') as f:
+            return check_schema(json.load(f))
+    return load_schema(value)
+
+
+def enqueue(args):
+    """把文件复制到上传目录并提交到共享队列"""
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    file_id = f"{uuid.uuid4().hex}_{os.path.basename(args.file)}"
+    shutil.copyfile(args.file, os.path.join(UPLOAD_FOLDER, file_id))
+    options = {
+        'maintain_format': args.maintain_format,
+        'concurrency': args.concurrency,
+        'select_pages': parse_pages(args.pages),
+        'text_layer': args.text_layer,
+        'routing': args.routing,
+        'workers': args.workers,
+        'priority': args.priority,
+    }
+    if args.schema:
+        # 名称由工作进程读取，文件内容随任务一起提交
+        options['schema'] = load_schema_arg(args.schema) if args.schema.endswith('.json') else args.schema
+    queue = create_queue(args.queue)
+    client = args.client or os.environ.get('USER') or os.environ.get('USERNAME')
+    return queue.enqueue({'file_id': file_id, 'model_id': args.model, 'options': options},
+                         lane=args.priority, client=client)
+
+
+def estimate(args):
+    """打印各模型的预估耗时、Token和调用次数"""
+    from estimator import estimate_file
+
+    options = {
+        'concurrency': args.concurrency,
+        'select_pages': parse_pages(args.pages),
+        'text_layer': args.text_layer,
+        'maintain_format': args.maintain_format,
+    }
+    summary, estimates = estimate_file(args.file, args.estimate or [args.model], options)
+    print(f"📄 {summary['page_count']} 页, 含文本层 {len(summary['text_layer_pages'])} 页, "
+          f"扫描页 {len(summary['scanned_pages'])} 页")
+    print(f"{'模型':<28}{'耗时(秒)':>14}{'输入Token':>12}{'输出Token':>12}{'调用':>8}")
+    for model, e in estimates.items():
+        seconds = f"{e['seconds_fast']:.0f}-{e['seconds']:.0f}"
+        basis = '' if e['history_samples'] else '  (无历史数据，按默认值估算)'
+        print(f"{model:<28}{seconds:>14}{e['input_tokens']:>12}{e['output_tokens']:>12}{e['api_calls']:>8}{basis}")
+
+
+async def main(args):
+    if args.resume:
+        return await resume_pipeline(args.job_output)
+
+    if not args.file:
+        raise SystemExit('请指定要处理的文件')
+
+    options = {
+        'file_path': args.file,
+        'model': args.model,
+        'output_dir': args.job_output,
+        'maintain_format': args.maintain_format,
+        'concurrency': args.concurrency,
+        'select_pages': parse_pages(args.pages),
+    }
+    if not supports_pipeline(args.file):
+        if args.schema:
+            raise SystemExit('结构化提取仅支持PDF和图片文件')
+        from pyzerox.core.zerox import zerox
+        return await zerox(**options)
+    return await run_pipeline(text_layer=args.text_layer, routing=args.routing,
+                              workers=args.workers, extraction_schema=load_schema_arg(args.schema),
+                              **options)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    args.job_output = job_output_dir(args.output, args.file) if args.file else args.output
+    # 与Web应用和工作进程一样，环境变量未设置的API密钥取自 config.json
+    apply_config_to_env()
+    if args.estimate is not None:
+        if not args.file:
+            raise SystemExit('请指定要预估的文件')
+        try:
+            estimate(args)
+        except ValueError as e:
+            raise SystemExit(f'❌ {e}')
+        sys.exit(0)
+
+    if args.enqueue:
+        if not args.file:
+            raise SystemExit('请指定要处理的文件')
+        job = enqueue(args)
+        print(f"✅ 已提交到队列: 任务 {job.id}（优先级 {job.lane}）")
+        sys.exit(0)
+
+    try:
+        result = asyncio.run(main(args))
+    except PipelineError as e:
+        print(f"❌ {e}")
+        print(f"已完成的页面已保存，运行 python run_zerox.py --output {args.job_output} --resume 续跑失败的页面")
+        sys.exit(1)
+
+    print(f"✅ 处理完成: {len(result.pages)} 页, 用时 {result.completion_time / 1000:.1f}s")
+    print(f"   输入Token: {result.input_tokens}, 输出Token: {result.output_tokens}")
+    print(f"   输出目录: {args.job_output}")
+    extraction = result.stats.get('extraction') if hasattr(result, 'stats') else None
+    if extraction:
+        print(f"   提取字段{'（校验通过）' if extraction['valid'] else '（校验未通过）'}:")
+        for name, value in extraction['fields'].items():
+            source = extraction['pages'].get(name)
+            print(f"     {name}: {json.dumps(value, ensure_ascii=False)}" + (f"  [页 {source}]" if source else ''))
+        for error in extraction['errors']:
+            print(f"   ⚠️  {error}")
@@ -63,8 +63,13 @@ def run_ocr():
         print("⚠️  未设置API密钥，请先设置")
         return
     
+    file_path = input("请输入要处理的文件路径或URL: ").strip()
+    if not file_path:
+        print("⚠️  未指定文件")
+        return
+    
     try:
-        result = subprocess.run([sys.executable, "run_zerox.py"], 
+        result = subprocess.run([sys.executable, "run_zerox.py", file_path], 
                               capture_output=True, text=True)
         print(result.stdout)
         if result.stderr:
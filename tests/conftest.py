@@ -0,0 +1,7 @@
+"""测试直接导入 web_app 下的模块（与 Web 应用的运行方式一致）"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'web_app'))
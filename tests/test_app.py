@@ -0,0 +1,107 @@
+"""Web接口"""
+
+import io
+import os
+import asyncio
+import zipfile
+
+import pytest
+
+import app as web_app
+import jobs
+import profiling
+from ocr_pipeline import PipelineResult
+
+ADMIN = {'X-Admin-Token': 'secret'}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    outputs = tmp_path / 'outputs'
+    outputs.mkdir()
+    monkeypatch.setattr(web_app, 'OUTPUT_FOLDER', str(outputs))
+    monkeypatch.setattr(jobs, 'OUTPUT_FOLDER', str(outputs))
+    monkeypatch.setenv('ZEROX_ADMIN_TOKEN', 'secret')
+    web_app.app.config['TESTING'] = True
+    with web_app.app.test_client() as client:
+        yield client
+
+
+def test_export_rejects_paths_outside_output_folder(client, tmp_path):
+    secret = tmp_path / 'evil'
+    secret.mkdir()
+    (secret / 'secret.md').write_text('secret', encoding='utf-8')
+
+    for file_id in (str(secret), '../evil'):
+        response = client.post('/api/export', json={'file_ids': [file_id]})
+        archive = zipfile.ZipFile(io.BytesIO(response.data))
+        assert archive.namelist() == ['EMPTY.txt']
+    response = client.get('/api/export', query_string={'file_ids': f'{secret},../evil'})
+    assert zipfile.ZipFile(io.BytesIO(response.data)).namelist() == ['EMPTY.txt']
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    """不调用模型：处理参数直接指向输出目录，OCR写一份Markdown"""
+    def build_process_options(file_id, model_id, options):
+        return {'output_dir': jobs.output_dir_for(file_id)}, True
+
+    async def run_ocr(process_options, use_pipeline, on_event=None):
+        await asyncio.sleep(0.12)
+        with open(os.path.join(process_options['output_dir'], 'doc.md'), 'w', encoding='utf-8') as f:
+            f.write('# ok')
+        return PipelineResult(completion_time=1, file_name='doc', input_tokens=1, output_tokens=1, pages=[])
+
+    monkeypatch.setattr(web_app, 'build_process_options', build_process_options)
+    monkeypatch.setattr(web_app, 'run_ocr', run_ocr)
+    monkeypatch.setattr(web_app.engine, 'load', lambda: None)
+    monkeypatch.setattr(web_app, 'get_api_key_for_model', lambda model_id: 'key')
+    uploads = os.path.join(os.path.dirname(jobs.OUTPUT_FOLDER), 'uploads')
+    os.makedirs(uploads)
+    open(os.path.join(uploads, 'doc.pdf'), 'wb').close()
+    monkeypatch.setattr(web_app, 'UPLOAD_FOLDER', uploads)
+    os.makedirs(jobs.output_dir_for('doc.pdf'), exist_ok=True)
+
+
+@pytest.mark.parametrize('route', ['/api/process', '/api/process/stream', '/api/jobs'])
+@pytest.mark.parametrize('request_profile', [
+    {'headers': {'X-Zerox-Profile': '1'}},
+    {'headers': {'X-Zerox-Profile': '1', 'X-Admin-Token': 'wrong'}},
+    {'options': {'profile': True}},
+])
+def test_profiling_requires_admin(client, fake_ocr, route, request_profile):
+    body = {'file_id': 'doc.pdf', 'model_id': 'gpt-4o-mini', 'options': request_profile.get('options', {})}
+    response = client.post(route, json=body, headers=request_profile.get('headers', {}))
+    assert response.status_code == 403
+
+
+def test_sync_process_profile_report(client, fake_ocr):
+    response = client.post('/api/process', json={'file_id': 'doc.pdf', 'model_id': 'gpt-4o-mini'},
+                           headers={'X-Zerox-Profile': '1', **ADMIN})
+    profile = response.get_json()['result']['profile']
+    assert profile['duration'] >= 0.1 and 'peak_mb' in profile
+
+    url = f'/api/results/doc.pdf/profiles/{profile["id"]}'
+    assert client.get(url).status_code == 403
+    report = client.get(url, headers=ADMIN).get_json()['profile']
+    assert report['job_id'] == profile['id'] and report['error'] is None
+    assert report['cprofile']['by_cumulative']
+    assert report['loop_lag']['samples'] >= 1
+    assert report['tasks']['samples'] >= 1
+    assert set(report['memory']) >= {'peak_mb', 'end_mb', 'end_top'}
+    pstats = client.get(url, headers=ADMIN, query_string={'format': 'pstats'})
+    assert pstats.status_code == 200 and pstats.data
+    assert client.get('/api/results/doc.pdf/profiles/..', headers=ADMIN).status_code in (400, 404)
+
+
+def test_no_profiling_by_default(client, fake_ocr, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('未开启剖析时不应创建剖析器')
+
+    monkeypatch.setattr(web_app, 'JobProfiler', fail)
+    monkeypatch.setattr(profiling, '_start_tracemalloc', fail)
+    response = client.post('/api/process', json={'file_id': 'doc.pdf', 'model_id': 'gpt-4o-mini'},
+                           headers=ADMIN)
+    result = response.get_json()['result']
+    assert 'profile' not in result
+    assert not os.path.exists(os.path.join(jobs.output_dir_for('doc.pdf'), profiling.PROFILE_DIR))
@@ -0,0 +1,56 @@
+"""页级断点保存"""
+
+import json
+
+import pytest
+
+import checkpoint
+from checkpoint import CheckpointStore
+from ocr_pipeline import PageResult
+
+
+def test_pages_and_manifest_round_trip(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    store.save_manifest({'model': 'm'}, status='running')
+    store.update_manifest(status='completed')
+    store.save_page(PageResult(page=2, content='二', model='m', input_tokens=3))
+    store.save_page(PageResult(page=1, content='一', model='m'))
+
+    assert store.load_manifest() == {'options': {'model': 'm'}, 'status': 'completed'}
+    pages = store.load_pages()
+    assert sorted(pages) == [1, 2]
+    assert pages[2]['content'] == '二' and pages[2]['input_tokens'] == 3
+
+
+def test_interrupted_write_keeps_previous_page(tmp_path, monkeypatch):
+    store = CheckpointStore(str(tmp_path))
+    store.save_page(PageResult(page=1, content='old'))
+
+    def crash(data, f, **kwargs):
+        f.write('{"page": 1, "con')
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(checkpoint.json, 'dump', crash)
+    with pytest.raises(KeyboardInterrupt):
+        store.save_page(PageResult(page=1, content='new'))
+    monkeypatch.undo()
+
+    # 半个临时文件不会替换已有的断点，也不会被当成页面读取
+    assert store.load_pages()[1]['content'] == 'old'
+    assert (tmp_path / 'pages' / 'page_00001.json.tmp').exists()
+
+
+def test_corrupt_pages_are_skipped(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    store.save_page(PageResult(page=1, content='ok'))
+    (tmp_path / 'pages' / 'page_00002.json').write_text('{"page": 2, "con', encoding='utf-8')
+    (tmp_path / 'pages' / 'page_00003.json').write_text(json.dumps({'content': 'x'}), encoding='utf-8')
+    assert sorted(store.load_pages()) == [1]
+
+
+def test_reset_clears_pages(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    store.save_page(PageResult(page=1, content='ok'))
+    store.reset()
+    assert store.load_pages() == {}
+    assert not store.exists()
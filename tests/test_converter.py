@@ -0,0 +1,85 @@
+"""文档转换缓存：淘汰时跳过正在使用的结果，结果被淘汰后重新转换"""
+
+import os
+from concurrent.futures import Future
+
+import pytest
+
+import converter
+from converter import ConverterPool, ConversionError
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(converter, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(converter, 'CONVERTED_DIR', str(tmp_path / 'converted'))
+    os.makedirs(converter.CACHE_DIR)
+    return tmp_path
+
+
+def _cache_file(pool, digest, size, mtime):
+    path = pool._cache_path(digest)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def test_prune_skips_pinned_and_inflight(dirs):
+    pool = ConverterPool(cache_max_bytes=150)
+    oldest = _cache_file(pool, 'a' * 64, 100, 1000)
+    inflight = _cache_file(pool, 'b' * 64, 100, 1001)
+    newest = _cache_file(pool, 'c' * 64, 100, 1002)
+    pool._pin('a' * 64, 1)
+    pool._inflight['b' * 64] = Future()
+
+    pool._prune_cache()
+    assert os.path.exists(oldest)
+    assert os.path.exists(inflight)
+    # 受保护的结果跳过后仍超过上限，淘汰其余最早使用的
+    assert not os.path.exists(newest)
+
+    pool._pin('a' * 64, -1)
+    assert pool._pinned == {}
+
+
+def test_convert_reconverts_when_cache_entry_vanishes(dirs, monkeypatch):
+    source = dirs / 'report.docx'
+    source.write_bytes(b'docx')
+    pool = ConverterPool()
+    present = _cache_file(pool, 'd' * 64, 10, 1000)
+    results = iter([str(dirs / 'cache' / 'missing.pdf'), present])
+    monkeypatch.setattr(pool, 'submit', lambda path: _done(next(results)))
+
+    target = pool.convert(str(source))
+    assert target == converter.converted_path(str(source))
+    assert open(target, 'rb').read() == b'x' * 10
+    assert pool._pinned == {}
+
+
+def test_convert_gives_up_after_second_miss(dirs, monkeypatch):
+    source = dirs / 'report.docx'
+    source.write_bytes(b'docx')
+    pool = ConverterPool()
+    monkeypatch.setattr(pool, 'submit', lambda path: _done(str(dirs / 'cache' / 'missing.pdf')))
+    with pytest.raises(ConversionError):
+        pool.convert(str(source))
+    assert pool._pinned == {}
+
+
+def test_apply_config_ignores_unknown_and_invalid(capsys):
+    pool = ConverterPool()
+    pool.apply_config({'workers': 4, 'timeout': 'slow', 'cache_max_mb': 10, 'pool_size': 8})
+    assert pool.size == 4
+    assert pool.timeout == converter.CONVERT_TIMEOUT
+    assert pool.cache_max_bytes == 10 * 1024 * 1024
+    out = capsys.readouterr().out
+    assert 'pool_size' in out and 'timeout' in out
+    pool.apply_config(['workers'])
+    assert pool.size == 4
@@ -0,0 +1,46 @@
+"""单页统计与处理预估"""
+
+import multiprocessing
+from types import SimpleNamespace
+
+import pytest
+
+from estimator import UsageStats, _estimate_options
+
+PROCESSES = 4
+ROUNDS = 25
+
+
+def _record(path, worker):
+    stats = UsageStats(path, window=1000)
+    for index in range(ROUNDS):
+        page = SimpleNamespace(model=f'm{worker}', status='ok', input_tokens=index, output_tokens=1, latency=0.5)
+        stats.record_pages([page])
+
+
+def test_concurrent_processes_keep_all_samples(tmp_path):
+    path = tmp_path / 'usage_stats.json'
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_record, args=(path, worker)) for worker in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+
+    stats = UsageStats(path, window=1000)
+    for worker in range(PROCESSES):
+        assert stats.summary(f'm{worker}')['samples'] == ROUNDS
+
+
+def test_estimate_options_whitelist():
+    options = _estimate_options({'concurrency': '4', 'hedge': False, 'model_id': 'x', 'pages': [1],
+                                 'select_pages': [1, 2]})
+    assert options == {'concurrency': 4, 'hedge': False, 'select_pages': [1, 2]}
+    assert _estimate_options(None) == {}
+
+
+@pytest.mark.parametrize('options', [['concurrency'], {'concurrency': 'many'}, {'maintain_format': 'yes'}])
+def test_estimate_options_invalid(options):
+    with pytest.raises(ValueError):
+        _estimate_options(options)
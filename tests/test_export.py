@@ -0,0 +1,92 @@
+"""批量导出处理结果"""
+
+import io
+import os
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from export import ExportError, parse_date, select_results, stream_zip
+from checkpoint import CheckpointStore
+from result_pages import PageLines, write_markdown
+
+
+def _result(output_folder, name, pages=2, mtime=None, random_text=False):
+    path = os.path.join(output_folder, name)
+    results = [
+        SimpleNamespace(page=n, content=f'{name} {n}' + (os.urandom(1024).hex() if random_text else ''),
+                        model='m', status='ok', input_tokens=1, output_tokens=1, latency=0.1, cache='')
+        for n in range(1, pages + 1)
+    ]
+    md_path = write_markdown(path, name, results)
+    CheckpointStore(path).save_manifest({'model': 'm'}, status='completed')
+    if mtime:
+        os.utime(md_path, (mtime, mtime))
+    return path
+
+
+def _unzip(results, **kwargs):
+    return zipfile.ZipFile(io.BytesIO(b''.join(stream_zip(results, **kwargs))))
+
+
+def test_select_by_id_query_and_date(tmp_path):
+    folder = str(tmp_path)
+    _result(folder, 'a_report_pdf', mtime=parse_date('2024-03-01') + 60)
+    _result(folder, 'b_invoice_pdf', mtime=parse_date('2024-03-05') + 60)
+    os.makedirs(tmp_path / 'empty_dir')
+
+    names = lambda **kw: sorted(name for name, _, _ in select_results(folder, **kw))
+    assert names() == ['a_report_pdf', 'b_invoice_pdf']
+    assert names(file_ids=['b_invoice.pdf', 'missing.pdf']) == ['b_invoice_pdf']
+    assert names(query='REPORT') == ['a_report_pdf']
+    assert names(date_from=parse_date('2024-03-02'), date_to=parse_date('2024-03-05', end=True)) == \
+        ['b_invoice_pdf']
+
+
+def test_zip_contents(tmp_path):
+    path = _result(str(tmp_path), 'doc_pdf')
+    archive = _unzip(select_results(str(tmp_path)), include_pages=True, include_trace=True)
+    data_name = os.path.basename(PageLines(path).open().path)
+    assert sorted(archive.namelist()) == sorted([
+        'doc_pdf/doc_pdf.md', 'doc_pdf/pages.idx', f'doc_pdf/{data_name}',
+        'doc_pdf/job.json', 'doc_pdf/page_index.json',
+    ])
+    assert archive.read('doc_pdf/doc_pdf.md').decode('utf-8') == 'doc_pdf 1\n\ndoc_pdf 2'
+    assert archive.testzip() is None
+
+
+def test_zip_streams_in_chunks(tmp_path):
+    # 随机内容压缩不掉，数据按块陆续产出而不是最后一次性产出
+    _result(str(tmp_path), 'big_pdf', pages=100, random_text=True)
+    chunks = list(stream_zip(select_results(str(tmp_path)), include_pages=True, chunk_size=1024))
+    assert len(chunks) > 5
+    assert zipfile.ZipFile(io.BytesIO(b''.join(chunks))).testzip() is None
+
+
+def test_empty_export(tmp_path):
+    assert _unzip(select_results(str(tmp_path))).namelist() == ['EMPTY.txt']
+
+
+def test_bad_date():
+    with pytest.raises(ExportError):
+        parse_date('2024/03/01')
+
+
+@pytest.mark.parametrize('file_id', ['/tmp/evil', '../evil', 'a/../../evil', '..\\evil', ''])
+def test_file_ids_cannot_leave_output_folder(tmp_path, file_id):
+    outside = tmp_path / 'outside'
+    _result(str(outside), 'evil')
+    _result(str(outside), 'tmp')
+    folder = tmp_path / 'outputs'
+    folder.mkdir()
+    file_id = file_id.replace('/tmp/evil', str(outside / 'evil'))
+    assert list(select_results(str(folder), file_ids=[file_id])) == []
+
+
+def test_file_ids_reject_symlink_out_of_folder(tmp_path):
+    _result(str(tmp_path / 'outside'), 'secret')
+    folder = tmp_path / 'outputs'
+    folder.mkdir()
+    os.symlink(tmp_path / 'outside' / 'secret', folder / 'link')
+    assert list(select_results(str(folder), file_ids=['link'])) == []
@@ -0,0 +1,139 @@
+"""结构化字段提取"""
+
+import sys
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from extraction import (
+    SchemaError, _coerce, _validate_subset, check_schema, load_schema, merge_pages, parse_page, validate,
+)
+
+SCHEMA = {
+    'type': 'object',
+    'required': ['invoice_number', 'total'],
+    'properties': {
+        'invoice_number': {'type': 'string', 'pattern': '^INV-'},
+        'issue_date': {'type': 'string', 'format': 'date'},
+        'currency': {'type': 'string', 'enum': ['AUD', 'USD']},
+        'total': {'type': 'number', 'minimum': 0},
+        'paid': {'type': 'boolean'},
+        'line_items': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'required': ['description'],
+                'properties': {'description': {'type': 'string'}, 'amount': {'type': 'number'},
+                               'quantity': {'type': 'integer'}},
+            },
+        },
+    },
+}
+
+
+def _page(number, content, status='ok'):
+    return SimpleNamespace(page=number, content=content if isinstance(content, str) else json.dumps(content),
+                           status=status)
+
+
+@pytest.fixture
+def fallback(monkeypatch):
+    """模拟未安装 jsonschema，使用内置的常用关键字校验"""
+    monkeypatch.setitem(sys.modules, 'jsonschema', None)
+
+
+def test_valid_document(fallback):
+    value = {'invoice_number': 'INV-1', 'issue_date': '2024-03-01', 'currency': 'AUD', 'total': 10.5,
+             'paid': False, 'line_items': [{'description': 'x', 'amount': 1, 'quantity': 2}]}
+    assert validate(value, SCHEMA) == []
+
+
+@pytest.mark.parametrize('value, error', [
+    ({'invoice_number': 'INV-1'}, '$.total: 缺少必填字段'),
+    ({'invoice_number': 5, 'total': 1}, '$.invoice_number: 应为 string'),
+    ({'invoice_number': 'X-1', 'total': 1}, '$.invoice_number: 不匹配 ^INV-'),
+    ({'invoice_number': 'INV-1', 'total': 1, 'issue_date': '01/03/2024'}, '$.issue_date: 日期格式应为 YYYY-MM-DD'),
+    ({'invoice_number': 'INV-1', 'total': 1, 'currency': 'EUR'}, "$.currency: 不在可选值 ['AUD', 'USD'] 中"),
+    ({'invoice_number': 'INV-1', 'total': -1}, '$.total: 小于 0'),
+    ({'invoice_number': 'INV-1', 'total': True}, '$.total: 应为 number'),
+    ({'invoice_number': 'INV-1', 'total': 1, 'paid': 1}, '$.paid: 应为 boolean'),
+    ({'invoice_number': 'INV-1', 'total': 1, 'line_items': [{'quantity': 1.5}]},
+     '$.line_items[0].description: 缺少必填字段'),
+])
+def test_fallback_validator_errors(fallback, value, error):
+    assert error in validate(value, SCHEMA)
+
+
+def test_integer_rejects_float():
+    assert _validate_subset(1.5, {'type': 'integer'}, '$') == ['$: 应为 integer']
+    assert _validate_subset(None, {'type': ['string', 'null']}, '$') == []
+
+
+def test_full_validator_when_installed():
+    pytest.importorskip('jsonschema')
+    errors = validate({'invoice_number': 'INV-1', 'total': 'x'}, SCHEMA)
+    assert len(errors) == 1 and errors[0].startswith('$.total')
+
+
+@pytest.mark.parametrize('value, prop, expected', [
+    ('$1,234.50', {'type': 'number'}, 1234.5),
+    ('AUD -20.00', {'type': 'number'}, -20.0),
+    ('3', {'type': 'integer'}, 3),
+    ('2.5', {'type': 'integer'}, 2.5),
+    ('n/a', {'type': 'number'}, 'n/a'),
+    ('$5', {'type': 'string'}, '$5'),
+    (['$1', '2'], {'type': 'array', 'items': {'type': 'number'}}, [1.0, 2.0]),
+    ({'amount': '€7', 'note': '7'}, {'type': 'object', 'properties': {'amount': {'type': 'number'}}},
+     {'amount': 7.0, 'note': '7'}),
+])
+def test_coerce(value, prop, expected):
+    assert _coerce(value, prop) == expected
+
+
+def test_parse_page_strips_fences():
+    assert parse_page('```json\n{"total": 1}\n```') == {'total': 1}
+    assert parse_page('```\n{"total": 2}```') == {'total': 2}
+    assert parse_page('  ') == {}
+    with pytest.raises(ValueError):
+        parse_page('[1, 2]')
+    with pytest.raises(ValueError):
+        parse_page('{"total": ')
+
+
+def test_merge_pages(fallback):
+    pages = [
+        _page(1, {'invoice_number': 'INV-7', 'total': None, 'line_items': [{'description': 'a', 'amount': '$1'}]}),
+        _page(2, '', status='blank'),
+        _page(3, 'not json'),
+        _page(4, {'invoice_number': 'INV-8', 'total': '$1,000', 'currency': '',
+                  'line_items': [{'description': 'b'}, {'description': 'c'}]}),
+        _page(5, {'invoice_number': 'INV-9'}, status='duplicate'),
+    ]
+    merged = merge_pages(pages, SCHEMA)
+    # 标量取最先出现的非空值，数组按页拼接并逐项记录来源页
+    assert merged['fields']['invoice_number'] == 'INV-7'
+    assert merged['fields']['total'] == 1000.0
+    assert merged['fields']['currency'] is None
+    assert [item['description'] for item in merged['fields']['line_items']] == ['a', 'b', 'c']
+    assert merged['fields']['line_items'][0]['amount'] == 1.0
+    assert merged['pages'] == {'invoice_number': 1, 'total': 4, 'line_items': [1, 4, 4]}
+    assert list(merged['page_errors']) == [3]
+    assert merged['errors'] == []
+    assert merged['valid'] is False
+
+
+def test_merge_reports_missing_required(fallback):
+    merged = merge_pages([_page(1, {'invoice_number': 'INV-1'})], SCHEMA)
+    assert merged['errors'] == ['$.total: 缺少必填字段']
+    assert not merged['valid']
+
+
+def test_schema_checks():
+    with pytest.raises(SchemaError):
+        check_schema({'type': 'array'})
+    with pytest.raises(SchemaError):
+        check_schema({'type': 'object', 'properties': {}})
+    with pytest.raises(SchemaError):
+        load_schema('../invoice')
+    assert 'total' in json.dumps(load_schema('invoice'))
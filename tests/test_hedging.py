@@ -0,0 +1,123 @@
+"""对冲请求与故障转移"""
+
+import asyncio
+
+import pytest
+
+import hedging
+import settings
+from hedging import CallMetrics, LatencyTracker, hedged_call, resilient_call, is_failover_error
+from settings import get_failover_model
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'status {status_code}')
+        self.status_code = status_code
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = LatencyTracker()
+    monkeypatch.setattr(hedging, 'latency_tracker', tracker)
+    monkeypatch.setattr(hedging, 'MIN_HEDGE_DELAY', 0.01)
+    return tracker
+
+
+def _warm(tracker, model, seconds=0.02, count=hedging.MIN_SAMPLES):
+    for _ in range(count):
+        tracker.record(model, seconds)
+
+
+def test_percentile_needs_samples():
+    tracker = LatencyTracker()
+    for value in range(1, 11):
+        tracker.record('m', value / 10)
+    assert tracker.percentile('m', 0.5, min_samples=20) is None
+    assert tracker.percentile('m', 0.5, min_samples=1) == 0.6
+    assert tracker.percentile('m', 0.95, min_samples=1) == 1.0
+
+
+def test_slow_primary_is_hedged(tracker):
+    _warm(tracker, 'm')
+    started, cancelled = [], []
+
+    async def call(model):
+        started.append(model)
+        try:
+            await asyncio.sleep(1.0 if len(started) == 1 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+        return f'{model}#{len(started)}'
+
+    job = CallMetrics()
+    result, model = asyncio.run(hedged_call(call, 'm', hedge_model='backup', job_metrics=job))
+    assert (result, model) == ('backup#2', 'backup')
+    assert started == ['m', 'backup'] and cancelled == ['m']
+    counts = job.snapshot()
+    assert (counts['calls'], counts['hedged'], counts['hedge_wins']) == (1, 1, 1)
+
+
+def test_no_hedge_without_history(tracker):
+    calls = []
+
+    async def call(model):
+        calls.append(model)
+        await asyncio.sleep(0.05)
+        return 'ok'
+
+    assert asyncio.run(hedged_call(call, 'cold', job_metrics=CallMetrics())) == ('ok', 'cold')
+    assert calls == ['cold']
+
+
+def test_failover_on_provider_error(tracker):
+    async def call(model):
+        if model == 'primary':
+            raise ProviderError(503)
+        return model
+
+    job = CallMetrics()
+    assert asyncio.run(resilient_call(call, 'primary', failover_model='backup', job_metrics=job)) == \
+        ('backup', 'backup')
+    counts = job.snapshot()
+    assert (counts['failovers'], counts['failover_success'], counts['errors']) == (1, 1, 1)
+
+
+def test_client_errors_do_not_fail_over(tracker):
+    async def call(model):
+        raise ProviderError(400)
+
+    with pytest.raises(ProviderError):
+        asyncio.run(resilient_call(call, 'primary', failover_model='backup', job_metrics=CallMetrics()))
+
+
+def test_failover_error_classification():
+    assert is_failover_error(asyncio.TimeoutError())
+    assert is_failover_error(ProviderError(429))
+    assert is_failover_error(Exception('RESOURCE_EXHAUSTED: quota'))
+    assert not is_failover_error(ValueError('bad request'))
+
+
+@pytest.fixture
+def config(monkeypatch):
+    cfg = {}
+    monkeypatch.setattr(settings, 'load_config', lambda: cfg)
+    for env in ('OPENAI_API_KEY', 'GEMINI_API_KEY', 'AZURE_API_KEY'):
+        monkeypatch.setenv(env, 'key')
+    return cfg
+
+
+def test_no_failover_by_default(config):
+    # 其他提供商的密钥存在也不会自动转移
+    assert get_failover_model('gemini/gemini-1.5-flash') is None
+    assert get_failover_model('gpt-4o-mini') is None
+
+
+def test_failover_from_config_or_options(config, monkeypatch):
+    config['failover'] = {'gemini': 'gpt-4o-mini'}
+    assert get_failover_model('gemini/gemini-1.5-flash') == 'gpt-4o-mini'
+    assert get_failover_model('gemini/gemini-1.5-flash', 'azure/gpt-4o') == 'azure/gpt-4o'
+    assert get_failover_model('gpt-4o', 'gpt-4o') is None
+    monkeypatch.delenv('OPENAI_API_KEY')
+    assert get_failover_model('gemini/gemini-1.5-flash') is None
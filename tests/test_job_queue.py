@@ -0,0 +1,129 @@
+"""共享任务队列：SQLite 后端和 Redis 协议后端（fakeredis 替身）行为一致"""
+
+import time
+
+import pytest
+
+from job_queue import (
+    SQLiteJobQueue, RedisJobQueue, STATUS_QUEUED, STATUS_RUNNING, STATUS_COMPLETED, STATUS_FAILED,
+)
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def make_queue(request, tmp_path):
+    """按参数创建队列的工厂；同一测试内多次调用共享同一份存储"""
+    if request.param == 'sqlite':
+        path = str(tmp_path / 'jobs.db')
+        return lambda **kwargs: SQLiteJobQueue(path, **kwargs)
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    return lambda **kwargs: RedisJobQueue(client=fakeredis.FakeRedis(server=server, decode_responses=True),
+                                          **kwargs)
+
+
+def test_enqueue_lease_complete(make_queue):
+    queue = make_queue()
+    job = queue.enqueue({'file_id': 'a.pdf'}, lane='bulk', client='c1')
+    assert queue.get(job.id).status == STATUS_QUEUED
+
+    leased = queue.lease('w1')
+    assert leased.id == job.id
+    assert leased.status == STATUS_RUNNING
+    assert leased.attempts == 1
+    assert leased.lease_owner == 'w1'
+    assert leased.payload == {'file_id': 'a.pdf'}
+    assert queue.lease('w2') is None
+
+    assert queue.complete(job.id, 'w1', {'pages': 3})
+    done = queue.get(job.id)
+    assert done.status == STATUS_COMPLETED
+    assert done.result == {'pages': 3}
+    assert done.lease_owner is None
+
+
+def test_heartbeat_extends_lease(make_queue):
+    queue = make_queue(visibility_timeout=0.2)
+    job = queue.enqueue({})
+    queue.lease('w1')
+    first = queue.get(job.id).lease_expires
+    time.sleep(0.05)
+    assert queue.heartbeat(job.id, 'w1')
+    assert queue.get(job.id).lease_expires > first
+    # 只有租约持有者能续期和提交
+    assert not queue.heartbeat(job.id, 'w2')
+    assert not queue.complete(job.id, 'w2', {})
+
+
+def test_expired_lease_is_reclaimed(make_queue):
+    queue = make_queue()
+    job = queue.enqueue({})
+    queue.lease('w1', visibility_timeout=0.05)
+    time.sleep(0.1)
+
+    leased = queue.lease('w2')
+    assert leased.id == job.id
+    assert leased.attempts == 2
+    assert leased.lease_owner == 'w2'
+    # 旧工作进程的结果不会覆盖新租约
+    assert not queue.complete(job.id, 'w1', {'stale': True})
+    assert queue.complete(job.id, 'w2', {'fresh': True})
+    assert queue.get(job.id).result == {'fresh': True}
+
+
+def test_expired_lease_past_max_attempts_fails(make_queue):
+    queue = make_queue(max_attempts=1)
+    job = queue.enqueue({})
+    queue.lease('w1', visibility_timeout=0.05)
+    time.sleep(0.1)
+
+    assert queue.lease('w2') is None
+    failed = queue.get(job.id)
+    assert failed.status == STATUS_FAILED
+    assert failed.error
+
+
+def test_fail_retries_until_max_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    job = queue.enqueue({})
+
+    queue.lease('w1')
+    assert queue.fail(job.id, 'w1', 'boom', retry=True)
+    assert queue.get(job.id).status == STATUS_QUEUED
+
+    assert queue.lease('w1').attempts == 2
+    assert queue.fail(job.id, 'w1', 'boom again', retry=True)
+    failed = queue.get(job.id)
+    assert failed.status == STATUS_FAILED
+    assert failed.error == 'boom again'
+    assert queue.lease('w1') is None
+
+
+def test_fail_without_retry(make_queue):
+    queue = make_queue()
+    job = queue.enqueue({})
+    queue.lease('w1')
+    assert queue.fail(job.id, 'w1', 'bad options', retry=False)
+    assert queue.get(job.id).status == STATUS_FAILED
+    assert queue.get(job.id).attempts == 1
+
+
+def test_shared_storage_across_instances(make_queue):
+    # 两个队列实例（如两个节点）看到同一份任务
+    producer, consumer = make_queue(), make_queue()
+    job = producer.enqueue({'n': 1})
+    assert consumer.lease('w1').id == job.id
+    assert consumer.complete(job.id, 'w1', {'ok': True})
+    assert producer.get(job.id).status == STATUS_COMPLETED
+
+
+def test_lane_depths_and_list(make_queue):
+    queue = make_queue()
+    first = queue.enqueue({}, lane='bulk')
+    time.sleep(0.01)
+    second = queue.enqueue({}, lane='interactive')
+    depths = queue.lane_depths()
+    assert depths.get('bulk') == 1
+    assert depths.get('interactive') == 1
+    assert [job.id for job in queue.list_jobs()] == [second.id, first.id]
+    # 交互通道权重更高，先被领取
+    assert queue.lease('w1').id == second.id
@@ -0,0 +1,38 @@
+"""页级流水线"""
+
+import asyncio
+
+import ocr_pipeline
+from checkpoint import CheckpointStore
+from ocr_pipeline import PageResult, PipelineJob
+
+
+def test_resume_scans_only_pending_pages(tmp_path, monkeypatch):
+    checkpoint = CheckpointStore(str(tmp_path))
+    for number in (1, 2, 3):
+        checkpoint.save_page(PageResult(page=number, content=f'page {number}', model='m'))
+
+    scanned, dispatched = [], []
+
+    def scan_pages(file_path, page_numbers):
+        scanned.extend(page_numbers)
+        return [5], {}
+
+    async def dispatch(page_numbers, completed):
+        dispatched.extend(page_numbers)
+        return [PageResult(page=n, content=f'page {n}', model='m') for n in page_numbers], {}
+
+    monkeypatch.setattr(ocr_pipeline.page_cache, 'page_count', lambda file_path: 5)
+    monkeypatch.setattr(ocr_pipeline, 'scan_pages', scan_pages)
+    monkeypatch.setattr(ocr_pipeline.usage_stats, 'record_pages', lambda pages, kind=None: None)
+
+    job = PipelineJob('doc.pdf', 'gpt-4o-mini', str(tmp_path), checkpoint=checkpoint, resume=True)
+    monkeypatch.setattr(job, '_dispatch', dispatch)
+    result = asyncio.run(job.run())
+
+    # 已完成的页面不再渲染扫描，也不再调用模型
+    assert scanned == [4, 5]
+    assert dispatched == [4]
+    assert [(p.page, p.status) for p in result.pages] == \
+        [(1, 'ok'), (2, 'ok'), (3, 'ok'), (4, 'ok'), (5, 'blank')]
+    assert result.stats['resumed_pages'] == [1, 2, 3]
@@ -0,0 +1,81 @@
+"""上传时的预渲染缓存"""
+
+import sys
+import types
+import threading
+
+from PIL import Image
+
+import ocr_pipeline
+import page_cache as cache_module
+from page_cache import PageCache, cached_render, _render_batch
+
+
+def _setup(monkeypatch, tmp_path):
+    cache = PageCache()
+    monkeypatch.setattr(cache_module, 'page_cache', cache)
+    file_path = str(tmp_path / 'doc.pdf')
+    cache.register(file_path, 10)
+    return cache, file_path
+
+
+def test_render_batch_pages_are_inflight(monkeypatch, tmp_path):
+    cache, file_path = _setup(monkeypatch, tmp_path)
+    started, proceed = threading.Event(), threading.Event()
+    batches, single = [], []
+
+    def convert_from_path(path, dpi, first_page, last_page):
+        batches.append((first_page, last_page))
+        started.set()
+        proceed.wait(5)
+        return [Image.new('L', (10, 10), n) for n in range(first_page, last_page + 1)]
+
+    monkeypatch.setitem(sys.modules, 'pdf2image', types.SimpleNamespace(convert_from_path=convert_from_path))
+    monkeypatch.setattr(ocr_pipeline, 'render_page', lambda *args: single.append(args))
+
+    warm = threading.Thread(target=_render_batch, args=(file_path, [1, 2, 3]))
+    warm.start()
+    assert started.wait(5)
+    # 预渲染进行中，处理任务请求同一页时等待本批结果
+    result = {}
+    request = threading.Thread(target=lambda: result.setdefault('image', cached_render(file_path, 2)))
+    request.start()
+    request.join(0.2)
+    assert request.is_alive()
+    proceed.set()
+    warm.join(5)
+    request.join(5)
+
+    assert batches == [(1, 3)]
+    assert single == []
+    assert result['image'].getpixel((0, 0)) == 2
+    assert cache.snapshot()['entries'] == 3
+
+
+def test_render_batch_skips_cached_and_inflight_pages(monkeypatch, tmp_path):
+    cache, file_path = _setup(monkeypatch, tmp_path)
+    batches = []
+
+    def convert_from_path(path, dpi, first_page, last_page):
+        batches.append((first_page, last_page))
+        return [Image.new('L', (10, 10), n) for n in range(first_page, last_page + 1)]
+
+    monkeypatch.setitem(sys.modules, 'pdf2image', types.SimpleNamespace(convert_from_path=convert_from_path))
+    cache.put('render', file_path, (3, ocr_pipeline.RENDER_DPI), Image.new('L', (10, 10), 99), 100)
+    images = _render_batch(file_path, [1, 2, 3, 4, 5])
+    assert batches == [(1, 2), (4, 5)]
+    assert [image.getpixel((0, 0)) for image in images] == [1, 2, 99, 4, 5]
+
+
+def test_failed_batch_releases_waiters(monkeypatch, tmp_path):
+    cache, file_path = _setup(monkeypatch, tmp_path)
+
+    def convert_from_path(path, dpi, first_page, last_page):
+        raise RuntimeError('poppler missing')
+
+    monkeypatch.setitem(sys.modules, 'pdf2image', types.SimpleNamespace(convert_from_path=convert_from_path))
+    try:
+        _render_batch(file_path, [1, 2])
+    except RuntimeError:
+        pass
+    assert cache.claim('render', file_path, [(1, ocr_pipeline.RENDER_DPI)]) == [(1, ocr_pipeline.RENDER_DPI)]
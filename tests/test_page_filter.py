@@ -0,0 +1,50 @@
+"""空白页与重复页预扫描"""
+
+import sys
+import types
+
+from PIL import Image, ImageDraw
+
+import page_filter
+from page_filter import page_runs, scan_pages
+
+
+def test_page_runs_splits_gaps_and_long_runs():
+    assert page_runs([]) == []
+    assert page_runs([1, 300]) == [(1, 1), (300, 300)]
+    assert page_runs([3, 1, 2, 2, 7, 8]) == [(1, 3), (7, 8)]
+    assert page_runs(range(1, 46), limit=20) == [(1, 20), (21, 40), (41, 45)]
+
+
+def test_scan_empty_selection():
+    assert scan_pages('doc.pdf', []) == ([], {})
+
+
+def _page(text):
+    image = Image.new('RGB', (400, 520), 'white')
+    draw = ImageDraw.Draw(image)
+    for line in range(12):
+        draw.rectangle((40, 40 + line * 35, 40 + (len(text) * 37 + line * 23) % 300 + 20, 55 + line * 35),
+                       fill='black')
+    draw.text((40, 470), text, fill='black')
+    return image
+
+
+def test_scan_renders_only_selected_pages(monkeypatch):
+    pages = {1: _page('first'), 2: Image.new('RGB', (400, 520), 'white'), 300: _page('first')}
+    rendered = []
+
+    def convert_from_path(path, dpi, first_page, last_page):
+        rendered.append((first_page, last_page))
+        return [pages.get(n, _page(str(n))) for n in range(first_page, last_page + 1)]
+
+    monkeypatch.setitem(sys.modules, 'pdf2image', types.SimpleNamespace(convert_from_path=convert_from_path))
+    blank, duplicates = scan_pages('doc.pdf', [1, 2, 300])
+    assert rendered == [(1, 2), (300, 300)]
+    assert blank == [2]
+    assert duplicates == {300: 1}
+
+
+def test_blank_detection():
+    assert page_filter.is_blank(Image.new('L', (200, 260), 255))
+    assert not page_filter.is_blank(_page('text').convert('L'))
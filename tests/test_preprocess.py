@@ -0,0 +1,101 @@
+"""页面图像预处理"""
+
+import pytest
+from PIL import Image, ImageDraw
+
+from preprocess import (
+    MODEL_IMAGE_RULES, RERENDER_SCALE, choose_target_size, crop_margins, estimate_image_tokens,
+    get_image_rules, is_grayscale, looks_degraded, prepare_page_image,
+)
+
+
+def _page(width=1000, height=1400, line_gap=20):
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    for y in range(100, height - 100, line_gap):
+        draw.rectangle((100, y, width - 100, y + 8), fill='black')
+    return image
+
+
+def test_prefix_match():
+    assert get_image_rules('gpt-4o-mini') is MODEL_IMAGE_RULES['gpt-4o-mini']
+    assert get_image_rules('openai/gpt-4o-mini-2024-07-18') is MODEL_IMAGE_RULES['gpt-4o-mini']
+    assert get_image_rules('openai/gpt-4o') is MODEL_IMAGE_RULES['gpt-4o']
+    assert get_image_rules('gemini/gemini-1.5-flash') is MODEL_IMAGE_RULES['gemini']
+    assert get_image_rules('unknown-model') is MODEL_IMAGE_RULES['gpt-4o']
+
+
+@pytest.mark.parametrize('size, model, tokens', [
+    # 1024x1024 -> 短边缩到 768 -> 2x2 切片
+    ((1024, 1024), 'gpt-4o', 85 + 170 * 4),
+    ((1024, 1024), 'gpt-4o-mini', 2833 + 5667 * 4),
+    # 4096x1024 -> 2048x512，短边不足 768 不再放大 -> 4x1 切片
+    ((4096, 1024), 'gpt-4o', 85 + 170 * 4),
+    ((512, 512), 'gpt-4o', 85 + 170),
+    ((5000, 5000), 'gemini/gemini-1.5-pro', 258),
+])
+def test_estimate_image_tokens(size, model, tokens):
+    assert estimate_image_tokens(*size, model) == tokens
+
+
+def test_target_size_follows_density_tiers():
+    # fixed 模式只按密度分档限制长边
+    assert max(choose_target_size(1700, 2200, 0.01, 'gemini-1.5-flash')) == 1024
+    assert max(choose_target_size(1700, 2200, 0.05, 'gemini-1.5-flash')) == 1536
+    assert max(choose_target_size(1700, 2200, 0.2, 'gemini-1.5-flash')) == 2048
+    # 小图不放大
+    assert choose_target_size(600, 800, 0.2, 'gemini-1.5-flash') == (600, 800)
+
+
+def test_target_size_shrinks_to_tile_boundary():
+    # 稀疏页面允许缩小较多，704 缩到 512 省掉一排切片
+    width, height = choose_target_size(800, 1100, 0.01, 'gpt-4o')
+    assert (width, height) == (512, 704)
+    assert estimate_image_tokens(width, height, 'gpt-4o') == 85 + 170 * 2
+    # 密集页面只允许少量缩小，保持模型侧的 768 短边
+    width, height = choose_target_size(800, 1100, 0.5, 'gpt-4o')
+    assert min(width, height) == 744 and max(width, height) == 1024
+
+
+def test_crop_margins():
+    image = Image.new('RGB', (400, 300), 'white')
+    ImageDraw.Draw(image).rectangle((100, 80, 199, 179), fill='black')
+    assert crop_margins(image, padding=10).size == (120, 120)
+    assert crop_margins(image, padding=500).size == (400, 300)
+    blank = Image.new('RGB', (50, 50), 'white')
+    assert crop_margins(blank) is blank
+
+
+def test_is_grayscale():
+    page = _page()
+    assert is_grayscale(page)
+    assert is_grayscale(Image.new('RGB', (10, 10), (120, 128, 131)))
+    ImageDraw.Draw(page).rectangle((0, 0, 200, 200), fill=(200, 30, 30))
+    assert not is_grayscale(page)
+    assert is_grayscale(page.convert('L'))
+
+
+@pytest.mark.parametrize('content, density, degraded', [
+    ('', 0.0, False),
+    ('', 0.2, True),
+    ('�' * 4 + ' some text', 0.01, True),
+    ('[illegible] [illegible] [Illegible]', 0.01, True),
+    ('short', 0.2, True),
+    ('short', 0.02, False),
+    ('x' * 200, 0.2, False),
+])
+def test_looks_degraded(content, density, degraded):
+    assert looks_degraded(content, density) is degraded
+
+
+def test_rerender_scale_applied_once():
+    # 按 RERENDER_SCALE 倍DPI渲染的页面，输出尺寸约为默认预处理的 RERENDER_SCALE 倍，而不是平方倍
+    page = _page()
+    normal = prepare_page_image(page, 'gemini/gemini-1.5-flash', encoding='png')
+    rerendered = page.resize((int(page.width * RERENDER_SCALE), int(page.height * RERENDER_SCALE)))
+    retry = prepare_page_image(rerendered, 'gemini/gemini-1.5-flash', encoding='png', scale=RERENDER_SCALE)
+    assert retry.height == pytest.approx(normal.height * RERENDER_SCALE, rel=0.03)
+    assert retry.width == pytest.approx(normal.width * RERENDER_SCALE, rel=0.03)
+    # 不超过模型上限
+    huge = prepare_page_image(_page(4500, 6000, line_gap=30), 'gpt-4o', encoding='png', scale=RERENDER_SCALE)
+    assert max(huge.width, huge.height) <= 2048
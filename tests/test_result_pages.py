@@ -0,0 +1,110 @@
+"""按页读取处理结果：Markdown字节偏移索引和每页JSON Lines"""
+
+import os
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from result_pages import (
+    JSONL_INDEX_FILE, MAX_PAGES_PER_REQUEST, PAGE_SEPARATOR, PageLines, ResultPages, jsonl_name, write_jsonl,
+    write_markdown,
+)
+
+
+def _results(count, text='第{}页'):
+    return [
+        SimpleNamespace(page=page, content=text.format(page), model='m', status='ok',
+                        input_tokens=page, output_tokens=2 * page, latency=0.1234, cache='hit')
+        for page in range(count, 0, -1)
+    ]
+
+
+def _data_files(output_dir):
+    return sorted(name for name in os.listdir(output_dir) if name.endswith('.jsonl'))
+
+
+def test_round_trip_and_span(tmp_path):
+    write_jsonl(str(tmp_path), _results(5))
+    with PageLines(str(tmp_path)) as lines:
+        assert len(lines) == 5
+        assert [p['page'] for p in lines.get(2, 4)] == [2, 3, 4]
+        assert [p['page'] for p in lines.get(2, 4, limit=2)] == [2, 3]
+        assert lines.get(6, 9) == []
+        page = lines.get(1, 1)[0]
+        assert page['markdown'] == '第1页' and page['latency'] == 0.123 and page['cache'] == 'hit'
+        offset, length, count = lines.span(1, 5)
+        assert (offset, count) == (0, 5)
+        assert length == os.path.getsize(lines.path)
+        assert b''.join(lines.iter_bytes(3, 5, chunk_size=7)).decode('utf-8').count('\n') == 3
+
+
+def test_empty_results(tmp_path):
+    write_jsonl(str(tmp_path), [])
+    with PageLines(str(tmp_path)) as lines:
+        assert len(lines) == 0
+        assert lines.get(1, 10) == []
+
+
+def test_rewrite_keeps_open_reader_consistent(tmp_path):
+    write_jsonl(str(tmp_path), _results(3, 'old {}'))
+    with PageLines(str(tmp_path)) as old:
+        write_jsonl(str(tmp_path), _results(4, 'new {}'))
+        # 打开的读取方仍映射旧一代的索引和数据
+        assert [p['markdown'] for p in old.get(1, 9)] == ['old 1', 'old 2', 'old 3']
+    with PageLines(str(tmp_path)) as new:
+        assert [p['markdown'] for p in new.get(1, 9)] == ['new 1', 'new 2', 'new 3', 'new 4']
+        assert _data_files(str(tmp_path)) == [os.path.basename(new.path)]
+
+
+def test_open_rejects_mismatched_data(tmp_path):
+    write_jsonl(str(tmp_path), _results(2))
+    generation, _ = PageLines.read_header(str(tmp_path / JSONL_INDEX_FILE))
+    with open(tmp_path / jsonl_name(generation), 'ab') as f:
+        f.write(json.dumps({'page': 3}).encode() + b'\n')
+    with pytest.raises(ValueError):
+        PageLines(str(tmp_path)).open()
+
+
+def test_open_retries_when_data_replaced(tmp_path, monkeypatch):
+    write_jsonl(str(tmp_path), _results(2, 'old {}'))
+    lines = PageLines(str(tmp_path))
+    original = lines._map
+
+    def rewrite_after_index(path):
+        mapped = original(path)
+        if path == lines.index_path and not hasattr(lines, 'rewritten'):
+            # 读取索引之后、映射数据之前结果被重新写入
+            lines.rewritten = True
+            write_jsonl(str(tmp_path), _results(2, 'new {}'))
+        return mapped
+
+    monkeypatch.setattr(lines, '_map', rewrite_after_index)
+    with lines:
+        assert [p['markdown'] for p in lines.get(1, 2)] == ['new 1', 'new 2']
+
+
+def test_markdown_offsets_round_trip(tmp_path):
+    results = _results(3, '第{0}页\n\n多字节内容 ✓ {0}')
+    md_path = write_markdown(str(tmp_path), 'doc', sorted(results, key=lambda r: r.page))
+    with open(md_path, 'r', encoding='utf-8') as f:
+        assert f.read() == PAGE_SEPARATOR.join(f'第{n}页\n\n多字节内容 ✓ {n}' for n in (1, 2, 3))
+
+    # 没有每页JSON时按 page_index.json 的字节偏移读取
+    os.remove(tmp_path / JSONL_INDEX_FILE)
+    pages = ResultPages(str(tmp_path)).get(2, 3, html=False)
+    assert [p['markdown'] for p in pages] == ['第2页\n\n多字节内容 ✓ 2', '第3页\n\n多字节内容 ✓ 3']
+    assert [e['page'] for e in ResultPages(str(tmp_path)).index()] == [1, 2, 3]
+
+
+def test_request_page_limit(tmp_path):
+    count = MAX_PAGES_PER_REQUEST + 5
+    write_markdown(str(tmp_path), 'doc', sorted(_results(count), key=lambda r: r.page))
+    pages = ResultPages(str(tmp_path)).get(1, count, html=False)
+    assert len(pages) == MAX_PAGES_PER_REQUEST
+    assert pages[0]['markdown'] == '第1页' and pages[0]['input_tokens'] == 1
+
+
+def test_zerox_result_is_one_page(tmp_path):
+    (tmp_path / 'doc.md').write_text('# 全文', encoding='utf-8')
+    assert ResultPages(str(tmp_path)).get(1, 1, html=False)[0]['markdown'] == '# 全文'
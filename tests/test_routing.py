@@ -0,0 +1,66 @@
+"""按页面复杂度路由模型"""
+
+import pytest
+from PIL import Image, ImageDraw
+
+from routing import (
+    DEFAULT_THRESHOLD, ROUTE_ACCURATE, ROUTE_FAST, choose_model, model_pair, score_page,
+)
+
+
+def _text_page(line_gap=40):
+    """印刷正文：一行行的短词，行间留白"""
+    image = Image.new('RGB', (1200, 1600), 'white')
+    draw = ImageDraw.Draw(image)
+    for y in range(150, 1450, line_gap):
+        for x in range(150, 1050, 60):
+            draw.rectangle((x, y, x + 20, y + 4), fill='black')
+    return image
+
+
+def _table_page():
+    image = Image.new('RGB', (1200, 1600), 'white')
+    draw = ImageDraw.Draw(image)
+    for y in range(200, 1400, 100):
+        draw.line((100, y, 1100, y), fill='black', width=4)
+    for x in range(100, 1200, 250):
+        draw.line((x, 200, x, 1300), fill='black', width=4)
+    return image
+
+
+def test_model_pair():
+    assert model_pair('gpt-4o-mini') == ('gpt-4o-mini', 'gpt-4o')
+    assert model_pair('gemini/gemini-1.5-pro') == ('gemini/gemini-1.5-flash', 'gemini/gemini-1.5-pro')
+    assert model_pair('azure/gpt-4o') is None
+
+
+def test_score_components():
+    blank = score_page(Image.new('RGB', (600, 800), 'white'))
+    assert (blank.density, blank.table, blank.handwriting, blank.score) == (0.0, 0.0, 0.0, 0.0)
+
+    text = score_page(_text_page())
+    assert text.table == 0.0 and text.handwriting == 0.0
+    assert text.score < DEFAULT_THRESHOLD
+
+    table = score_page(_table_page())
+    # 12 条横线、5 条竖线都达到上限
+    assert table.table == 1.0 and table.score == 1.0
+
+    # 行间没有空白，按手写处理
+    crowded = score_page(_text_page(line_gap=6))
+    assert crowded.handwriting == 1.0 and crowded.score >= DEFAULT_THRESHOLD
+
+
+@pytest.mark.parametrize('model_id', ['gpt-4o-mini', 'gpt-4o'])
+def test_choose_model_threshold(model_id):
+    page = _text_page()
+    score = score_page(page).score
+    assert choose_model(page, model_id)[:2] == (ROUTE_FAST, 'gpt-4o-mini')
+    assert choose_model(page, model_id, threshold=score)[:2] == (ROUTE_ACCURATE, 'gpt-4o')
+    assert choose_model(_table_page(), model_id)[:2] == (ROUTE_ACCURATE, 'gpt-4o')
+
+
+def test_unpaired_model_is_kept():
+    route, model, complexity = choose_model(_text_page(), 'azure/gpt-4o')
+    assert (route, model) == (ROUTE_ACCURATE, 'azure/gpt-4o')
+    assert complexity.score < DEFAULT_THRESHOLD
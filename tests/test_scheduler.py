@@ -0,0 +1,96 @@
+"""优先级通道与公平调度"""
+
+import threading
+from collections import Counter
+
+import pytest
+
+from scheduler import FairPolicy, Ticket, AdmissionScheduler, normalize_lane, LANE_WEIGHTS
+
+NOW = 1000.0
+
+
+def _serve(policy, tickets, rounds, now=NOW):
+    """每轮选出一个任务并记账，选中的任务由同一通道、同一客户端的新任务补上（保持积压）"""
+    served = []
+    for _ in range(rounds):
+        chosen = policy.select(tickets, now=now)
+        policy.charge(chosen)
+        served.append(chosen)
+        tickets[tickets.index(chosen)] = Ticket(key=object(), lane=chosen.lane, client=chosen.client,
+                                                enqueued_at=now)
+    return served
+
+
+def _backlog(lanes, clients=('a',)):
+    return [Ticket(key=object(), lane=lane, client=client, enqueued_at=NOW)
+            for lane in lanes for client in clients]
+
+
+def test_lanes_share_by_weight():
+    served = _serve(FairPolicy(), _backlog(LANE_WEIGHTS), 13 * 20)
+    counts = Counter(t.lane for t in served)
+    assert counts == {lane: weight * 20 for lane, weight in LANE_WEIGHTS.items()}
+
+
+def test_clients_rotate_within_lane():
+    served = _serve(FairPolicy(), _backlog(['normal'], clients=('a', 'b', 'c')), 9)
+    assert [t.client for t in served] == ['a', 'b', 'c'] * 3
+
+
+def test_idle_lane_does_not_bank_credit():
+    policy = FairPolicy()
+    _serve(policy, _backlog(['normal']), 50)
+    # bulk 空闲期间没有积攒额度，出现后仍按权重分配，而不是连续处理
+    served = _serve(policy, _backlog(['normal', 'bulk']), 10)
+    assert Counter(t.lane for t in served)['bulk'] <= 3
+
+
+def test_overdue_ticket_is_served_first():
+    policy = FairPolicy()
+    tickets = _backlog(['interactive'], clients=('a', 'b'))
+    starving = Ticket(key=object(), lane='bulk', client='z', enqueued_at=NOW - 601)
+    tickets.append(starving)
+    assert policy.select(tickets, now=NOW) is starving
+    # 未超时时 bulk 仍排在 interactive 之后
+    starving.enqueued_at = NOW - 599
+    assert policy.select(tickets, now=NOW).lane == 'interactive'
+
+
+def test_normalize_lane():
+    assert normalize_lane(None) == 'normal'
+    assert normalize_lane('BULK') == 'bulk'
+    with pytest.raises(ValueError):
+        normalize_lane('urgent')
+
+
+def test_admission_limits_running_and_prefers_interactive():
+    scheduler = AdmissionScheduler(max_running=1)
+    order = []
+    release = threading.Event()
+
+    def hold():
+        with scheduler.slot('normal', 'x'):
+            release.wait(5)
+
+    def request(lane, client):
+        with scheduler.slot(lane, client):
+            order.append(lane)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while scheduler.snapshot()['running'] < 1:
+        pass
+    waiters = [threading.Thread(target=request, args=('bulk', 'b'))]
+    waiters[0].start()
+    while scheduler.snapshot()['lanes']['bulk']['depth'] < 1:
+        pass
+    waiters.append(threading.Thread(target=request, args=('interactive', 'i')))
+    waiters[1].start()
+    while scheduler.snapshot()['lanes']['interactive']['depth'] < 1:
+        pass
+    release.set()
+    for thread in [holder, *waiters]:
+        thread.join(5)
+    assert order == ['interactive', 'bulk']
+    assert scheduler.snapshot()['running'] == 0
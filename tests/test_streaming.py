@@ -0,0 +1,76 @@
+"""处理进度的流式推送"""
+
+import json
+import threading
+
+import streaming
+from streaming import EventStream
+
+
+def _events(chunks):
+    return [json.loads(line[len('data: '):]) for chunk in chunks
+            for line in chunk.split('\n\n') if line.startswith('data: ')]
+
+
+def test_consecutive_deltas_are_merged():
+    stream = EventStream()
+    for event in (
+        {'type': 'page_start', 'page': 1},
+        {'type': 'delta', 'page': 1, 'text': 'Hel'},
+        {'type': 'delta', 'page': 1, 'text': 'lo'},
+        {'type': 'delta', 'page': 2, 'text': 'A'},
+        {'type': 'delta', 'page': 2, 'text': 'B'},
+        {'type': 'page', 'page': 1, 'status': 'ok'},
+        {'type': 'delta', 'page': 2, 'text': 'C'},
+    ):
+        stream.emit(event)
+    stream.close()
+
+    chunks = list(stream.iter_sse())
+    # 积压的事件一次推送
+    assert len(chunks) == 1
+    assert _events(chunks) == [
+        {'type': 'page_start', 'page': 1},
+        {'type': 'delta', 'page': 1, 'text': 'Hello'},
+        {'type': 'delta', 'page': 2, 'text': 'AB'},
+        {'type': 'page', 'page': 1, 'status': 'ok'},
+        {'type': 'delta', 'page': 2, 'text': 'C'},
+    ]
+
+
+def test_reset_starts_new_delta():
+    stream = EventStream()
+    first = {'type': 'delta', 'page': 1, 'text': 'partial'}
+    stream.emit(first)
+    # 重试时整页重新输出，reset 之前的增量不能与之后的拼接
+    stream.emit({'type': 'delta', 'page': 1, 'text': 'ret', 'reset': True})
+    stream.emit({'type': 'delta', 'page': 1, 'text': 'ry'})
+    stream.close()
+
+    assert _events(stream.iter_sse()) == [
+        {'type': 'delta', 'page': 1, 'text': 'partial'},
+        {'type': 'delta', 'page': 1, 'text': 'retry', 'reset': True},
+    ]
+    # 合并时不修改调用方的事件
+    assert first['text'] == 'partial'
+
+
+def test_batch_size_is_bounded(monkeypatch):
+    monkeypatch.setattr(streaming, 'MAX_BATCH', 3)
+    stream = EventStream()
+    for page in range(5):
+        stream.emit({'type': 'page', 'page': page})
+    stream.close()
+    chunks = list(stream.iter_sse())
+    assert len(chunks) == 2
+    assert [e['page'] for e in _events(chunks)] == [0, 1, 2, 3, 4]
+
+
+def test_heartbeat_while_idle():
+    stream = EventStream()
+    chunks = stream.iter_sse(heartbeat=0.01)
+    assert next(chunks) == ': keep-alive\n\n'
+    threading.Timer(0.05, lambda: (stream.emit({'type': 'done'}), stream.close())).start()
+    rest = list(chunks)
+    assert _events(rest) == [{'type': 'done'}]
+    assert set(rest[:-1]) <= {': keep-alive\n\n'}
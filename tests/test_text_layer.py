@@ -0,0 +1,77 @@
+"""PDF文本层快速通道"""
+
+from dataclasses import replace
+
+import pytest
+
+from text_layer import (
+    MIN_CHARS, ROUTE_LOCAL, ROUTE_TEXT, ROUTE_VISION, TextLayerPage, _is_tabular, choose_route, text_to_markdown,
+)
+
+# Letter 页面，文本层质量良好
+GOOD = TextLayerPage(page=1, text='word ' * 400, chars=1600, readable_ratio=1.0, long_word_ratio=0.0,
+                     tabular=False, scanned=False, route=ROUTE_VISION, width=612, height=792)
+
+
+@pytest.mark.parametrize('changes', [
+    {'chars': MIN_CHARS - 1},
+    {'readable_ratio': 0.5},
+    {'long_word_ratio': 0.2},
+    {'scanned': True},
+])
+def test_unusable_text_layer_goes_to_vision(changes):
+    assert choose_route(replace(GOOD, **changes), 'gpt-4o') == ROUTE_VISION
+
+
+def test_simple_page_is_local():
+    assert choose_route(GOOD, 'gpt-4o') == ROUTE_LOCAL
+    # text 模式不允许本地转换
+    assert choose_route(GOOD, 'gpt-4o', allow_local=False) == ROUTE_TEXT
+
+
+def test_tabular_page_text_only_when_cheaper():
+    tabular = replace(GOOD, tabular=True)
+    # 约 500 个文本Token，少于 gpt-4o 整页图像的 765
+    assert choose_route(tabular, 'gpt-4o') == ROUTE_TEXT
+    assert choose_route(tabular, 'gpt-4o-mini') == ROUTE_TEXT
+    # Gemini 每张图固定 258 Token，长文本反而更贵
+    assert choose_route(tabular, 'gemini/gemini-1.5-flash') == ROUTE_VISION
+    assert choose_route(replace(tabular, text='x' * 400), 'gemini/gemini-1.5-flash') == ROUTE_TEXT
+
+
+def test_is_tabular():
+    assert _is_tabular(['Total $1,200.00', 'Tax 10%', 'Thank you', 'Notes'])
+    assert _is_tabular(['Contents', 'Introduction ........ 1'])
+    assert not _is_tabular(['Plain prose line'] * 10)
+    assert not _is_tabular([])
+
+
+def test_text_to_markdown():
+    text = (
+        'INTRODUCTION\n'
+        'This is a paragraph that\n'
+        'wraps across lines.\n'
+        'Second paragraph:\n'
+        '• first item\n'
+        '- second item\n'
+        '\n'
+        'Page 2 of 5\n'
+        'Trailing line\n'
+        'without punctuation'
+    )
+    assert text_to_markdown(text) == (
+        '## INTRODUCTION\n\n'
+        'This is a paragraph that wraps across lines.\n\n'
+        'Second paragraph:\n\n'
+        '- first item\n- second item\n\n'
+        '<page_number>Page 2 of 5<page_number>\n\n'
+        'Trailing line without punctuation'
+    )
+
+
+def test_text_to_markdown_keeps_short_numbers_and_long_caps():
+    long_caps = 'A' * 61
+    # 超过 60 个字符的大写行按正文处理；纯数字行不是页码
+    assert text_to_markdown(f'{long_caps}\n3 / 10\n2024') == \
+        f'{long_caps}\n\n<page_number>3 / 10<page_number>\n\n2024'
+    assert text_to_markdown('') == ''
@@ -10,66 +10,54 @@ import json
 import asyncio
 import tempfile
 import shutil
+import threading
 from datetime import datetime
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, send_file, session
+from flask import Flask, Response, render_template, request, jsonify, send_file, session, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import uuid
 
-# 添加Zerox OCR包到路径
+# 添加Zerox OCR包到路径（zerox 和 litellm 在首次处理或后台预热时才导入，启动时不加载）
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'zerox', 'py_zerox'))
 
-# 导入Zerox OCR
-from pyzerox.core.zerox import zerox
+from warmup import engine, warmup_enabled, WARMUP_DELAY, STARTED_AT
+from settings import (
+    UPLOAD_FOLDER, OUTPUT_FOLDER, load_config, save_config, apply_config_to_env,
+    get_api_key_for_model, get_provider_for_model, set_api_key_env, is_admin_token,
+)
+from ocr_pipeline import resume_pipeline, PipelineError, supports_pipeline, count_pages
+from jobs import (
+    JobError, output_dir_for, build_process_options, run_ocr, run_async, prepare_resume,
+    collect_result,
+)
+from hedging import metrics as call_metrics, latency_tracker
+from job_queue import create_queue
+from worker import start_workers
+from scheduler import AdmissionScheduler, normalize_lane
+from page_cache import page_cache, warm as warm_pages, WARM_PAGES
+from estimator import estimate_file
+from streaming import EventStream
+from result_pages import ResultPages, PageLines, MAX_PAGES_PER_REQUEST
+from extraction import list_schemas, load_schema, save_schema, SchemaError, EXTRACTION_FILE
+from export import select_results, stream_zip, parse_date, ExportError
+from converter import converter_pool, supports_conversion, converted_path
+from profiling import JobProfiler, profiled, load_report, profile_dir, PSTATS_FILE
 
 app = Flask(__name__)
 app.secret_key = 'zerox_ocr_web_app_secret_key_2025'
 CORS(app)
 
 # 配置
-UPLOAD_FOLDER = 'uploads'
-OUTPUT_FOLDER = 'outputs'
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'docx', 'doc', 'html', 'htm'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
-CONFIG_FILE = Path(__file__).parent / 'config.json'
 
 # 创建必要的目录
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-# ========== 配置持久化工具 ==========
-def _load_config() -> dict:
-    try:
-        if CONFIG_FILE.exists():
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return {}
-
-
-def _save_config(cfg: dict) -> None:
-    try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cfg, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
-
-
-def _apply_config_to_env() -> None:
-    cfg = _load_config()
-    api = cfg.get('api_keys', {})
-    if api.get('openai'):
-        os.environ['OPENAI_API_KEY'] = api['openai']
-    if api.get('gemini'):
-        os.environ['GEMINI_API_KEY'] = api['gemini']
-    if api.get('azure'):
-        os.environ['AZURE_API_KEY'] = api['azure']
-
-
 # 应用已保存的配置到环境变量
-_apply_config_to_env()
+apply_config_to_env()
 
 # 默认模型（用于页面初始选中）
 DEFAULT_MODEL = 'gemini/gemini-1.5-flash'
@@ -92,17 +80,100 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_api_key_for_model(model_id):
-    """根据模型ID获取对应的API密钥"""
-    cfg = _load_config()
-    api = cfg.get('api_keys', {})
-    if model_id.startswith('gpt-4'):
-        return os.environ.get('OPENAI_API_KEY') or api.get('openai')
-    elif model_id.startswith('gemini'):
-        return os.environ.get('GEMINI_API_KEY') or api.get('gemini')
-    elif model_id.startswith('azure'):
-        return os.environ.get('AZURE_API_KEY') or api.get('azure')
-    return None
+# 共享任务队列（首次使用时创建）
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """获取任务队列；按配置在本实例内启动嵌入式工作线程（embedded_workers 为 0 时只入队，由独立工作进程处理）"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            cfg = load_config().get('queue', {})
+            kwargs = {k: cfg[k] for k in ('visibility_timeout', 'max_attempts') if k in cfg}
+            _job_queue = create_queue(cfg.get('url'), **kwargs)
+            start_workers(_job_queue, int(cfg.get('embedded_workers', 1)))
+        return _job_queue
+
+# 同步处理的准入调度：同时处理的任务数受限，等待的请求按优先级通道和客户端公平排队
+scheduler = AdmissionScheduler(load_config().get('scheduler', {}).get('max_running', 4))
+
+# 上传时的预渲染缓存
+_page_cache_cfg = load_config().get('page_cache', {})
+page_cache.configure(max_bytes=_page_cache_cfg.get('max_mb', 0) * 1024 * 1024,
+                     ttl=_page_cache_cfg.get('ttl'))
+WARM_PAGE_LIMIT = int(_page_cache_cfg.get('pages', WARM_PAGES))
+
+# 可选在启动后于后台预热OCR引擎，首次处理不必等待导入
+_startup_cfg = load_config().get('startup', {})
+if warmup_enabled(_startup_cfg):
+    engine.start_warmup(float(_startup_cfg.get('warmup_delay', WARMUP_DELAY)))
+
+def is_admin_request():
+    """请求是否携带管理员令牌（X-Admin-Token 请求头）"""
+    return is_admin_token(request.headers.get('X-Admin-Token'))
+
+def profile_requested(options):
+    """
+    是否开启性能剖析（X-Zerox-Profile: 1 请求头或 options.profile）
+
+    仅限管理员，未携带管理员令牌时抛出 JobError(403)
+    """
+    if not (options.get('profile') or request.headers.get('X-Zerox-Profile') == '1'):
+        return False
+    if not is_admin_request():
+        raise JobError('开启性能剖析需要管理员令牌', 403)
+    return True
+
+def start_profiler(output_dir):
+    """同步处理的剖析器，结果保存在 profiles/<剖析ID>/；先导入OCR引擎，剖析结果不含导入的耗时和内存"""
+    engine.load()
+    return JobProfiler(output_dir, uuid.uuid4().hex)
+
+def profile_summary(profiler):
+    """处理结果中的剖析摘要，id 用于下载完整报告"""
+    return {'id': profiler.job_id, **(profiler.summary or {})}
+
+def profile_response(output_dir, profile_id, download_name):
+    """返回剖析报告；format=pstats 时下载 cProfile 数据"""
+    try:
+        report = load_report(output_dir, profile_id)
+    except FileNotFoundError:
+        return jsonify({'error': '没有性能剖析结果'}), 404
+    
+    if request.args.get('format') == 'pstats':
+        pstats_path = os.path.join(profile_dir(output_dir, profile_id), PSTATS_FILE)
+        if not os.path.exists(pstats_path):
+            return jsonify({'error': '没有 cProfile 数据'}), 404
+        return send_file(os.path.abspath(pstats_path), as_attachment=True, download_name=download_name)
+    return jsonify({
+        'success': True,
+        'profile': report
+    })
+
+def get_client_id():
+    """用于公平调度的客户端标识：优先使用 X-Client-Id 请求头，否则使用来源地址"""
+    return request.headers.get('X-Client-Id') or request.remote_addr
+
+def pipeline_error_response(error):
+    """部分页面失败：已完成页面已保存断点，返回可续跑的错误"""
+    return jsonify({
+        'error': f'处理失败: {str(error)}',
+        'failed_pages': error.failed_pages,
+        'resumable': True
+    }), 500
+
+def build_result_response(output_dir, result, include_content=True, profiler=None):
+    """读取生成的Markdown并组装处理结果"""
+    collected = collect_result(output_dir, result, include_content)
+    if collected is None:
+        return jsonify({'error': '处理完成但未生成输出文件'}), 500
+    if profiler:
+        collected['profile'] = profile_summary(profiler)
+    return jsonify({
+        'success': True,
+        'result': collected
+    })
 
 @app.route('/')
 def index():
@@ -147,13 +218,30 @@ def upload_file():
         file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
         file.save(file_path)
         
+        # 统计页数并在后台预渲染、预处理前几页，开始处理时直接复用
+        page_count = None
+        if supports_pipeline(file_path):
+            try:
+                page_count = count_pages(file_path)
+            except Exception as e:
+                print(f"⚠️  统计页数失败 {filename}: {e}")
+        if page_count and WARM_PAGE_LIMIT > 0:
+            warm_pages(file_path, page_count, request.form.get('model_id'), WARM_PAGE_LIMIT)
+        # 文档在后台提前转换为PDF（按内容缓存），开始处理时直接复用
+        if supports_conversion(file_path) and converter_pool.available:
+            try:
+                converter_pool.submit(file_path)
+            except Exception as e:
+                print(f"⚠️  提交文档转换失败 {filename}: {e}")
+        
         # 返回文件信息
         file_info = {
             'id': unique_filename,
             'original_name': filename,
             'size': file_size,
             'upload_time': datetime.now().isoformat(),
-            'path': file_path
+            'path': file_path,
+            'page_count': page_count
         }
         
         return jsonify({
@@ -164,6 +252,86 @@ def upload_file():
     except Exception as e:
         return jsonify({'error': f'上传失败: {str(e)}'}), 500
 
+@app.route('/api/estimate', methods=['POST'])
+def estimate_processing():
+    """预估处理耗时、Token和调用次数（不渲染页面）；未指定 models 时预估所有支持的模型"""
+    try:
+        data = request.get_json()
+        file_id = data.get('file_id')
+        if not file_id:
+            return jsonify({'error': '缺少必要参数'}), 400
+        
+        file_path = os.path.join(UPLOAD_FOLDER, file_id)
+        if not os.path.exists(file_path):
+            return jsonify({'error': '文件不存在'}), 404
+        
+        models = data.get('models') or [m['id'] for group in SUPPORTED_MODELS.values() for m in group]
+        try:
+            summary, estimates = estimate_file(file_path, models, data.get('options', {}))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'file': summary,
+            'estimates': estimates
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'预估失败: {str(e)}'}), 500
+
+@app.route('/api/schemas')
+def get_schemas():
+    """已保存的结构化提取Schema"""
+    try:
+        return jsonify({
+            'success': True,
+            'schemas': list_schemas()
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'获取Schema失败: {str(e)}'}), 500
+
+@app.route('/api/schemas/<name>')
+def get_schema(name):
+    """读取一个已保存的Schema"""
+    try:
+        return jsonify({
+            'success': True,
+            'name': name,
+            'schema': load_schema(name)
+        })
+    
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except SchemaError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'获取Schema失败: {str(e)}'}), 500
+
+@app.route('/api/schemas', methods=['POST'])
+def create_schema():
+    """按名称保存Schema（同名覆盖），之后 /api/process 可用 options.schema 引用"""
+    try:
+        data = request.get_json()
+        name = data.get('name')
+        schema = data.get('schema')
+        if not name or not schema:
+            return jsonify({'error': '缺少必要参数'}), 400
+        
+        try:
+            save_schema(name, schema)
+        except SchemaError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'name': name
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'保存Schema失败: {str(e)}'}), 500
+
 @app.route('/api/process', methods=['POST'])
 def process_file():
     """OCR处理API"""
@@ -176,81 +344,217 @@ def process_file():
         if not file_id or not model_id:
             return jsonify({'error': '缺少必要参数'}), 400
         
-        # 获取文件路径
-        file_path = os.path.join(UPLOAD_FOLDER, file_id)
-        if not os.path.exists(file_path):
-            return jsonify({'error': '文件不存在'}), 404
+        try:
+            lane = normalize_lane(options.get('priority'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # 获取API密钥
-        api_key = get_api_key_for_model(model_id)
-        if not api_key:
-            return jsonify({'error': '未配置对应的API密钥'}), 400
+        # 解析处理参数并设置API密钥
+        try:
+            profile = profile_requested(options)
+            process_options, use_pipeline = build_process_options(file_id, model_id, options)
+        except JobError as e:
+            return jsonify({'error': str(e)}), e.status
+        output_dir = process_options['output_dir']
+        profiler = start_profiler(output_dir) if profile else None
         
-        # 设置环境变量
-        if model_id.startswith('gpt-4'):
-            os.environ['OPENAI_API_KEY'] = api_key
-        elif model_id.startswith('gemini'):
-            os.environ['GEMINI_API_KEY'] = api_key
-        elif model_id.startswith('azure'):
-            os.environ['AZURE_API_KEY'] = api_key
-        
-        # 创建输出目录
-        output_dir = os.path.join(OUTPUT_FOLDER, file_id.replace('.', '_'))
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 处理参数
-        process_options = {
-            'file_path': file_path,
-            'model': model_id,
-            'output_dir': output_dir,
-            'maintain_format': options.get('maintain_format', False),
-            'concurrency': options.get('concurrency', 10),
-            'select_pages': options.get('select_pages'),
-            'custom_system_prompt': options.get('custom_system_prompt')
-        }
+        # 运行OCR处理（按优先级排队等待处理名额）
+        try:
+            with scheduler.slot(lane, get_client_id()):
+                result = run_async(profiled(run_ocr(process_options, use_pipeline), profiler))
+        except PipelineError as e:
+            return pipeline_error_response(e)
+        
+        return build_result_response(output_dir, result, options.get('inline_content', True), profiler)
+    
+    except Exception as e:
+        return jsonify({'error': f'处理失败: {str(e)}'}), 500
+
+@app.route('/api/process/stream', methods=['POST'])
+def process_file_stream():
+    """
+    OCR处理API（流式）：以 Server-Sent Events 推送开始、每页增量Markdown、每页完成和最终结果事件，
+    结果仍写入输出目录；参数与 /api/process 相同
+    """
+    try:
+        data = request.get_json()
+        file_id = data.get('file_id')
+        model_id = data.get('model_id')
+        options = data.get('options', {})
+        
+        if not file_id or not model_id:
+            return jsonify({'error': '缺少必要参数'}), 400
+        
+        try:
+            lane = normalize_lane(options.get('priority'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            profile = profile_requested(options)
+            process_options, use_pipeline = build_process_options(file_id, model_id, options)
+        except JobError as e:
+            return jsonify({'error': str(e)}), e.status
+        output_dir = process_options['output_dir']
+        
+        events = EventStream()
+        client = get_client_id()
         
-        # 异步处理
-        async def process_ocr():
+        def work():
+            # 客户端断开后任务继续执行，结果照常写入输出目录
             try:
-                result = await zerox(**process_options)
-                return result
+                profiler = start_profiler(output_dir) if profile else None
+                with scheduler.slot(lane, client):
+                    result = run_async(profiled(run_ocr(process_options, use_pipeline, on_event=events.emit),
+                                                profiler))
+                collected = collect_result(output_dir, result, options.get('inline_content', True))
+                if collected is None:
+                    events.emit({'type': 'error', 'error': '处理完成但未生成输出文件'})
+                else:
+                    if profiler:
+                        collected['profile'] = profile_summary(profiler)
+                    events.emit({'type': 'result', 'result': collected})
+            except PipelineError as e:
+                events.emit({'type': 'error', 'error': f'处理失败: {str(e)}',
+                             'failed_pages': e.failed_pages, 'resumable': True})
             except Exception as e:
-                raise e
+                events.emit({'type': 'error', 'error': f'处理失败: {str(e)}'})
+            finally:
+                events.close()
+        
+        threading.Thread(target=work, name=f'stream-{file_id}', daemon=True).start()
+        return Response(events.iter_sse(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    except Exception as e:
+        return jsonify({'error': f'处理失败: {str(e)}'}), 500
+
+@app.route('/api/resume', methods=['POST'])
+def resume_file():
+    """续跑失败的任务：只重新处理缺失或失败的页面"""
+    try:
+        data = request.get_json()
+        file_id = data.get('file_id')
+        if not file_id:
+            return jsonify({'error': '缺少必要参数'}), 400
         
-        # 运行OCR处理
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
         try:
-            result = loop.run_until_complete(process_ocr())
-        finally:
-            loop.close()
+            output_dir = prepare_resume(file_id)
+        except JobError as e:
+            return jsonify({'error': str(e)}), e.status
         
-        # 查找生成的Markdown文件
-        md_files = list(Path(output_dir).glob('*.md'))
-        if not md_files:
-            return jsonify({'error': '处理完成但未生成输出文件'}), 500
+        try:
+            lane = normalize_lane(data.get('priority'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        md_file = md_files[0]
+        try:
+            with scheduler.slot(lane, get_client_id()):
+                result = run_async(resume_pipeline(output_dir))
+        except PipelineError as e:
+            return pipeline_error_response(e)
+        
+        return build_result_response(output_dir, result)
+    
+    except Exception as e:
+        return jsonify({'error': f'续跑失败: {str(e)}'}), 500
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """提交任务到共享队列，立即返回任务ID"""
+    try:
+        data = request.get_json()
+        file_id = data.get('file_id')
+        model_id = data.get('model_id')
+        options = data.get('options', {})
         
-        # 读取结果内容
-        with open(md_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        if not file_id or not model_id:
+            return jsonify({'error': '缺少必要参数'}), 400
+        if not os.path.exists(os.path.join(UPLOAD_FOLDER, file_id)):
+            return jsonify({'error': '文件不存在'}), 404
+        if not get_api_key_for_model(model_id):
+            return jsonify({'error': '未配置对应的API密钥'}), 400
+        try:
+            lane = normalize_lane(options.get('priority'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # 性能剖析仅限管理员
+        try:
+            if profile_requested(options):
+                options = {**options, 'profile': True}
+        except JobError as e:
+            return jsonify({'error': str(e)}), e.status
         
-        # 返回结果
+        job = get_job_queue().enqueue({'file_id': file_id, 'model_id': model_id, 'options': options},
+                                      lane=lane, client=get_client_id())
         return jsonify({
             'success': True,
-            'result': {
-                'content': content,
-                'file_path': str(md_file),
-                'completion_time': getattr(result, 'completion_time', 0),
-                'input_tokens': getattr(result, 'input_tokens', 0),
-                'output_tokens': getattr(result, 'output_tokens', 0),
-                'pages': len(getattr(result, 'pages', []))
-            }
+            'job': job.to_dict()
+        }), 202
+    
+    except Exception as e:
+        return jsonify({'error': f'提交任务失败: {str(e)}'}), 500
+
+@app.route('/api/jobs')
+def list_jobs():
+    """列出最近的任务（不含结果内容）"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+        jobs = []
+        for job in get_job_queue().list_jobs(limit):
+            info = job.to_dict()
+            info.pop('result', None)
+            jobs.append(info)
+        return jsonify({
+            'success': True,
+            'jobs': jobs
         })
     
     except Exception as e:
-        return jsonify({'error': f'处理失败: {str(e)}'}), 500
+        return jsonify({'error': f'获取任务列表失败: {str(e)}'}), 500
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """查询任务状态和结果"""
+    try:
+        job = get_job_queue().get(job_id)
+        if not job:
+            return jsonify({'error': '任务不存在'}), 404
+        return jsonify({
+            'success': True,
+            'job': job.to_dict()
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'获取任务失败: {str(e)}'}), 500
+
+@app.route('/api/jobs/<job_id>/profile')
+def get_job_profile(job_id):
+    """下载任务的性能剖析结果（仅限管理员）：默认返回JSON报告，format=pstats 时下载 cProfile 数据"""
+    try:
+        if not is_admin_request():
+            return jsonify({'error': '需要管理员令牌'}), 403
+        job = get_job_queue().get(job_id)
+        if not job:
+            return jsonify({'error': '任务不存在'}), 404
+        
+        return profile_response(output_dir_for(job.payload['file_id']), job.id, f'{job.id}.prof')
+    
+    except Exception as e:
+        return jsonify({'error': f'获取性能剖析结果失败: {str(e)}'}), 500
+
+@app.route('/api/results/<file_id>/profiles/<profile_id>')
+def get_result_profile(file_id, profile_id):
+    """下载同步处理（/api/process、/api/process/stream）的性能剖析结果（仅限管理员），参数同任务的剖析接口"""
+    try:
+        if not is_admin_request():
+            return jsonify({'error': '需要管理员令牌'}), 403
+        if not profile_id.isalnum():
+            return jsonify({'error': '剖析ID无效'}), 400
+        return profile_response(output_dir_for(file_id), profile_id, f'{profile_id}.prof')
+    
+    except Exception as e:
+        return jsonify({'error': f'获取性能剖析结果失败: {str(e)}'}), 500
 
 @app.route('/api/download/<file_id>')
 def download_file(file_id):
@@ -268,12 +572,143 @@ def download_file(file_id):
     except Exception as e:
         return jsonify({'error': f'下载失败: {str(e)}'}), 500
 
+@app.route('/api/export', methods=['GET', 'POST'])
+def export_results():
+    """
+    批量导出处理结果为zip（流式生成，不暂存）
+
+    条件：file_ids（逗号分隔或列表）、q（文件名搜索）、from/to（处理日期 YYYY-MM-DD，含两端），至少指定一项；
+    pages=1 附带每页JSON，trace=1 附带任务参数和页索引
+    """
+    try:
+        data = request.get_json(silent=True) or request.args
+        file_ids = data.get('file_ids') or []
+        if isinstance(file_ids, str):
+            file_ids = [f for f in file_ids.split(',') if f]
+        query = data.get('q')
+        
+        try:
+            date_from = parse_date(data.get('from'))
+            date_to = parse_date(data.get('to'), end=True)
+        except ExportError as e:
+            return jsonify({'error': str(e)}), 400
+        if not (file_ids or query or date_from or date_to):
+            return jsonify({'error': '缺少导出条件'}), 400
+        
+        include_pages, include_trace = (str(data.get(name, '')).lower() in ('1', 'true')
+                                        for name in ('pages', 'trace'))
+        results = select_results(OUTPUT_FOLDER, file_ids, query, date_from, date_to)
+        archive = stream_zip(results, include_pages=include_pages, include_trace=include_trace)
+        name = f"zerox_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        return Response(stream_with_context(archive), mimetype='application/zip', headers={
+            'Content-Disposition': f'attachment; filename={name}',
+            'X-Accel-Buffering': 'no',
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'导出失败: {str(e)}'}), 500
+
+@app.route('/api/results/<file_id>/index')
+def get_result_index(file_id):
+    """处理结果的页索引：每页的页码、字节数、状态和模型（不含内容）"""
+    try:
+        pages = ResultPages(output_dir_for(file_id)).index()
+        return jsonify({
+            'success': True,
+            'total_pages': len(pages),
+            'pages': pages
+        })
+    
+    except FileNotFoundError:
+        return jsonify({'error': '结果不存在'}), 404
+    except Exception as e:
+        return jsonify({'error': f'获取结果失败: {str(e)}'}), 500
+
+@app.route('/api/results/<file_id>/pages')
+def get_result_pages(file_id):
+    """按页码范围读取处理结果（start、end 含两端，每次最多 100 页）；html=0 时不返回预渲染HTML"""
+    try:
+        start = request.args.get('start', 1, type=int)
+        end = request.args.get('end', start + MAX_PAGES_PER_REQUEST - 1, type=int)
+        html = request.args.get('html', '1') != '0'
+        pages = ResultPages(output_dir_for(file_id)).get(start, end, html=html)
+        return jsonify({
+            'success': True,
+            'pages': pages
+        })
+    
+    except FileNotFoundError:
+        return jsonify({'error': '结果不存在'}), 404
+    except Exception as e:
+        return jsonify({'error': f'获取结果失败: {str(e)}'}), 500
+
+@app.route('/api/results/<file_id>/pages.jsonl')
+def get_result_jsonl(file_id):
+    """
+    按页码范围流式返回每页一行的JSON（start、end 含两端，默认全部页面）
+
+    直接发送每页JSON数据文件中对应的字节，不解析也不限制页数，供搜索索引等下游逐页增量处理；
+    打开后映射的是同一代的索引和数据，发送期间结果被重新写入也不影响本次响应
+    """
+    try:
+        output_dir = output_dir_for(file_id)
+        if not PageLines.exists(output_dir):
+            return jsonify({'error': '结果不存在'}), 404
+        
+        start = request.args.get('start', 1, type=int)
+        end = request.args.get('end', 2 ** 31, type=int)
+        lines = PageLines(output_dir).open()
+        _, length, count = lines.span(start, end)
+        response = Response(lines.iter_bytes(start, end), mimetype='application/x-ndjson', headers={
+            'Content-Length': str(length),
+            'X-Page-Count': str(count),
+        })
+        response.call_on_close(lines.close)
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': f'获取结果失败: {str(e)}'}), 500
+
+@app.route('/api/results/<file_id>/extraction')
+def get_result_extraction(file_id):
+    """结构化提取结果：字段值、来源页码和校验结果"""
+    try:
+        path = Path(output_dir_for(file_id)) / EXTRACTION_FILE
+        if not path.exists():
+            return jsonify({'error': '提取结果不存在'}), 404
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            extraction = json.load(f)
+        return jsonify({
+            'success': True,
+            'extraction': extraction
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'获取结果失败: {str(e)}'}), 500
+
+@app.route('/api/ready')
+def ready():
+    """
+    就绪检查：能响应即表示可以提供服务，engine 单独报告OCR引擎是否已加载
+
+    engine=1 时引擎未加载返回 503，供只把流量导向已预热实例的负载均衡使用
+    """
+    engine_status = engine.status()
+    require_engine = request.args.get('engine') == '1'
+    return jsonify({
+        'success': True,
+        'serving': True,
+        'uptime': datetime.now().timestamp() - STARTED_AT,
+        'engine': engine_status
+    }), 503 if require_engine and not engine_status['loaded'] else 200
+
 @app.route('/api/status')
 def status():
     """系统状态API"""
     try:
         # 检查API密钥状态
-        cfg = _load_config()
+        cfg = load_config()
         api = cfg.get('api_keys', {})
         api_status = {
             'openai': bool(os.environ.get('OPENAI_API_KEY') or api.get('openai')),
@@ -292,12 +727,32 @@ def status():
             'api_keys': api_status,
             'directories': dir_status,
             'supported_formats': list(ALLOWED_EXTENSIONS),
-            'max_file_size': MAX_FILE_SIZE
+            'max_file_size': MAX_FILE_SIZE,
+            'engine': engine.status()
         })
     
     except Exception as e:
         return jsonify({'error': f'状态检查失败: {str(e)}'}), 500
 
+@app.route('/api/metrics')
+def get_metrics():
+    """运行统计：对冲率、故障转移率、各模型延迟分位数、各优先级通道的排队深度和等待时间、预渲染缓存命中率与文档转换进程池"""
+    try:
+        return jsonify({
+            'success': True,
+            'calls': call_metrics.snapshot(),
+            'latency': latency_tracker.snapshot(),
+            'lanes': {
+                'process': scheduler.snapshot(),
+                'queue': _job_queue.lane_stats() if _job_queue else None
+            },
+            'page_cache': page_cache.snapshot(),
+            'converter': converter_pool.snapshot()
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'获取统计失败: {str(e)}'}), 500
+
 @app.route('/api/cleanup', methods=['POST'])
 def cleanup_files():
     """清理临时文件"""
@@ -308,12 +763,20 @@ def cleanup_files():
         
         if clear_all:
             # 清理所有文件
+            page_cache.clear()
             if os.path.exists(UPLOAD_FOLDER):
                 shutil.rmtree(UPLOAD_FOLDER)
                 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
             if os.path.exists(OUTPUT_FOLDER):
-                shutil.rmtree(OUTPUT_FOLDER)
-                os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+                for name in os.listdir(OUTPUT_FOLDER):
+                    # 保留默认的共享任务队列数据库（jobs.db 及其 WAL 文件）
+                    if name.startswith('jobs.db'):
+                        continue
+                    path = os.path.join(OUTPUT_FOLDER, name)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
             return jsonify({
                 'success': True,
                 'message': '所有文件已清理'
@@ -323,8 +786,14 @@ def cleanup_files():
         for file_id in file_ids:
             # 删除上传文件
             upload_path = os.path.join(UPLOAD_FOLDER, file_id)
+            page_cache.evict(upload_path)
             if os.path.exists(upload_path):
                 os.remove(upload_path)
+            # 转换后的PDF（转换缓存保留，重新上传相同文档时复用）
+            pdf_path = converted_path(upload_path)
+            page_cache.evict(pdf_path)
+            if os.path.exists(pdf_path):
+                os.remove(pdf_path)
             
             # 删除输出目录
             output_dir = os.path.join(OUTPUT_FOLDER, file_id.replace('.', '_'))
@@ -363,11 +832,11 @@ def save_api_key():
             # 更新环境变量
             os.environ[env_key_map[provider]] = api_key
             # 写入配置文件
-            cfg = _load_config()
+            cfg = load_config()
             api = cfg.get('api_keys', {})
             api[provider] = api_key
             cfg['api_keys'] = api
-            _save_config(cfg)
+            save_config(cfg)
             return jsonify({
                 'success': True,
                 'message': f'{provider.upper()} API密钥已保存'
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+页级断点保存
+每页完成后立即把Markdown和用量写入任务输出目录，
+任务失败或进程重启后只需重新处理缺失的页面
+"""
+
+import json
+import os
+import shutil
+from dataclasses import asdict
+
+CHECKPOINT_DIR = 'pages'
+MANIFEST_FILE = 'job.json'
+
+
+def _write_json(path, data):
+    """先写临时文件再原子替换，并落盘，避免进程中断留下半个文件"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CheckpointStore:
+    """任务输出目录下的断点存储"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.pages_dir = os.path.join(output_dir, CHECKPOINT_DIR)
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+
+    def reset(self):
+        """开始新任务时清空旧断点"""
+        shutil.rmtree(self.pages_dir, ignore_errors=True)
+        os.makedirs(self.pages_dir, exist_ok=True)
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def load_manifest(self):
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_manifest(self, options, **state):
+        manifest = {'options': options, **state}
+        os.makedirs(self.output_dir, exist_ok=True)
+        _write_json(self.manifest_path, manifest)
+
+    def update_manifest(self, **state):
+        manifest = self.load_manifest()
+        manifest.update(state)
+        _write_json(self.manifest_path, manifest)
+
+    def page_path(self, page_number):
+        return os.path.join(self.pages_dir, f'page_{page_number:05d}.json')
+
+    def save_page(self, result):
+        os.makedirs(self.pages_dir, exist_ok=True)
+        _write_json(self.page_path(result.page), asdict(result))
+
+    def load_pages(self):
+        """读取已完成的页面，返回 {页码: 字段字典}；损坏的断点文件会被忽略并重新处理"""
+        pages = {}
+        if not os.path.isdir(self.pages_dir):
+            return pages
+        for name in os.listdir(self.pages_dir):
+            if not (name.startswith('page_') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.pages_dir, name), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                pages[int(data['page'])] = data
+            except (ValueError, KeyError, OSError):
+                continue
+        return pages
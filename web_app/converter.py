@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+DOCX/DOC/HTML 转PDF的转换进程池
+所有任务共用一个转换队列，每个转换进程有独立的用户配置；转换前做健康检查，单次转换有超时，
+转换一定次数后重启进程。转换结果按输入内容的哈希缓存，重复提交的文档直接复用已转换的PDF。
+转换后的PDF走页级流水线。
+
+常驻进程需要 LibreOffice 的 Python-UNO 绑定（能在本进程中 import uno）：此时每个转换进程是长期运行、
+通过 UNO 连接的 soffice。没有 UNO 绑定时（pip/venv 安装的常见情况）退化为 cli 模式：每次转换启动一个
+soffice，只复用已初始化的用户配置，并发数、超时和缓存仍然有效，但没有常驻进程
+"""
+
+import os
+import time
+import queue
+import atexit
+import socket
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import Future
+from pathlib import Path
+
+from settings import UPLOAD_FOLDER
+
+CONVERT_EXTENSIONS = {'docx', 'doc', 'html', 'htm'}
+
+# 转换进程数
+POOL_SIZE = 2
+
+# 单次转换超时（秒）
+CONVERT_TIMEOUT = 120
+
+# 每个进程转换多少个文档后重启（释放 LibreOffice 累积的内存）
+MAX_CONVERSIONS = 50
+
+# 空闲时的健康检查间隔（秒）
+HEALTH_INTERVAL = 30
+
+# 进程启动超时（秒）
+START_TIMEOUT = 60
+
+# 已转换PDF的缓存（按输入内容的SHA-256命名）及容量上限
+CACHE_DIR = os.path.join(UPLOAD_FOLDER, '.converted_cache')
+CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# config.json 中 converter 段支持的字段
+CONFIG_KEYS = ('workers', 'timeout', 'max_conversions', 'cache_max_mb')
+
+# 任务使用的PDF（与上传文件同名，输出文件名与直接处理原文件一致）
+CONVERTED_DIR = os.path.join(UPLOAD_FOLDER, 'converted')
+
+# HTML 在 Writer/Web 中打开，需要对应的导出过滤器
+_PDF_FILTERS = {'html': 'writer_web_pdf_Export', 'htm': 'writer_web_pdf_Export'}
+_DEFAULT_FILTER = 'writer_pdf_Export'
+
+
+class ConversionError(Exception):
+    """文档转换失败"""
+
+
+def supports_conversion(file_path):
+    return file_path.rsplit('.', 1)[-1].lower() in CONVERT_EXTENSIONS
+
+
+def find_soffice():
+    return shutil.which('soffice') or shutil.which('libreoffice')
+
+
+def _uno_available():
+    try:
+        import uno  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def converted_path(source_path):
+    """上传文件对应的转换后PDF路径"""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(CONVERTED_DIR, f'{stem}.pdf')
+
+
+def _link_or_copy(source, target):
+    """硬链接，跨文件系统等情况下复制；source 不存在时抛出 FileNotFoundError"""
+    try:
+        os.link(source, target)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class ConverterWorker:
+    """
+    一个转换槽位
+
+    uno 模式下是常驻监听的 soffice，通过 UNO 连接转换；cli 模式下每次转换启动 soffice，
+    只复用该槽位独立的、已初始化的用户配置（省去配置初始化，且多个槽位可并行转换）
+    """
+
+    def __init__(self, index, soffice, use_uno):
+        self.index = index
+        self.soffice = soffice
+        self.use_uno = use_uno
+        self.profile = None
+        self.process = None
+        self.port = None
+        self.desktop = None
+        self.conversions = 0
+        self.restarts = 0
+        self.state = 'stopped'
+        self._timed_out = False
+
+    def _base_args(self):
+        return [self.soffice, f'-env:UserInstallation={Path(self.profile).as_uri()}',
+                '--headless', '--invisible', '--nologo', '--norestore', '--nodefault']
+
+    def start(self):
+        self.state = 'starting'
+        self.profile = tempfile.mkdtemp(prefix=f'zerox_office_{self.index}_')
+        self.conversions = 0
+        if not self.use_uno:
+            subprocess.run(self._base_args() + ['--terminate_after_init'], timeout=START_TIMEOUT,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.state = 'idle'
+            return
+
+        self.port = _free_port()
+        accept = f'--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext'
+        self.process = subprocess.Popen(self._base_args() + [accept],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + START_TIMEOUT
+        while True:
+            try:
+                self.desktop = self._connect()
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise ConversionError('转换进程启动失败')
+                time.sleep(0.2)
+        self.state = 'idle'
+
+    def _connect(self):
+        import uno
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local)
+        context = resolver.resolve(
+            f'uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext')
+        return context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = self.desktop = None
+        if self.profile:
+            shutil.rmtree(self.profile, ignore_errors=True)
+            self.profile = None
+        self.state = 'stopped'
+
+    def restart(self):
+        self.stop()
+        self.restarts += 1
+        self.start()
+
+    def healthy(self):
+        if self.state != 'idle':
+            return False
+        if not self.use_uno:
+            return os.path.isdir(self.profile)
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            socket.create_connection(('127.0.0.1', self.port), timeout=2).close()
+        except OSError:
+            return False
+        return True
+
+    def convert(self, source, target, timeout):
+        """把 source 转换为 target（PDF）"""
+        self.state = 'converting'
+        try:
+            if self.use_uno:
+                self._convert_uno(source, target, timeout)
+            else:
+                self._convert_cli(source, target, timeout)
+        finally:
+            self.conversions += 1
+            if self.state == 'converting':
+                self.state = 'idle'
+
+    def _convert_cli(self, source, target, timeout):
+        ext = source.rsplit('.', 1)[-1].lower()
+        out_dir = tempfile.mkdtemp(prefix='zerox_convert_')
+        try:
+            try:
+                subprocess.run(self._base_args() + ['--convert-to', f'pdf:{_PDF_FILTERS.get(ext, _DEFAULT_FILTER)}',
+                                                    '--outdir', out_dir, source],
+                               timeout=timeout, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except subprocess.TimeoutExpired:
+                raise ConversionError(f'转换超时（{timeout}秒）')
+            produced = os.path.join(out_dir, os.path.splitext(os.path.basename(source))[0] + '.pdf')
+            if not os.path.exists(produced):
+                raise ConversionError('转换进程没有输出PDF')
+            shutil.move(produced, target)
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    def _kill(self):
+        # UNO 调用没有超时，由看门狗结束进程使调用返回
+        self._timed_out = True
+        self.state = 'timeout'
+        if self.process:
+            self.process.kill()
+
+    def _convert_uno(self, source, target, timeout):
+        from com.sun.star.beans import PropertyValue
+        import uno
+
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name, p.Value = name, value
+            return p
+
+        ext = source.rsplit('.', 1)[-1].lower()
+        self._timed_out = False
+        watchdog = threading.Timer(timeout, self._kill)
+        watchdog.start()
+        try:
+            document = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(source)), '_blank', 0, (prop('Hidden', True),))
+            if document is None:
+                raise ConversionError('无法打开文档')
+            try:
+                document.storeToURL(uno.systemPathToFileUrl(os.path.abspath(target)),
+                                    (prop('FilterName', _PDF_FILTERS.get(ext, _DEFAULT_FILTER)),))
+            finally:
+                document.close(True)
+        except ConversionError:
+            raise
+        except Exception as e:
+            if self._timed_out:
+                raise ConversionError(f'转换超时（{timeout}秒）')
+            raise ConversionError(str(e))
+        finally:
+            watchdog.cancel()
+
+    def snapshot(self):
+        return {'index': self.index, 'state': self.state, 'conversions': self.conversions,
+                'restarts': self.restarts, 'mode': 'uno' if self.use_uno else 'cli'}
+
+
+class ConverterPool:
+    """转换进程池与共享队列；首次提交时才启动进程，不影响Web进程启动"""
+
+    def __init__(self, size=POOL_SIZE, timeout=CONVERT_TIMEOUT, max_conversions=MAX_CONVERSIONS,
+                 cache_max_bytes=CACHE_MAX_BYTES):
+        self.size = size
+        self.timeout = timeout
+        self.max_conversions = max_conversions
+        self.cache_max_bytes = cache_max_bytes
+        self._queue = queue.Queue()
+        self._workers = []
+        self._inflight = {}
+        # 正在链接到任务目录的缓存文件，淘汰缓存时跳过
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self._stats = {'conversions': 0, 'cache_hits': 0, 'failures': 0, 'seconds': 0.0}
+
+    def configure(self, workers=None, timeout=None, max_conversions=None, cache_max_mb=None):
+        """应用配置（需在首次转换前调用）"""
+        if workers:
+            self.size = int(workers)
+        if timeout:
+            self.timeout = float(timeout)
+        if max_conversions:
+            self.max_conversions = int(max_conversions)
+        if cache_max_mb:
+            self.cache_max_bytes = int(cache_max_mb) * 1024 * 1024
+
+    def apply_config(self, options):
+        """应用 config.json 中的 converter 段；未知字段和无效值只打印警告，保留默认配置"""
+        if not isinstance(options, dict):
+            print(f"⚠️  转换配置应为对象，已忽略: {options!r}")
+            return
+        unknown = sorted(set(options) - set(CONFIG_KEYS))
+        if unknown:
+            print(f"⚠️  忽略未知的转换配置字段: {', '.join(unknown)}")
+        for key in CONFIG_KEYS:
+            if key in options:
+                try:
+                    self.configure(**{key: options[key]})
+                except (TypeError, ValueError):
+                    print(f"⚠️  转换配置 {key} 的值无效，已忽略: {options[key]!r}")
+
+    @property
+    def available(self):
+        return find_soffice() is not None
+
+    @property
+    def mode(self):
+        """uno：常驻转换进程；cli：每次转换启动 soffice（未安装 Python-UNO 绑定）"""
+        return 'uno' if _uno_available() else 'cli'
+
+    def _ensure_started(self):
+        if self._workers:
+            return
+        soffice = find_soffice()
+        if not soffice:
+            raise ConversionError('未安装 LibreOffice（soffice）')
+        use_uno = _uno_available()
+        if not use_uno:
+            print("⚠️  未找到 Python-UNO 绑定，文档转换使用 cli 模式（每次转换启动 soffice，没有常驻进程）")
+        atexit.register(self.shutdown)
+        for index in range(self.size):
+            worker = ConverterWorker(index, soffice, use_uno)
+            self._workers.append(worker)
+            threading.Thread(target=self._run, args=(worker,), name=f'converter-{index}',
+                             daemon=True).start()
+
+    def _cache_path(self, digest):
+        return os.path.join(CACHE_DIR, f'{digest}.pdf')
+
+    def submit(self, file_path):
+        """提交转换，返回 Future（结果为缓存中的PDF路径）；相同内容的并发提交只转换一次"""
+        digest = file_digest(file_path)
+        cached = self._cache_path(digest)
+        with self._lock:
+            if os.path.exists(cached):
+                os.utime(cached)
+                self._stats['cache_hits'] += 1
+                future = Future()
+                future.set_result(cached)
+                return future
+            if digest in self._inflight:
+                return self._inflight[digest]
+            self._ensure_started()
+            future = Future()
+            self._inflight[digest] = future
+        self._queue.put((digest, file_path, future))
+        return future
+
+    def _pin(self, digest, delta):
+        with self._lock:
+            count = self._pinned.get(digest, 0) + delta
+            if count > 0:
+                self._pinned[digest] = count
+            else:
+                self._pinned.pop(digest, None)
+
+    def convert(self, file_path):
+        """转换为PDF并返回任务使用的路径（与上传文件同名，链接到缓存中的PDF）"""
+        target = converted_path(file_path)
+        os.makedirs(CONVERTED_DIR, exist_ok=True)
+        digest = file_digest(file_path)
+        self._pin(digest, 1)
+        try:
+            # 缓存文件在提交和链接之间仍可能被其他进程淘汰，此时重新转换一次
+            for attempt in range(2):
+                cached = self.submit(file_path).result()
+                if os.path.exists(target):
+                    return target
+                tmp = f'{target}.tmp'
+                try:
+                    _link_or_copy(cached, tmp)
+                except FileNotFoundError:
+                    continue
+                os.replace(tmp, target)
+                return target
+            raise ConversionError('转换结果已被缓存淘汰')
+        finally:
+            self._pin(digest, -1)
+
+    def _run(self, worker):
+        try:
+            worker.start()
+        except Exception as e:
+            print(f"⚠️  转换进程 {worker.index} 启动失败: {e}")
+        while True:
+            try:
+                digest, file_path, future = self._queue.get(timeout=HEALTH_INTERVAL)
+            except queue.Empty:
+                # 空闲时检查进程是否存活，异常退出的进程提前重启
+                if not worker.healthy():
+                    self._restart(worker)
+                continue
+            started = time.monotonic()
+            try:
+                if not worker.healthy() or worker.conversions >= self.max_conversions:
+                    self._restart(worker)
+                if worker.state != 'idle':
+                    raise ConversionError('转换进程不可用')
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                cached = self._cache_path(digest)
+                tmp = f'{cached}.{worker.index}.tmp'
+                try:
+                    worker.convert(file_path, tmp, self.timeout)
+                    os.replace(tmp, cached)
+                finally:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                with self._lock:
+                    self._stats['conversions'] += 1
+                    self._stats['seconds'] += time.monotonic() - started
+                self._prune_cache()
+                future.set_result(cached)
+            except Exception as e:
+                with self._lock:
+                    self._stats['failures'] += 1
+                future.set_exception(e if isinstance(e, ConversionError) else ConversionError(str(e)))
+            finally:
+                with self._lock:
+                    self._inflight.pop(digest, None)
+
+    def _restart(self, worker):
+        try:
+            worker.restart()
+        except Exception as e:
+            print(f"⚠️  转换进程 {worker.index} 重启失败: {e}")
+
+    def _prune_cache(self):
+        """缓存超过上限时按最近使用时间淘汰"""
+        try:
+            entries = [(e.stat().st_mtime, e.stat().st_size, e.path)
+                       for e in os.scandir(CACHE_DIR) if e.name.endswith('.pdf')]
+        except OSError:
+            return
+        with self._lock:
+            # 正在转换或正在链接到任务目录的结果不淘汰
+            protected = {self._cache_path(d) for d in (*self._inflight, *self._pinned)}
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.cache_max_bytes:
+                break
+            if path in protected:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+        done = stats['conversions']
+        return {
+            **stats,
+            'avg_seconds': stats['seconds'] / done if done else None,
+            'queued': self._queue.qsize(),
+            'mode': self.mode,
+            'workers': [w.snapshot() for w in self._workers],
+        }
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.stop()
+
+
+converter_pool = ConverterPool()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+处理耗时与成本预估
+不渲染页面，只读取页数、页面尺寸和文本层，结合各模型最近的单页延迟和Token统计，
+预估整份文档的耗时、Token和模型调用次数
+"""
+
+import os
+import json
+import math
+import threading
+from contextlib import contextmanager
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from page_cache import page_cache
+from preprocess import estimate_image_tokens, BASELINE_HEIGHT
+from text_layer import measure_page, choose_route, ROUTE_LOCAL, ROUTE_TEXT, ROUTE_VISION
+
+# 单页统计的持久化文件（与 config.json 同目录，清理输出时不会被删除）
+USAGE_FILE = Path(__file__).parent / 'usage_stats.json'
+
+# 每个模型、每种处理方式保留的单页样本数
+USAGE_WINDOW = 200
+
+# 样本少于该数量时使用默认值
+MIN_SAMPLES = 5
+
+# 没有历史数据时的单页默认延迟（秒），按模型名前缀匹配
+DEFAULT_PAGE_LATENCY = {'gemini': 6.0, 'gpt-4o-mini': 8.0, 'gpt-4o': 12.0}
+
+# 没有历史数据时视觉页面的默认输出Token
+DEFAULT_OUTPUT_TOKENS = 600
+
+# 系统提示约占的输入Token
+PROMPT_TOKENS = 150
+
+# 文本提示页面相对视觉页面的默认延迟比例
+TEXT_LATENCY_RATIO = 0.6
+
+# 预估接受的处理参数及其类型（客户端传入的其他参数忽略）
+ESTIMATE_OPTIONS = {
+    'select_pages': None,
+    'concurrency': int,
+    'text_layer': str,
+    'maintain_format': bool,
+    'hedge': bool,
+}
+
+
+def _default_latency(model_id):
+    name = model_id.split('/')[-1]
+    for prefix in sorted(DEFAULT_PAGE_LATENCY, key=len, reverse=True):
+        if name.startswith(prefix):
+            return DEFAULT_PAGE_LATENCY[prefix]
+    return max(DEFAULT_PAGE_LATENCY.values())
+
+
+class UsageStats:
+    """
+    按模型和处理方式（vision / text / extract）记录最近的单页Token与延迟
+
+    样本写入 USAGE_FILE，Web进程、队列工作进程和命令行共享；
+    文件被其他进程更新后下次读写前重新加载，写入时持有文件锁，多个进程同时记录不会丢失样本
+    """
+
+    def __init__(self, path=USAGE_FILE, window=USAGE_WINDOW):
+        self.path = Path(path)
+        self.window = window
+        self._samples = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _reload(self):
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._samples = {key: deque(map(tuple, values), maxlen=self.window)
+                         for key, values in data.items()}
+        self._mtime = mtime
+
+    @contextmanager
+    def _file_lock(self):
+        """跨进程的排他锁（锁定旁边的 .lock 文件，进程退出时自动释放）"""
+        with open(self.path.with_suffix('.lock'), 'a+b') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                # LK_LOCK 最多重试10秒，超时抛出 OSError
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _save(self):
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({key: list(values) for key, values in self._samples.items()}, f)
+        os.replace(tmp, self.path)
+        self._mtime = self.path.stat().st_mtime
+
+    def record_pages(self, pages, kind=None):
+        """
+        记录本次实际调用模型的页面（跳过本地转换、空白、重复和续跑读取的页面）
+
+        kind 指定时所有页面记在该处理方式下（如结构化提取），不与 Markdown 模式的样本混在一起
+        """
+        kinds = {'ok': ROUTE_VISION, 'text_prompt': ROUTE_TEXT}
+        rows = [(f'{p.model}|{kind or kinds[p.status]}', (p.input_tokens, p.output_tokens, p.latency))
+                for p in pages if p.status in kinds and p.model]
+        if not rows:
+            return
+        with self._lock:
+            try:
+                with self._file_lock():
+                    # 持锁后重新加载，在其他进程最新写入的基础上追加
+                    self._reload()
+                    for key, row in rows:
+                        self._samples.setdefault(key, deque(maxlen=self.window)).append(row)
+                    self._save()
+            except OSError as e:
+                print(f"⚠️  保存单页统计失败: {e}")
+
+    def summary(self, model_id, kind=ROUTE_VISION):
+        """单页平均输入/输出Token与延迟分位数；样本不足时返回None"""
+        with self._lock:
+            self._reload()
+            samples = list(self._samples.get(f'{model_id}|{kind}', ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        count = len(samples)
+        latencies = sorted(s[2] for s in samples)
+        return {
+            'samples': count,
+            'input_tokens': sum(s[0] for s in samples) / count,
+            'output_tokens': sum(s[1] for s in samples) / count,
+            'p50_latency': latencies[count // 2],
+            'p95_latency': latencies[min(count - 1, int(0.95 * count))],
+        }
+
+
+usage_stats = UsageStats()
+
+
+@dataclass
+class PageInfo:
+    """不渲染即可得到的页面信息"""
+    page: int
+    # PDF 为磅，图片为像素
+    width: float
+    height: float
+    # PDF文本层评估结果，图片或解析失败时为None
+    text: object = None
+
+    @property
+    def has_text_layer(self):
+        return bool(self.text and self.text.chars)
+
+
+def _inspect(file_path):
+    if not file_path.lower().endswith('.pdf'):
+        from PIL import Image
+        pages = []
+        with Image.open(file_path) as image:
+            # 只读取各帧的文件头，不解码像素
+            for index in range(getattr(image, 'n_frames', 1)):
+                image.seek(index)
+                pages.append(PageInfo(page=index + 1, width=image.width, height=image.height))
+        return pages
+
+    from PyPDF2 import PdfReader
+    reader = PdfReader(file_path)
+    pages = []
+    for index, page in enumerate(reader.pages):
+        width, height = float(page.mediabox.width), float(page.mediabox.height)
+        try:
+            text = measure_page(page, index + 1)
+        except Exception:
+            # 个别页面文本层解析失败时按视觉页面估算
+            text = None
+        pages.append(PageInfo(page=index + 1, width=width, height=height, text=text))
+    return pages
+
+
+def inspect_file(file_path):
+    """读取页数、页面尺寸和文本层；刚上传的文件结果会缓存"""
+    return page_cache.get_or_compute(
+        'inspect', file_path, (), lambda: _inspect(file_path),
+        lambda pages: sum(len(p.text.text) if p.text else 0 for p in pages) + 200 * len(pages))
+
+
+def describe_pages(pages):
+    """页面概况：页数、含文本层的页数、扫描页数和页面尺寸分布"""
+    sizes = {}
+    for p in pages:
+        size = (round(p.width), round(p.height))
+        sizes[size] = sizes.get(size, 0) + 1
+    return {
+        'page_count': len(pages),
+        'text_layer_pages': [p.page for p in pages if p.has_text_layer],
+        'scanned_pages': [p.page for p in pages if p.text and p.text.scanned],
+        'page_sizes': [{'width': w, 'height': h, 'pages': n}
+                       for (w, h), n in sorted(sizes.items(), key=lambda item: -item[1])],
+    }
+
+
+def _vision_usage(model_id, pages):
+    history = usage_stats.summary(model_id, ROUTE_VISION)
+    if history:
+        per_page = history['input_tokens']
+        return (per_page * len(pages), history['output_tokens'] * len(pages),
+                history['p50_latency'], history['p95_latency'], history['samples'])
+    # 没有历史数据时按 zerox 固定密度基线估算（开启预处理时实际通常更少）
+    input_tokens = sum(
+        estimate_image_tokens(max(1, int(BASELINE_HEIGHT * p.width / p.height)), BASELINE_HEIGHT, model_id)
+        + PROMPT_TOKENS for p in pages)
+    latency = _default_latency(model_id)
+    return input_tokens, DEFAULT_OUTPUT_TOKENS * len(pages), latency, latency * 2, 0
+
+
+def _text_usage(model_id, pages):
+    # 文本提示的Token随页面文本长度变化，按实际文本估算；延迟优先使用历史数据
+    input_tokens = sum(len(p.text.text) // 4 + PROMPT_TOKENS for p in pages)
+    output_tokens = sum(len(p.text.text) // 4 for p in pages)
+    history = usage_stats.summary(model_id, ROUTE_TEXT)
+    if history:
+        return input_tokens, output_tokens, history['p50_latency'], history['p95_latency'], history['samples']
+    latency = _default_latency(model_id) * TEXT_LATENCY_RATIO
+    return input_tokens, output_tokens, latency, latency * 2, 0
+
+
+def estimate_pages(pages, model_id, concurrency=10, text_layer='off', maintain_format=False,
+                   hedge=True):
+    """
+    预估处理所选页面的耗时、Token和调用次数
+
+    空白页和重复页需要渲染后才能识别，这里不扣除，结果偏保守
+    """
+    from hedging import metrics as call_metrics
+
+    routes = {ROUTE_VISION: [], ROUTE_TEXT: [], ROUTE_LOCAL: []}
+    for p in pages:
+        route = ROUTE_VISION
+        if text_layer != 'off' and p.text:
+            route = choose_route(p.text, model_id, allow_local=(text_layer == 'hybrid'))
+        routes[route].append(p)
+
+    usages = [usage(model_id, routes[route])
+              for route, usage in ((ROUTE_VISION, _vision_usage), (ROUTE_TEXT, _text_usage))
+              if routes[route]]
+    calls = len(routes[ROUTE_VISION]) + len(routes[ROUTE_TEXT])
+    input_tokens = sum(u[0] for u in usages)
+    output_tokens = sum(u[1] for u in usages)
+
+    # 按调用数加权的单页延迟，页面按并发数分批完成
+    weights = [len(routes[ROUTE_VISION]), len(routes[ROUTE_TEXT])]
+    weights = [w for w in weights if w]
+    p50 = sum(u[2] * w for u, w in zip(usages, weights)) / calls if calls else 0.0
+    p95 = max((u[3] for u in usages), default=0.0)
+    parallel = 1 if maintain_format else max(1, min(int(concurrency), calls or 1))
+    waves = math.ceil(calls / parallel) if calls else 0
+
+    # 对冲请求会额外发出调用，按本进程最近的对冲率估算
+    hedge_rate = call_metrics.snapshot()['hedge_rate'] if hedge else 0.0
+    return {
+        'model': model_id,
+        'pages': len(pages),
+        'routes': {'vision': len(routes[ROUTE_VISION]), 'text_prompt': len(routes[ROUTE_TEXT]),
+                   'local': len(routes[ROUTE_LOCAL])},
+        'input_tokens': int(input_tokens),
+        'output_tokens': int(output_tokens),
+        'api_calls': int(round(calls * (1 + hedge_rate))),
+        # 前面几批按中位延迟完成，最后一批受最慢页面拖累
+        'seconds': (waves - 1) * p50 + p95 if waves else 0.0,
+        'seconds_fast': waves * p50,
+        'history_samples': sum(u[4] for u in usages),
+    }
+
+
+def estimate_file(file_path, models, options=None):
+    """预估一个文件在各模型下的处理耗时与成本，返回 (页面概况, {模型: 预估})"""
+    from ocr_pipeline import resolve_pages, supports_pipeline
+
+    if not supports_pipeline(file_path):
+        raise ValueError('仅支持预估PDF和图片文件')
+    options = _estimate_options(options)
+    select_pages = options.pop('select_pages', None)
+    pages = inspect_file(file_path)
+    selected = set(resolve_pages(select_pages, len(pages)))
+    chosen = [p for p in pages if p.page in selected]
+    return describe_pages(pages), {model: estimate_pages(chosen, model, **options) for model in models}
+
+
+def _estimate_options(options):
+    """只保留预估用到的参数并检查类型；参数无效时抛出 ValueError"""
+    if options is None:
+        return {}
+    if not isinstance(options, dict):
+        raise ValueError('options 必须是对象')
+    checked = {}
+    for name, kind in ESTIMATE_OPTIONS.items():
+        value = options.get(name)
+        if value is None:
+            continue
+        if kind is int:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'参数 {name} 必须是整数')
+        elif kind is not None and not isinstance(value, kind):
+            raise ValueError(f'参数 {name} 类型无效')
+        checked[name] = value
+    return checked
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+批量导出处理结果
+按文件ID、文件名搜索或处理日期选择结果，边读取边压缩，以zip流直接发送给客户端；
+不在磁盘或内存中暂存整个压缩包，客户端读取多快就生成多快
+"""
+
+import os
+import zipfile
+from datetime import datetime, timedelta
+
+from checkpoint import CHECKPOINT_DIR, MANIFEST_FILE
+from result_pages import INDEX_FILE, JSONL_INDEX_FILE, PageLines, jsonl_name
+from extraction import EXTRACTION_FILE
+
+# 每次读取和发送的块大小
+EXPORT_CHUNK = 64 * 1024
+
+# 随 include_trace 导出的任务记录
+TRACE_FILES = (MANIFEST_FILE, INDEX_FILE)
+
+
+class ExportError(ValueError):
+    """导出条件有误"""
+
+
+def parse_date(value, end=False):
+    """解析 YYYY-MM-DD；end 为 True 时返回当天结束时刻（日期范围含两端）"""
+    if not value:
+        return None
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ExportError(f'日期格式应为 YYYY-MM-DD: {value}')
+    return (day + timedelta(days=1)).timestamp() if end else day.timestamp()
+
+
+class _ChunkSink:
+    """zipfile 的输出目标：只追加不可回退，写入的数据由生成器取走"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _result_markdown(path):
+    """输出目录中的Markdown文件；没有结果时返回None"""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith('.md'):
+                return entry
+    return None
+
+
+def result_dir(output_folder, file_id):
+    """
+    文件ID对应的输出目录；ID含路径分隔符或 ..、或目录不在输出目录内时返回None
+
+    file_ids 来自请求体或查询参数，不能像路由参数那样保证不含 /
+    """
+    if not file_id or '/' in file_id or '\\' in file_id or '..' in file_id:
+        return None
+    path = os.path.join(output_folder, file_id.replace('.', '_'))
+    root = os.path.realpath(output_folder)
+    if os.path.dirname(os.path.realpath(path)) != root:
+        # 输出目录中指向外部的符号链接
+        return None
+    return path
+
+
+def select_results(output_folder, file_ids=None, query=None, date_from=None, date_to=None):
+    """
+    逐个产出符合条件的结果 (目录名, 目录路径, Markdown)
+
+    指定 file_ids 时直接定位对应目录，否则扫描一遍输出目录；query 匹配文件名（不区分大小写），
+    日期范围按结果生成时间筛选。以生成器返回，结果再多也不会一次载入内存
+    """
+    query = (query or '').lower()
+
+    def matches(name, markdown):
+        if query and query not in name.lower():
+            return False
+        mtime = markdown.stat().st_mtime
+        return (date_from is None or mtime >= date_from) and (date_to is None or mtime < date_to)
+
+    if file_ids:
+        for file_id in file_ids:
+            path = result_dir(output_folder, str(file_id))
+            markdown = _result_markdown(path) if path and os.path.isdir(path) else None
+            if markdown and matches(os.path.basename(path), markdown):
+                yield os.path.basename(path), path, markdown
+        return
+
+    if not os.path.isdir(output_folder):
+        return
+    with os.scandir(output_folder) as entries:
+        for entry in entries:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            markdown = _result_markdown(entry.path)
+            if markdown and matches(entry.name, markdown):
+                yield entry.name, entry.path, markdown
+
+
+def _result_files(name, path, markdown, include_pages, include_trace):
+    """一个结果要导出的 (压缩包内路径, 文件路径)"""
+    yield f'{name}/{markdown.name}', markdown.path
+    extraction = os.path.join(path, EXTRACTION_FILE)
+    if os.path.exists(extraction):
+        yield f'{name}/{EXTRACTION_FILE}', extraction
+    if include_pages and PageLines.exists(path):
+        # 每页一行的结果及其偏移索引；数据文件按索引头中的代号选取，与索引成对
+        index_path = os.path.join(path, JSONL_INDEX_FILE)
+        try:
+            generation, _ = PageLines.read_header(index_path)
+        except (OSError, ValueError):
+            generation = None
+        if generation is not None:
+            yield f'{name}/{JSONL_INDEX_FILE}', index_path
+            yield f'{name}/{jsonl_name(generation)}', os.path.join(path, jsonl_name(generation))
+    elif include_pages:
+        # 早先的结果没有每页JSON，导出断点中的每页JSON
+        pages_dir = os.path.join(path, CHECKPOINT_DIR)
+        if os.path.isdir(pages_dir):
+            for page in sorted(os.listdir(pages_dir)):
+                if page.startswith('page_') and page.endswith('.json'):
+                    yield f'{name}/{CHECKPOINT_DIR}/{page}', os.path.join(pages_dir, page)
+    if include_trace:
+        for trace in TRACE_FILES:
+            trace_path = os.path.join(path, trace)
+            if os.path.exists(trace_path):
+                yield f'{name}/{trace}', trace_path
+
+
+def stream_zip(results, include_pages=False, include_trace=False, chunk_size=EXPORT_CHUNK):
+    """
+    把选中的结果写成zip流，逐块产出压缩后的数据
+
+    每次只读取一个块，产出后等客户端取走才继续读下一块，内存占用与结果数量和大小无关
+    （只有zip末尾的中央目录随文件数增长，每个文件约几百字节）
+    """
+    sink = _ChunkSink()
+    count = 0
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, path, markdown in results:
+            for arcname, file_path in _result_files(name, path, markdown, include_pages, include_trace):
+                try:
+                    info = zipfile.ZipInfo.from_file(file_path, arcname)
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    with open(file_path, 'rb') as src, archive.open(info, 'w') as dest:
+                        while True:
+                            block = src.read(chunk_size)
+                            if not block:
+                                break
+                            dest.write(block)
+                            data = sink.drain()
+                            if data:
+                                yield data
+                except FileNotFoundError:
+                    # 导出过程中结果被清理，跳过该文件
+                    continue
+            count += 1
+        if not count:
+            archive.writestr('EMPTY.txt', '没有符合条件的处理结果\n')
+    # 剩余的压缩数据和中央目录
+    yield sink.drain()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+结构化字段提取
+按JSON Schema只让模型输出需要的字段（不再转写整页Markdown），逐页提取后合并，
+记录每个字段来自哪一页并按Schema校验；常用Schema按名称保存在 schemas/ 目录中复用
+"""
+
+import re
+import json
+from pathlib import Path
+
+from estimator import usage_stats
+
+# 已保存的Schema目录
+SCHEMA_DIR = Path(__file__).parent / 'schemas'
+
+# Schema名称：小写字母、数字、下划线和连字符
+_SCHEMA_NAME = re.compile(r'^[a-z0-9_\-]{1,64}$')
+
+# 提取模式的页面处理方式（用于单页统计，与 Markdown 模式的 vision / text 区分）
+EXTRACT_KIND = 'extract'
+
+# 提取结果文件名
+EXTRACTION_FILE = 'extraction.json'
+
+EXTRACTION_PROMPT = (
+    "You extract structured fields from one page of a document.\n"
+    "Return only a single JSON object whose keys are the top-level properties of the JSON schema below. "
+    "Do not return markdown, code fences or any explanation.\n"
+    "Use null for fields that do not appear on this page. Copy identifiers exactly as printed. "
+    "Write dates as YYYY-MM-DD and amounts as plain numbers without currency symbols or thousands separators. "
+    "For array fields, return only the items that appear on this page.\n\n"
+    "JSON schema:\n{schema}"
+)
+
+EXTRACTION_TEXT_PROMPT = (
+    "The following text was extracted from the text layer of one PDF page. "
+    "Line breaks and column order may be imperfect. Extract the fields following the rules above."
+)
+
+_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_JSON_FENCE = re.compile(r'^```(?:json)?\s*\n?|\n?```\s*$')
+_TYPES = {
+    'string': (str,), 'boolean': (bool,), 'object': (dict,), 'array': (list,), 'null': (type(None),),
+    'number': (int, float), 'integer': (int,),
+}
+
+
+class SchemaError(ValueError):
+    """Schema 不合法"""
+
+
+def check_schema(schema):
+    """提取用的Schema必须是顶层带 properties 的 object"""
+    if not isinstance(schema, dict) or schema.get('type') != 'object':
+        raise SchemaError('Schema 顶层必须是 type 为 object 的对象')
+    properties = schema.get('properties')
+    if not isinstance(properties, dict) or not properties:
+        raise SchemaError('Schema 必须包含非空的 properties')
+    return schema
+
+
+def _schema_path(name):
+    if not _SCHEMA_NAME.match(name or ''):
+        raise SchemaError(f'Schema 名称只能包含小写字母、数字、下划线和连字符: {name}')
+    return SCHEMA_DIR / f'{name}.json'
+
+
+def load_schema(name):
+    """按名称读取已保存的Schema；不存在时抛出 FileNotFoundError"""
+    path = _schema_path(name)
+    if not path.exists():
+        raise FileNotFoundError(f'Schema 不存在: {name}')
+    with open(path, 'r', encoding='utf-8') as f:
+        return check_schema(json.load(f))
+
+
+def save_schema(name, schema):
+    path = _schema_path(name)
+    check_schema(schema)
+    SCHEMA_DIR.mkdir(exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(schema, f, ensure_ascii=False, indent=2)
+
+
+def list_schemas():
+    """已保存的Schema概要"""
+    schemas = []
+    for path in sorted(SCHEMA_DIR.glob('*.json')):
+        try:
+            schema = load_schema(path.stem)
+        except (ValueError, SchemaError):
+            continue
+        schemas.append({
+            'name': path.stem,
+            'title': schema.get('title', path.stem),
+            'description': schema.get('description', ''),
+            'fields': list(schema['properties']),
+        })
+    return schemas
+
+
+def resolve_schema(value):
+    """process 参数中的 schema：字符串按名称读取，对象直接使用"""
+    if isinstance(value, str):
+        return load_schema(value)
+    return check_schema(value)
+
+
+def build_prompt(schema, custom_prompt=None):
+    prompt = EXTRACTION_PROMPT.format(schema=json.dumps(schema, ensure_ascii=False, indent=2))
+    if custom_prompt:
+        prompt += f'\n\nAdditional instructions:\n{custom_prompt}'
+    return prompt
+
+
+def parse_page(content):
+    """解析单页模型输出的JSON对象"""
+    text = _JSON_FENCE.sub('', (content or '').strip())
+    if not text:
+        return {}
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError('模型输出不是JSON对象')
+    return data
+
+
+def _coerce(value, prop):
+    """模型常把金额写成带货币符号或千分位的字符串，按Schema类型转换"""
+    kind = prop.get('type')
+    if kind in ('number', 'integer') and isinstance(value, str):
+        cleaned = re.sub(r'[^\d.\-]', '', value)
+        try:
+            number = float(cleaned)
+        except ValueError:
+            return value
+        return int(number) if kind == 'integer' and number.is_integer() else number
+    if kind == 'array' and isinstance(value, list):
+        return [_coerce(item, prop.get('items', {})) for item in value]
+    if kind == 'object' and isinstance(value, dict):
+        props = prop.get('properties', {})
+        return {k: _coerce(v, props.get(k, {})) for k, v in value.items()}
+    return value
+
+
+def _validate_subset(value, schema, path):
+    """常用关键字的校验：type、enum、required、properties、items、pattern、format(date)、minimum/maximum"""
+    errors = []
+    kind = schema.get('type')
+    if kind:
+        kinds = kind if isinstance(kind, list) else [kind]
+        expected = tuple(t for k in kinds for t in _TYPES.get(k, (object,)))
+        if isinstance(value, bool) and 'boolean' not in kinds:
+            return [f'{path}: 应为 {kind}']
+        if not isinstance(value, expected):
+            return [f'{path}: 应为 {kind}']
+    if 'enum' in schema and value not in schema['enum']:
+        errors.append(f'{path}: 不在可选值 {schema["enum"]} 中')
+    if isinstance(value, str):
+        if 'pattern' in schema and not re.search(schema['pattern'], value):
+            errors.append(f'{path}: 不匹配 {schema["pattern"]}')
+        if schema.get('format') == 'date' and not _DATE.match(value):
+            errors.append(f'{path}: 日期格式应为 YYYY-MM-DD')
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if 'minimum' in schema and value < schema['minimum']:
+            errors.append(f'{path}: 小于 {schema["minimum"]}')
+        if 'maximum' in schema and value > schema['maximum']:
+            errors.append(f'{path}: 大于 {schema["maximum"]}')
+    if isinstance(value, dict):
+        for name in schema.get('required', []):
+            if value.get(name) is None:
+                errors.append(f'{path}.{name}: 缺少必填字段')
+        for name, prop in schema.get('properties', {}).items():
+            if value.get(name) is not None:
+                errors.extend(_validate_subset(value[name], prop, f'{path}.{name}'))
+    if isinstance(value, list) and 'items' in schema:
+        for index, item in enumerate(value):
+            errors.extend(_validate_subset(item, schema['items'], f'{path}[{index}]'))
+    return errors
+
+
+def validate(value, schema):
+    """按Schema校验，返回错误列表；安装了 jsonschema 时使用完整实现"""
+    try:
+        import jsonschema
+    except ImportError:
+        return _validate_subset(value, schema, '$')
+    validator = jsonschema.Draft7Validator(schema, format_checker=jsonschema.FormatChecker())
+    return [f'$.{".".join(str(p) for p in e.absolute_path)}: {e.message}'.replace('$.:', '$:')
+            for e in validator.iter_errors(value)]
+
+
+def merge_pages(pages, schema):
+    """
+    合并各页的提取结果
+
+    标量字段取最先出现的非空值，数组字段按页码顺序拼接；pages 记录每个字段来自的页码
+    """
+    properties = schema['properties']
+    fields, sources, page_errors = {}, {}, {}
+    for page in pages:
+        if page.status in ('blank', 'duplicate'):
+            continue
+        try:
+            data = parse_page(page.content)
+        except ValueError as e:
+            page_errors[page.page] = f'无法解析模型输出: {e}'
+            continue
+        for name, prop in properties.items():
+            value = data.get(name)
+            if value is None or value == '' or value == []:
+                continue
+            value = _coerce(value, prop)
+            if prop.get('type') == 'array':
+                items = value if isinstance(value, list) else [value]
+                fields.setdefault(name, []).extend(items)
+                sources.setdefault(name, []).extend([page.page] * len(items))
+            elif name not in fields:
+                fields[name] = value
+                sources[name] = page.page
+
+    # 未找到的字段为 null，校验时不作为类型错误（必填字段另行报告）
+    errors = validate({k: v for k, v in fields.items() if v is not None}, schema)
+    return {
+        'fields': {name: fields.get(name) for name in properties},
+        'pages': sources,
+        'valid': not errors and not page_errors,
+        'errors': errors,
+        'page_errors': page_errors,
+    }
+
+
+def compare_with_markdown(pages, model):
+    """本次提取的单页输出Token和延迟，与该模型最近 Markdown 模式的单页统计对比"""
+    called = [p for p in pages if p.status in ('ok', 'text_prompt') and p.model]
+    if not called:
+        return None
+    count = len(called)
+    latencies = sorted(p.latency for p in called)
+    current = {
+        'pages': count,
+        'output_tokens': sum(p.output_tokens for p in called) / count,
+        'p50_latency': latencies[count // 2],
+    }
+    baseline = usage_stats.summary(model)
+    comparison = {'extraction': current, 'markdown': None}
+    if baseline:
+        comparison['markdown'] = {k: baseline[k] for k in ('samples', 'output_tokens', 'p50_latency')}
+        if current['output_tokens']:
+            comparison['output_token_reduction'] = baseline['output_tokens'] / current['output_tokens']
+        if current['p50_latency']:
+            comparison['latency_speedup'] = baseline['p50_latency'] / current['p50_latency']
+    return comparison
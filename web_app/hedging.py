@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+对冲请求与跨提供商故障转移
+单页调用超过历史延迟分位数时再发一个相同（或备用模型）的请求，先返回者胜出，另一个取消；
+遇到 5xx、超时或配额错误时自动切换到配置的备用提供商
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+# 单次模型调用超时（秒）
+CALL_TIMEOUT = 120
+
+# 默认对冲分位数
+DEFAULT_PERCENTILE = 0.95
+
+# 对冲等待的下限（秒），延迟分布很集中时避免几乎每次都对冲
+MIN_HEDGE_DELAY = 2.0
+
+# 样本不足时不对冲，避免冷启动阶段误判
+MIN_SAMPLES = 20
+
+# 每个模型保留的延迟样本数
+LATENCY_WINDOW = 500
+
+# 视为可以故障转移的错误
+_FAILOVER_STATUS = {408, 429, 500, 502, 503, 504, 529}
+_FAILOVER_NAMES = ('ratelimit', 'timeout', 'serviceunavailable', 'internalserver',
+                   'apiconnection', 'quota', 'resource_exhausted', 'overloaded')
+
+
+class LatencyTracker:
+    """按模型记录最近的调用延迟"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self._window)).append(seconds)
+
+    def percentile(self, model, q, min_samples=MIN_SAMPLES):
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def export(self):
+        """导出各模型的延迟样本，用于在子进程中预热"""
+        with self._lock:
+            return {model: list(samples) for model, samples in self._samples.items()}
+
+    def load(self, samples):
+        """用导出的样本替换当前样本"""
+        with self._lock:
+            self._samples = {model: deque(values, maxlen=self._window)
+                             for model, values in samples.items()}
+
+    def snapshot(self):
+        with self._lock:
+            models = list(self._samples)
+        return {
+            model: {
+                'samples': len(self._samples[model]),
+                'p50': self.percentile(model, 0.5, 1),
+                'p95': self.percentile(model, 0.95, 1),
+                'p99': self.percentile(model, 0.99, 1),
+            }
+            for model in models
+        }
+
+
+class CallMetrics:
+    """调用计数；parent 不为空时同时累加到全局计数"""
+
+    FIELDS = ('calls', 'hedged', 'hedge_wins', 'failovers', 'failover_success', 'errors')
+
+    def __init__(self, parent=None):
+        self._parent = parent
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+        self._lock = threading.Lock()
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self._counts[name] += n
+        if self._parent:
+            self._parent.incr(name, n)
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        calls = counts['calls'] or 1
+        counts['hedge_rate'] = counts['hedged'] / calls
+        counts['failover_rate'] = counts['failovers'] / calls
+        return counts
+
+
+# 进程级统计，所有任务共享
+latency_tracker = LatencyTracker()
+metrics = CallMetrics()
+
+
+def is_failover_error(exc):
+    """5xx、超时、配额/限流错误可以切换提供商重试"""
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    status = getattr(exc, 'status_code', None)
+    if status in _FAILOVER_STATUS:
+        return True
+    text = f'{type(exc).__name__} {exc}'.lower()
+    return any(name in text for name in _FAILOVER_NAMES)
+
+
+async def _timed(call, model, timeout):
+    """执行一次调用并记录延迟"""
+    started = time.monotonic()
+    try:
+        result = await asyncio.wait_for(call(model), timeout)
+    except asyncio.CancelledError:
+        # 被对冲请求取消时实际延迟至少为已等待的时间，作为下界记录，避免分位数被拉低
+        latency_tracker.record(model, time.monotonic() - started)
+        raise
+    latency_tracker.record(model, time.monotonic() - started)
+    return result
+
+
+async def hedged_call(call, model, hedge_model=None, percentile=DEFAULT_PERCENTILE,
+                      timeout=CALL_TIMEOUT, job_metrics=None):
+    """
+    发起调用；超过该模型历史延迟分位数仍未返回时发出对冲请求
+
+    call(model) 返回协程；返回 (结果, 实际应答的模型)
+    """
+    job_metrics = job_metrics or metrics
+    job_metrics.incr('calls')
+    primary = asyncio.ensure_future(_timed(call, model, timeout))
+    tasks = {primary: model}
+
+    pending, error = set(tasks), None
+    try:
+        delay = latency_tracker.percentile(model, percentile) if percentile else None
+        if delay is not None:
+            done, _ = await asyncio.wait({primary}, timeout=max(delay, MIN_HEDGE_DELAY))
+            if not done:
+                backup_model = hedge_model or model
+                job_metrics.incr('hedged')
+                backup = asyncio.ensure_future(_timed(call, backup_model, timeout))
+                tasks[backup] = backup_model
+                pending.add(backup)
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        job_metrics.incr('hedge_wins')
+                    return task.result(), tasks[task]
+                error = task.exception()
+    finally:
+        for task in pending:
+            task.cancel()
+    job_metrics.incr('errors')
+    raise error
+
+
+async def resilient_call(call, model, failover_model=None, hedge=True, hedge_model=None,
+                         percentile=DEFAULT_PERCENTILE, timeout=CALL_TIMEOUT, job_metrics=None):
+    """对冲调用，主提供商出现可恢复错误时切换到备用提供商"""
+    job_metrics = job_metrics or metrics
+    percentile = percentile if hedge else None
+    try:
+        return await hedged_call(call, model, hedge_model, percentile, timeout, job_metrics)
+    except Exception as exc:
+        if not failover_model or failover_model == model or not is_failover_error(exc):
+            raise
+        job_metrics.incr('failovers')
+        result = await hedged_call(call, failover_model, None, percentile, timeout, job_metrics)
+        job_metrics.incr('failover_success')
+        return result
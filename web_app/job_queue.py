@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+持久化任务队列与结果存储
+多个Web实例和后台工作进程共享同一个队列：工作进程以租约方式领取任务，
+租约在可见性超时内没有续期（进程崩溃、节点失联）的任务会重新排队，超过最大尝试次数后标记失败。
+后端：SQLite（单机或共享文件系统）和 Redis 协议（redis-py 客户端，可连接 Redis/Valkey 或 fakeredis 等替身）
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+
+from settings import OUTPUT_FOLDER
+from scheduler import FairPolicy, LaneMetrics, Ticket, LANES, DEFAULT_LANE
+
+# 任务状态
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+
+# 租约可见性超时（秒）：超过该时间未续期的任务视为被遗弃
+VISIBILITY_TIMEOUT = 300
+
+# 每个任务最多尝试的次数（含被遗弃后的重试）
+MAX_ATTEMPTS = 3
+
+# 默认的SQLite队列放在输出目录中（多节点时输出目录为共享存储）
+DEFAULT_QUEUE_URL = f"sqlite:///{os.path.join(OUTPUT_FOLDER, 'jobs.db')}"
+
+# 领取时每个通道参与公平调度的最早排队任务数
+LEASE_CANDIDATES = 100
+
+
+@dataclass
+class Job:
+    """队列中的任务及其结果"""
+    id: str
+    payload: dict
+    status: str = STATUS_QUEUED
+    attempts: int = 0
+    max_attempts: int = MAX_ATTEMPTS
+    lane: str = DEFAULT_LANE
+    client: str = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    lease_owner: str = None
+    lease_expires: float = None
+    result: dict = None
+    error: str = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def new_job_id():
+    """全局唯一的任务ID，不依赖节点"""
+    return uuid.uuid4().hex
+
+
+class JobQueue:
+    """
+    队列接口
+
+    所有修改租约的方法都要求 worker_id 与当前租约持有者一致，
+    租约已过期并被其他工作进程领走时返回 False，避免旧进程覆盖新结果
+    """
+
+    def __init__(self, visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS, policy=None):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        # 公平调度状态保存在本进程内，各节点分别按同一策略领取
+        self.policy = policy or FairPolicy()
+        self.lane_metrics = LaneMetrics()
+
+    def enqueue(self, payload, job_id=None, lane=DEFAULT_LANE, client=None):
+        raise NotImplementedError
+
+    def lease(self, worker_id, visibility_timeout=None):
+        """按优先级通道和客户端公平领取任务（会先回收过期租约）；没有任务时返回None"""
+        raise NotImplementedError
+
+    def lane_depths(self):
+        """各通道排队中的任务数"""
+        raise NotImplementedError
+
+    def lane_stats(self):
+        return self.lane_metrics.snapshot(self.lane_depths())
+
+    def heartbeat(self, job_id, worker_id, visibility_timeout=None):
+        """续期租约"""
+        raise NotImplementedError
+
+    def complete(self, job_id, worker_id, result):
+        raise NotImplementedError
+
+    def fail(self, job_id, worker_id, error, retry=True):
+        """任务失败；retry 为真且未超过最大尝试次数时重新排队"""
+        raise NotImplementedError
+
+    def get(self, job_id):
+        raise NotImplementedError
+
+    def list_jobs(self, limit=50):
+        """按创建时间倒序列出任务"""
+        raise NotImplementedError
+
+    def _timeout(self, visibility_timeout):
+        return visibility_timeout or self.visibility_timeout
+
+    def _choose(self, candidates):
+        """从 [(任务ID, 通道, 客户端, 入队时间)] 中选出下一个任务并记录等待时间"""
+        tickets = [Ticket(key=job_id, lane=lane if lane in LANES else DEFAULT_LANE,
+                          client=client or None, enqueued_at=created_at)
+                   for job_id, lane, client, created_at in candidates]
+        return self.policy.select(tickets)
+
+    def _served(self, ticket):
+        self.policy.charge(ticket)
+        self.lane_metrics.record_wait(ticket.lane, time.time() - ticket.enqueued_at)
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    SQLite 后端
+    同一台机器上的多个进程可以共享；跨节点共享时数据库文件需放在支持文件锁的共享存储上
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._transaction() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    lane TEXT NOT NULL DEFAULT 'normal',
+                    client TEXT
+                )
+            """)
+            # 早期创建的数据库没有通道字段
+            columns = {row['name'] for row in db.execute('PRAGMA table_info(jobs)')}
+            if 'lane' not in columns:
+                db.execute("ALTER TABLE jobs ADD COLUMN lane TEXT NOT NULL DEFAULT 'normal'")
+                db.execute('ALTER TABLE jobs ADD COLUMN client TEXT')
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_lane ON jobs (status, lane, created_at)")
+
+    def _connection(self):
+        # sqlite3 连接不能跨线程使用，每个线程一个连接
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connection()
+        # IMMEDIATE 事务在开始时就拿到写锁，多个进程同时领取任务时不会领到同一个
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    @staticmethod
+    def _row_to_job(row):
+        if row is None:
+            return None
+        data = dict(row)
+        data['payload'] = json.loads(data['payload'])
+        data['result'] = json.loads(data['result']) if data['result'] else None
+        return Job(**data)
+
+    def enqueue(self, payload, job_id=None, lane=DEFAULT_LANE, client=None):
+        job = Job(id=job_id or new_job_id(), payload=payload, max_attempts=self.max_attempts,
+                  lane=lane, client=client)
+        with self._transaction() as db:
+            db.execute(
+                'INSERT INTO jobs (id, payload, status, attempts, max_attempts, created_at, updated_at, '
+                'lane, client) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job.id, json.dumps(payload, ensure_ascii=False), job.status, 0,
+                 job.max_attempts, job.created_at, job.updated_at, job.lane, job.client))
+        return job
+
+    def _reclaim_expired(self, db, now):
+        """回收过期租约：还能重试的重新排队，否则标记失败"""
+        db.execute(
+            'UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? '
+            'WHERE status = ? AND lease_expires < ? AND attempts < max_attempts',
+            (STATUS_QUEUED, now, STATUS_RUNNING, now))
+        db.execute(
+            'UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?, '
+            'error = ? WHERE status = ? AND lease_expires < ?',
+            (STATUS_FAILED, now, '租约多次过期，任务已放弃', STATUS_RUNNING, now))
+
+    def lease(self, worker_id, visibility_timeout=None):
+        now = time.time()
+        with self._transaction() as db:
+            self._reclaim_expired(db, now)
+            candidates = []
+            for lane in LANES:
+                candidates.extend(db.execute(
+                    'SELECT id, lane, client, created_at FROM jobs WHERE status = ? AND lane = ? '
+                    'ORDER BY created_at LIMIT ?', (STATUS_QUEUED, lane, LEASE_CANDIDATES)).fetchall())
+            ticket = self._choose([tuple(row) for row in candidates])
+            if ticket is None:
+                return None
+            db.execute(
+                'UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, '
+                'attempts = attempts + 1, updated_at = ? WHERE id = ?',
+                (STATUS_RUNNING, worker_id, now + self._timeout(visibility_timeout), now, ticket.key))
+            job = self._row_to_job(db.execute('SELECT * FROM jobs WHERE id = ?', (ticket.key,)).fetchone())
+        self._served(ticket)
+        return job
+
+    def _update_leased(self, job_id, worker_id, assignments, values):
+        with self._transaction() as db:
+            cursor = db.execute(
+                f'UPDATE jobs SET {assignments}, updated_at = ? '
+                'WHERE id = ? AND status = ? AND lease_owner = ?',
+                (*values, time.time(), job_id, STATUS_RUNNING, worker_id))
+            return cursor.rowcount == 1
+
+    def heartbeat(self, job_id, worker_id, visibility_timeout=None):
+        return self._update_leased(job_id, worker_id, 'lease_expires = ?',
+                                   (time.time() + self._timeout(visibility_timeout),))
+
+    def complete(self, job_id, worker_id, result):
+        return self._update_leased(
+            job_id, worker_id,
+            'status = ?, result = ?, error = NULL, lease_owner = NULL, lease_expires = NULL',
+            (STATUS_COMPLETED, json.dumps(result, ensure_ascii=False)))
+
+    def fail(self, job_id, worker_id, error, retry=True):
+        job = self.get(job_id)
+        status = STATUS_QUEUED if retry and job and job.attempts < job.max_attempts else STATUS_FAILED
+        return self._update_leased(
+            job_id, worker_id,
+            'status = ?, error = ?, lease_owner = NULL, lease_expires = NULL',
+            (status, str(error)))
+
+    def get(self, job_id):
+        row = self._connection().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def lane_depths(self):
+        rows = self._connection().execute(
+            'SELECT lane, COUNT(*) FROM jobs WHERE status = ? GROUP BY lane', (STATUS_QUEUED,)).fetchall()
+        return {lane: count for lane, count in rows}
+
+    def list_jobs(self, limit=50):
+        rows = self._connection().execute(
+            'SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+
+class RedisJobQueue(JobQueue):
+    """
+    Redis 协议后端
+
+    {prefix}:job:<id>  任务哈希
+    {prefix}:queued:<通道>  排队中的任务（有序集合，分值为入队时间）
+    {prefix}:leased    持有租约的任务（有序集合，分值为租约到期时间）
+    {prefix}:jobs      全部任务（有序集合，分值为创建时间，用于列表）
+
+    领取和回收用 WATCH/MULTI 乐观事务实现，不依赖 Lua 脚本，兼容只实现了基础命令的替身
+    """
+
+    def __init__(self, url=None, client=None, prefix='zerox', **kwargs):
+        super().__init__(**kwargs)
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.prefix = prefix
+        self.queued_keys = {lane: f'{prefix}:queued:{lane}' for lane in LANES}
+        self.leased_key = f'{prefix}:leased'
+        self.jobs_key = f'{prefix}:jobs'
+
+    def _job_key(self, job_id):
+        return f'{self.prefix}:job:{job_id}'
+
+    @staticmethod
+    def _encode(job):
+        data = job.to_dict()
+        data['payload'] = json.dumps(data['payload'], ensure_ascii=False)
+        data['result'] = json.dumps(data['result'], ensure_ascii=False)
+        # Redis 哈希不能存 None
+        return {k: '' if v is None else v for k, v in data.items()}
+
+    @staticmethod
+    def _text(value):
+        # 客户端未开启 decode_responses 时返回的是 bytes
+        return value.decode() if isinstance(value, bytes) else value
+
+    @classmethod
+    def _decode(cls, data):
+        if not data:
+            return None
+        data = {cls._text(k): cls._text(v) for k, v in data.items()}
+        return Job(
+            id=data['id'],
+            payload=json.loads(data['payload']),
+            status=data['status'],
+            attempts=int(data['attempts']),
+            max_attempts=int(data['max_attempts']),
+            created_at=float(data['created_at']),
+            updated_at=float(data['updated_at']),
+            lease_owner=data.get('lease_owner') or None,
+            lease_expires=float(data['lease_expires']) if data.get('lease_expires') else None,
+            lane=data.get('lane') or DEFAULT_LANE,
+            client=data.get('client') or None,
+            result=json.loads(data['result']) if data.get('result') else None,
+            error=data.get('error') or None,
+        )
+
+    def _watch_error(self):
+        from redis.exceptions import WatchError
+        return WatchError
+
+    def _queued_key(self, job):
+        return self.queued_keys.get(job.lane, self.queued_keys[DEFAULT_LANE])
+
+    def enqueue(self, payload, job_id=None, lane=DEFAULT_LANE, client=None):
+        job = Job(id=job_id or new_job_id(), payload=payload, max_attempts=self.max_attempts,
+                  lane=lane, client=client)
+        pipe = self.client.pipeline()
+        pipe.hset(self._job_key(job.id), mapping=self._encode(job))
+        pipe.zadd(self.jobs_key, {job.id: job.created_at})
+        pipe.zadd(self._queued_key(job), {job.id: job.created_at})
+        pipe.execute()
+        return job
+
+    def _reclaim_expired(self, now):
+        watch_error = self._watch_error()
+        for job_id in map(self._text, self.client.zrangebyscore(self.leased_key, '-inf', now)):
+            job_key = self._job_key(job_id)
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(self.leased_key, job_key)
+                    expires = pipe.zscore(self.leased_key, job_id)
+                    if expires is None or expires >= now:
+                        # 已被续期或已被其他进程回收
+                        continue
+                    job = self._decode(pipe.hgetall(job_key))
+                    pipe.multi()
+                    pipe.zrem(self.leased_key, job_id)
+                    if job and job.attempts < job.max_attempts:
+                        pipe.hset(job_key, mapping={'status': STATUS_QUEUED, 'lease_owner': '',
+                                                    'lease_expires': '', 'updated_at': now})
+                        pipe.zadd(self._queued_key(job), {job_id: job.created_at})
+                    elif job:
+                        pipe.hset(job_key, mapping={'status': STATUS_FAILED, 'lease_owner': '',
+                                                    'lease_expires': '', 'updated_at': now,
+                                                    'error': '租约多次过期，任务已放弃'})
+                    pipe.execute()
+                except watch_error:
+                    continue
+
+    def lease(self, worker_id, visibility_timeout=None):
+        now = time.time()
+        self._reclaim_expired(now)
+        expires = now + self._timeout(visibility_timeout)
+        watch_error = self._watch_error()
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(*self.queued_keys.values())
+                    candidates = []
+                    for lane, key in self.queued_keys.items():
+                        for job_id, score in pipe.zrange(key, 0, LEASE_CANDIDATES - 1, withscores=True):
+                            job_id = self._text(job_id)
+                            candidates.append((job_id, lane, pipe.hget(self._job_key(job_id), 'client'), score))
+                    ticket = self._choose([(j, l, self._text(c), t) for j, l, c, t in candidates])
+                    if ticket is None:
+                        return None
+                    job_id = ticket.key
+                    pipe.multi()
+                    pipe.zrem(self.queued_keys[ticket.lane], job_id)
+                    pipe.zadd(self.leased_key, {job_id: expires})
+                    pipe.hincrby(self._job_key(job_id), 'attempts', 1)
+                    pipe.hset(self._job_key(job_id), mapping={
+                        'status': STATUS_RUNNING, 'lease_owner': worker_id,
+                        'lease_expires': expires, 'updated_at': now})
+                    pipe.execute()
+                    self._served(ticket)
+                    return self.get(job_id)
+                except watch_error:
+                    # 其他进程抢先领走了同一个任务，重试
+                    continue
+
+    def _update_leased(self, job_id, worker_id, fields, release=True, requeue=False):
+        job_key = self._job_key(job_id)
+        watch_error = self._watch_error()
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(job_key)
+                job = self._decode(pipe.hgetall(job_key))
+                if not job or job.status != STATUS_RUNNING or job.lease_owner != worker_id:
+                    return False
+                pipe.multi()
+                pipe.hset(job_key, mapping={**fields, 'updated_at': time.time()})
+                if release:
+                    pipe.zrem(self.leased_key, job_id)
+                elif 'lease_expires' in fields:
+                    pipe.zadd(self.leased_key, {job_id: fields['lease_expires']})
+                if requeue:
+                    pipe.zadd(self._queued_key(job), {job_id: job.created_at})
+                pipe.execute()
+                return True
+            except watch_error:
+                return False
+
+    def heartbeat(self, job_id, worker_id, visibility_timeout=None):
+        expires = time.time() + self._timeout(visibility_timeout)
+        return self._update_leased(job_id, worker_id, {'lease_expires': expires}, release=False)
+
+    def complete(self, job_id, worker_id, result):
+        return self._update_leased(job_id, worker_id, {
+            'status': STATUS_COMPLETED, 'result': json.dumps(result, ensure_ascii=False),
+            'error': '', 'lease_owner': '', 'lease_expires': ''})
+
+    def fail(self, job_id, worker_id, error, retry=True):
+        job = self.get(job_id)
+        requeue = bool(retry and job and job.attempts < job.max_attempts)
+        return self._update_leased(job_id, worker_id, {
+            'status': STATUS_QUEUED if requeue else STATUS_FAILED, 'error': str(error),
+            'lease_owner': '', 'lease_expires': ''}, requeue=requeue)
+
+    def get(self, job_id):
+        return self._decode(self.client.hgetall(self._job_key(job_id)))
+
+    def lane_depths(self):
+        return {lane: self.client.zcard(key) for lane, key in self.queued_keys.items()}
+
+    def list_jobs(self, limit=50):
+        ids = map(self._text, self.client.zrevrange(self.jobs_key, 0, limit - 1))
+        return [job for job in (self.get(job_id) for job_id in ids) if job]
+
+
+def create_queue(url=None, **kwargs):
+    """
+    按URL创建队列
+    sqlite:///相对路径、sqlite:////绝对路径 或直接给文件路径 -> SQLite；redis:// / rediss:// -> Redis
+    """
+    url = url or os.environ.get('ZEROX_QUEUE_URL') or DEFAULT_QUEUE_URL
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisJobQueue(url, **kwargs)
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteJobQueue(url, **kwargs)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+OCR任务执行
+Web请求（同步处理）和任务队列的工作进程共用同一套参数解析、执行和结果组装
+"""
+
+import os
+import asyncio
+from pathlib import Path
+
+from settings import (
+    UPLOAD_FOLDER, OUTPUT_FOLDER, load_config, get_api_key_for_model, set_api_key_env, get_failover_model,
+)
+from checkpoint import CheckpointStore
+from ocr_pipeline import run_pipeline, resume_pipeline, supports_pipeline
+from extraction import resolve_schema, SchemaError
+from warmup import engine
+from profiling import JobProfiler, profiled
+from converter import converter_pool, supports_conversion, ConversionError
+
+# Web进程和独立工作进程共用的转换进程池配置
+converter_pool.apply_config(load_config().get('converter', {}))
+
+
+class JobError(Exception):
+    """
+    任务参数或执行环境有误；status 为对应的HTTP状态码
+
+    retryable 为真时队列任务重新排队（例如本节点看不到上传文件，可能由能访问共享存储的节点处理），
+    否则直接标记失败
+    """
+
+    def __init__(self, message, status=400, retryable=False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+
+def output_dir_for(file_id):
+    return os.path.join(OUTPUT_FOLDER, file_id.replace('.', '_'))
+
+
+def run_async(coro):
+    """在新的事件循环中运行协程"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def _ensure_api_key(model_id):
+    api_key = get_api_key_for_model(model_id)
+    if not api_key:
+        raise JobError('未配置对应的API密钥', 400)
+    set_api_key_env(model_id, api_key)
+
+
+def build_process_options(file_id, model_id, options):
+    """
+    解析处理参数并设置API密钥
+
+    返回 (处理参数, 是否走页级流水线)
+    """
+    file_path = os.path.join(UPLOAD_FOLDER, file_id)
+    if not os.path.exists(file_path):
+        # 共享存储未挂载或尚未同步时，其他节点或稍后的重试可能看得到文件
+        raise JobError('文件不存在', 404, retryable=True)
+
+    _ensure_api_key(model_id)
+
+    # DOCX/DOC/HTML 先由常驻转换进程池转为PDF再走页级流水线；未安装 LibreOffice 时仍交给 zerox
+    if supports_conversion(file_path) and converter_pool.available:
+        try:
+            file_path = converter_pool.convert(file_path)
+        except ConversionError as e:
+            raise JobError(f'文档转换失败: {e}', 500)
+
+    output_dir = output_dir_for(file_id)
+    os.makedirs(output_dir, exist_ok=True)
+
+    process_options = {
+        'file_path': file_path,
+        'model': model_id,
+        'output_dir': output_dir,
+        'maintain_format': options.get('maintain_format', False),
+        'concurrency': options.get('concurrency', 10),
+        'select_pages': options.get('select_pages'),
+        'custom_system_prompt': options.get('custom_system_prompt')
+    }
+
+    # PDF和图片（含转换后的文档）走页级流水线（支持预处理），其余格式交给zerox转换
+    use_pipeline = supports_pipeline(file_path)
+    if use_pipeline:
+        process_options.update({
+            'preprocess': options.get('preprocess', True),
+            'grayscale': options.get('grayscale', 'auto'),
+            'image_encoding': options.get('image_encoding', 'auto'),
+            'skip_blank_duplicates': options.get('skip_blank_duplicates', True),
+            'text_layer': options.get('text_layer', 'off'),
+            'routing': options.get('routing', False),
+            'routing_threshold': options.get('routing_threshold', 0.5),
+            'hedge': options.get('hedge', True),
+            'hedge_percentile': options.get('hedge_percentile', 0.95),
+            'hedge_model': options.get('hedge_model'),
+            'failover_model': get_failover_model(model_id, options.get('failover_model')),
+            'workers': options.get('workers', 1)
+        })
+
+    # 结构化提取：schema 为已保存的名称或内联的JSON Schema
+    schema = options.get('schema')
+    if schema:
+        if not use_pipeline:
+            raise JobError('结构化提取仅支持PDF、图片和可转换为PDF的文档', 400)
+        try:
+            process_options['extraction_schema'] = resolve_schema(schema)
+        except FileNotFoundError as e:
+            raise JobError(str(e), 404)
+        except (SchemaError, ValueError) as e:
+            raise JobError(f'Schema 无效: {e}', 400)
+    return process_options, use_pipeline
+
+
+async def run_ocr(process_options, use_pipeline, on_event=None):
+    """执行OCR；on_event 只对页级流水线生效（zerox 没有逐页输出）"""
+    # 未预热时首次处理在这里导入OCR引擎，不阻塞事件循环
+    await asyncio.to_thread(engine.load)
+    if use_pipeline:
+        return await run_pipeline(on_event=on_event, **process_options)
+    from pyzerox.core.zerox import zerox
+    return await zerox(**process_options)
+
+
+def prepare_resume(file_id):
+    """检查断点并重新设置API密钥（进程重启后环境变量可能已丢失），返回输出目录"""
+    output_dir = output_dir_for(file_id)
+    checkpoint = CheckpointStore(output_dir)
+    if not checkpoint.exists():
+        raise JobError('没有可续跑的任务', 404)
+
+    options = checkpoint.load_manifest()['options']
+    _ensure_api_key(options['model'])
+    failover_model = options.get('failover_model')
+    if failover_model:
+        failover_key = get_api_key_for_model(failover_model)
+        if failover_key:
+            set_api_key_env(failover_model, failover_key)
+    return output_dir
+
+
+def collect_result(output_dir, result, include_content=True):
+    """
+    读取生成的Markdown并组装处理结果；没有输出文件时返回None
+
+    include_content 为 False 时不返回全文（content 为None），由调用方按页读取
+    """
+    md_files = list(Path(output_dir).glob('*.md'))
+    if not md_files:
+        return None
+
+    md_file = md_files[0]
+    content = None
+    if include_content:
+        with open(md_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+    stats = getattr(result, 'stats', {})
+    return {
+        'content': content,
+        'file_path': str(md_file),
+        'completion_time': getattr(result, 'completion_time', 0),
+        'input_tokens': getattr(result, 'input_tokens', 0),
+        'output_tokens': getattr(result, 'output_tokens', 0),
+        'pages': len(getattr(result, 'pages', [])),
+        'preprocessing': stats.get('preprocessing'),
+        'api_calls': stats.get('api_calls'),
+        'skipped': stats.get('skipped'),
+        'text_layer': stats.get('text_layer'),
+        'routing': stats.get('routing'),
+        'calls': stats.get('calls'),
+        'resumed_pages': stats.get('resumed_pages'),
+        'sharding': stats.get('sharding'),
+        'extraction': stats.get('extraction'),
+        'page_models': [
+            {'page': p.page, 'model': p.model, 'status': p.status, 'latency': p.latency}
+            for p in getattr(result, 'pages', []) if hasattr(p, 'status')
+        ]
+    }
+
+
+def execute(payload, attempt=1, job_id=None):
+    """
+    执行一个排队的任务，返回处理结果
+
+    重试（attempt > 1）时若上次运行留有未完成的断点，则只续跑缺失或失败的页面；
+    options.profile 为真（提交时已校验管理员令牌）时在剖析下运行，结果保存在 profiles/<job_id>/
+    """
+    file_id, model_id = payload['file_id'], payload['model_id']
+    options = payload.get('options') or {}
+    output_dir = output_dir_for(file_id)
+    profiler = None
+    if job_id and options.get('profile'):
+        # 先导入OCR引擎，剖析结果不含导入的耗时和内存
+        engine.load()
+        profiler = JobProfiler(output_dir, job_id, attempt)
+
+    checkpoint = CheckpointStore(output_dir)
+    if attempt > 1 and checkpoint.exists() and checkpoint.load_manifest().get('status') != 'completed':
+        prepare_resume(file_id)
+        result = run_async(profiled(resume_pipeline(output_dir), profiler))
+    else:
+        process_options, use_pipeline = build_process_options(file_id, model_id, options)
+        result = run_async(profiled(run_ocr(process_options, use_pipeline), profiler))
+
+    collected = collect_result(output_dir, result)
+    if collected is None:
+        raise JobError('处理完成但未生成输出文件', 500)
+    if profiler:
+        collected['profile'] = profiler.summary
+    return collected
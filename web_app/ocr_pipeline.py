@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+"""
+页级OCR流水线
+按页渲染、预处理并调用模型，输出与 zerox 相同格式的Markdown文件
+"""
+
+import asyncio
+import base64
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
+from checkpoint import CheckpointStore
+from page_cache import page_cache, cached_render, cached_prepare
+from estimator import usage_stats
+from result_pages import write_markdown
+from extraction import (
+    build_prompt, merge_pages, compare_with_markdown, EXTRACT_KIND, EXTRACTION_FILE,
+    EXTRACTION_TEXT_PROMPT,
+)
+from hedging import resilient_call, CallMetrics, metrics, DEFAULT_PERCENTILE
+from page_filter import scan_pages
+from routing import choose_model, DEFAULT_THRESHOLD
+from sharding import dispatch_sharded
+from text_layer import (
+    analyse_pdf, text_to_markdown, TEXT_PROMPT, ROUTE_LOCAL, ROUTE_TEXT, ROUTE_VISION,
+)
+from preprocess import (
+    prepare_page_image, encode_baseline, estimate_image_tokens, text_density,
+    looks_degraded, RERENDER_SCALE,
+)
+
+# 页面渲染DPI（预处理时再按需缩放）
+RENDER_DPI = 200
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
+PIPELINE_EXTENSIONS = {'pdf'} | IMAGE_EXTENSIONS
+
+# 与 zerox 的默认提示一致；安装了 zerox 时以其为准（见 default_system_prompt）
+DEFAULT_SYSTEM_PROMPT = (
+    "Convert the following document to markdown.\n"
+    "Return only the markdown with no explanation text. "
+    "Do not include delimiters like ```markdown or ```html.\n\n"
+    "RULES:\n"
+    "  - You must include all information on the page. Do not exclude headers, footers, or subtext.\n"
+    "  - Return tables in an HTML format.\n"
+    "  - Charts & infographics must be interpreted to a markdown format. Prefer table format when applicable.\n"
+    "  - Logos should be wrapped in brackets. Ex: <logo>Coca-Cola<logo>\n"
+    "  - Watermarks should be wrapped in brackets. Ex: <watermark>OFFICIAL COPY<watermark>\n"
+    "  - Page numbers should be wrapped in brackets. Ex: <page_number>14<page_number> or <page_number>9/22<page_number>\n"
+    "  - Prefer using ☐ and ☑ for check boxes."
+)
+
+_system_prompt = None
+
+
+def default_system_prompt():
+    """
+    zerox 的默认系统提示
+
+    导入 pyzerox 会连带加载 litellm 及其全部供应商模块，放到首次处理时再导入，不拖慢启动
+    """
+    global _system_prompt
+    if _system_prompt is None:
+        try:
+            from pyzerox.constants.prompts import Prompts
+            _system_prompt = Prompts.DEFAULT_SYSTEM_PROMPT
+        except ImportError:
+            _system_prompt = DEFAULT_SYSTEM_PROMPT
+    return _system_prompt
+
+
+@dataclass
+class PageResult:
+    """单页处理结果"""
+    page: int
+    content: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    model: str = ''
+    latency: float = 0.0
+    status: str = 'ok'
+    # 页面图像来源：hit 上传时预渲染的缓存，miss 处理时渲染，checkpoint 续跑时读取的断点
+    cache: str = ''
+
+    @property
+    def content_length(self):
+        return len(self.content)
+
+
+@dataclass
+class PipelineResult:
+    """整份文档的处理结果，字段与 ZeroxOutput 保持一致"""
+    completion_time: float
+    file_name: str
+    input_tokens: int
+    output_tokens: int
+    pages: list
+    stats: dict = field(default_factory=dict)
+
+
+def supports_pipeline(file_path):
+    """判断文件是否可以走页级流水线（其余格式交给 zerox 转换）"""
+    return file_path.rsplit('.', 1)[-1].lower() in PIPELINE_EXTENSIONS
+
+
+def output_file_name(file_path):
+    """与 zerox 一致的输出文件名"""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return re.sub(r'\W+', '_', stem.lower()).strip('_')
+
+
+def format_markdown(text):
+    """去掉模型偶尔包裹的代码块标记"""
+    text = (text or '').strip()
+    text = re.sub(r'^```(?:markdown|md|html)?\s*\n', '', text)
+    text = re.sub(r'\n?```\s*$', '', text)
+    return text
+
+
+def count_pages(file_path):
+    """统计页数"""
+    if file_path.lower().endswith('.pdf'):
+        from pdf2image import pdfinfo_from_path
+        return int(pdfinfo_from_path(file_path)['Pages'])
+    from PIL import Image
+    with Image.open(file_path) as image:
+        return getattr(image, 'n_frames', 1)
+
+
+def render_page(file_path, page_number, dpi=RENDER_DPI):
+    """渲染单页为图像（页码从1开始）"""
+    if file_path.lower().endswith('.pdf'):
+        from pdf2image import convert_from_path
+        return convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+    from PIL import Image
+    with Image.open(file_path) as image:
+        image.seek(page_number - 1)
+        return image.convert('RGB')
+
+
+def resolve_pages(select_pages, total):
+    """解析 select_pages 参数"""
+    if not select_pages:
+        return list(range(1, total + 1))
+    if isinstance(select_pages, int):
+        select_pages = [select_pages]
+    return sorted({int(p) for p in select_pages if 1 <= int(p) <= total})
+
+
+def _build_messages(system_prompt, prior_page, user_content):
+    messages = [{'role': 'system', 'content': system_prompt}]
+    if prior_page:
+        messages.append({
+            'role': 'system',
+            'content': f'Markdown must maintain consistent formatting with the following page: \n\n """{prior_page}"""'
+        })
+    messages.append({'role': 'user', 'content': user_content})
+    return messages
+
+
+async def _complete(model, messages, on_delta=None):
+    """调用模型；on_delta 不为空时使用流式输出，每收到一段文本就回调一次"""
+    import litellm
+
+    if on_delta:
+        chunks = []
+        stream = await litellm.acompletion(model=model, messages=messages, stream=True)
+        async for chunk in stream:
+            chunks.append(chunk)
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                on_delta(text)
+        # 由分块重建完整响应（含Token用量）
+        response = litellm.stream_chunk_builder(chunks, messages=messages)
+    else:
+        response = await litellm.acompletion(model=model, messages=messages)
+    usage = getattr(response, 'usage', None)
+    return (
+        format_markdown(response.choices[0].message.content),
+        getattr(usage, 'prompt_tokens', 0) or 0,
+        getattr(usage, 'completion_tokens', 0) or 0,
+    )
+
+
+async def call_model(model, image_data, mime, system_prompt, prior_page=None, on_delta=None):
+    """调用视觉模型，返回 (markdown, 输入tokens, 输出tokens)"""
+    encoded = base64.b64encode(image_data).decode('ascii')
+    content = [{'type': 'image_url', 'image_url': {'url': f'data:{mime};base64,{encoded}'}}]
+    return await _complete(model, _build_messages(system_prompt, prior_page, content), on_delta)
+
+
+async def call_model_text(model, text, system_prompt, prior_page=None, on_delta=None,
+                          instruction=TEXT_PROMPT):
+    """以纯文本提示调用模型（文本层快速通道），返回值同 call_model"""
+    content = f'{instruction}\n\n"""\n{text}\n"""'
+    return await _complete(model, _build_messages(system_prompt, prior_page, content), on_delta)
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+class PipelineError(Exception):
+    """部分页面处理失败；已完成的页面保存在断点中，可以续跑"""
+
+    def __init__(self, failed_pages, cause=None):
+        self.failed_pages = failed_pages
+        self.cause = cause
+        super().__init__(f'{len(failed_pages)} 页处理失败: {cause}')
+
+
+class PipelineJob:
+    """一次文档处理任务"""
+
+    def __init__(self, file_path, model, output_dir, maintain_format=False, concurrency=10,
+                 select_pages=None, custom_system_prompt=None, preprocess=True,
+                 grayscale='auto', image_encoding='auto', skip_blank_duplicates=True,
+                 text_layer='off', routing=False, routing_threshold=DEFAULT_THRESHOLD,
+                 hedge=True, hedge_percentile=DEFAULT_PERCENTILE, hedge_model=None,
+                 failover_model=None, workers=1, extraction_schema=None, checkpoint=None, resume=False,
+                 on_event=None):
+        # 分片工作进程按相同参数重建任务
+        self.options = {k: v for k, v in locals().items()
+                        if k not in ('self', 'checkpoint', 'resume', 'on_event')}
+        self.file_path = file_path
+        self.model = model
+        self.output_dir = output_dir
+        # 结构化提取：每页只输出Schema中的字段（JSON），页面之间互不依赖
+        self.extraction_schema = extraction_schema
+        self.maintain_format = maintain_format and not extraction_schema
+        self.concurrency = max(1, int(concurrency or 1))
+        self.select_pages = select_pages
+        if extraction_schema:
+            self.system_prompt = build_prompt(extraction_schema, custom_system_prompt)
+        else:
+            self.system_prompt = custom_system_prompt or default_system_prompt()
+        self.preprocess = preprocess
+        self.grayscale = grayscale
+        self.image_encoding = image_encoding
+        self.skip_blank_duplicates = skip_blank_duplicates
+        # 文本层模式：off 关闭；hybrid 本地转换 + 文本提示；prompt 只用文本提示
+        self.text_layer = text_layer if file_path.lower().endswith('.pdf') else 'off'
+        if extraction_schema and self.text_layer == 'hybrid':
+            # 本地转换只能得到Markdown，提取时文本层页面都交给模型
+            self.text_layer = 'prompt'
+        self.text_pages = {}
+        # 按页面复杂度在快速/精确模型之间路由
+        self.routing = routing
+        self.routing_threshold = float(routing_threshold)
+        self.route_stats = {}
+        # 对冲与故障转移
+        self.hedge = hedge
+        self.hedge_percentile = float(hedge_percentile)
+        self.hedge_model = hedge_model
+        self.failover_model = failover_model
+        self.call_metrics = CallMetrics(parent=metrics)
+        # 页级断点
+        self.checkpoint = checkpoint or CheckpointStore(output_dir)
+        self.resume = resume
+        # 多进程分片
+        self.workers = max(1, int(workers or 1))
+        self.shard_stats = []
+        # 流式输出：on_event 接收开始、每页增量和每页完成事件
+        self.on_event = on_event
+        self._stream_owners = {}
+        self._emitted = set()
+        self.preprocess_stats = {
+            'enabled': bool(preprocess),
+            'input_tokens_before': 0,
+            'input_tokens_after': 0,
+            'bytes_before': 0,
+            'bytes_after': 0,
+            'rerendered_pages': 0,
+        }
+        # _prepare 在线程池中执行，统计累加需要加锁
+        self._stats_lock = threading.Lock()
+
+    def _prepare(self, image, model, scale=1.0, retry=False, page_number=None):
+        """按任务配置准备页面图像，并累计预处理统计"""
+        if self.preprocess:
+            if scale == 1.0 and page_number:
+                # 默认缩放的预处理结果可能已在上传时预先算好
+                prepared = cached_prepare(self.file_path, page_number, image, model,
+                                          grayscale=self.grayscale, encoding=self.image_encoding)
+            else:
+                prepared = prepare_page_image(image, model, grayscale=self.grayscale,
+                                              encoding=self.image_encoding, scale=scale)
+            data, mime = prepared.data, prepared.mime
+            before, after = prepared.tokens_before, prepared.tokens_after
+            bytes_before, bytes_after = prepared.bytes_before, prepared.bytes_after
+            density = prepared.density
+        else:
+            data, mime, width, height = encode_baseline(image)
+            before = after = estimate_image_tokens(width, height, model)
+            bytes_before = bytes_after = len(data)
+            density = text_density(image)
+
+        stats = self.preprocess_stats
+        with self._stats_lock:
+            if not retry:
+                # 重试不计入基线：固定密度方案每页只会发送一次
+                stats['input_tokens_before'] += before
+                stats['bytes_before'] += bytes_before
+            stats['input_tokens_after'] += after
+            stats['bytes_after'] += bytes_after
+        return data, mime, density
+
+    def _emit_page(self, result):
+        """推送一页的最终结果（每页只推送一次）"""
+        if self.on_event and result.page not in self._emitted:
+            self._emitted.add(result.page)
+            self.on_event({'type': 'page', 'page': result.page, 'content': result.content,
+                           'model': result.model, 'status': result.status})
+
+    def _streaming(self, call, page_number):
+        """
+        包装单次模型调用，把输出增量推送给 on_event
+
+        对冲或故障转移时同一页可能有多个调用在输出，同一时刻只转发一个调用的内容；
+        它结束后由下一个输出的调用接管，接管时以 reset 事件发送其已输出的全部内容
+        """
+        if not self.on_event or page_number is None:
+            return call
+
+        async def wrapped(model):
+            token, received = object(), []
+
+            def on_delta(text):
+                received.append(text)
+                owner = self._stream_owners.get(page_number)
+                if owner is None:
+                    self._stream_owners[page_number] = token
+                    self.on_event({'type': 'delta', 'page': page_number, 'text': ''.join(received),
+                                   'reset': True})
+                elif owner is token:
+                    self.on_event({'type': 'delta', 'page': page_number, 'text': text})
+
+            try:
+                return await call(model, on_delta)
+            finally:
+                if self._stream_owners.get(page_number) is token:
+                    del self._stream_owners[page_number]
+
+        return wrapped
+
+    async def _call(self, call, model, page_number=None):
+        """经对冲与故障转移调用模型，返回 ((markdown, 输入tokens, 输出tokens), 实际应答的模型)"""
+        return await resilient_call(
+            self._streaming(call, page_number), model,
+            failover_model=self.failover_model,
+            hedge=self.hedge,
+            hedge_model=self.hedge_model,
+            percentile=self.hedge_percentile,
+            job_metrics=self.call_metrics,
+        )
+
+    async def _call_model(self, model, data, mime, prior_page=None, page_number=None):
+        return await self._call(
+            lambda m, on_delta=None: call_model(m, data, mime, self.system_prompt, prior_page, on_delta),
+            model, page_number)
+
+    @property
+    def api_calls(self):
+        """实际发出的模型调用数（含对冲请求）"""
+        counts = self.call_metrics.snapshot()
+        return counts['calls'] + counts['hedged']
+
+    def _record_route(self, route, model, latency, input_tokens, output_tokens):
+        stats = self.route_stats.setdefault(route, {
+            'model': model, 'pages': 0, 'latency': 0.0, 'input_tokens': 0, 'output_tokens': 0,
+        })
+        stats['pages'] += 1
+        stats['latency'] += latency
+        stats['input_tokens'] += input_tokens
+        stats['output_tokens'] += output_tokens
+
+    def _routing_stats(self):
+        if not self.routing:
+            return None
+        return {
+            route: {**stats, 'avg_latency': stats['latency'] / stats['pages']}
+            for route, stats in self.route_stats.items()
+        }
+
+    async def process_page(self, page_number, prior_page=None):
+        """处理单页：渲染 -> 预处理 -> 调用模型，输出退化时高分辨率重试一次"""
+        started = time.monotonic()
+
+        text_page = self.text_pages.get(page_number)
+        if text_page and text_page.route == ROUTE_LOCAL:
+            return PageResult(page=page_number, content=text_to_markdown(text_page.text),
+                              model='text-layer', latency=time.monotonic() - started,
+                              status='text_layer')
+        if text_page and text_page.route == ROUTE_TEXT:
+            instruction = EXTRACTION_TEXT_PROMPT if self.extraction_schema else TEXT_PROMPT
+            (content, input_tokens, output_tokens), model = await self._call(
+                lambda m, on_delta=None: call_model_text(m, text_page.text, self.system_prompt,
+                                                         prior_page, on_delta, instruction),
+                self.model, page_number)
+            return PageResult(page=page_number, content=content, input_tokens=input_tokens,
+                              output_tokens=output_tokens, model=model,
+                              latency=time.monotonic() - started, status='text_prompt')
+
+        cache = 'hit' if page_cache.contains('render', self.file_path, (page_number, RENDER_DPI)) else 'miss'
+        image = await asyncio.to_thread(cached_render, self.file_path, page_number)
+        model, route = self.model, None
+        if self.routing:
+            route, model, _ = await asyncio.to_thread(
+                choose_model, image, self.model, self.routing_threshold)
+
+        data, mime, density = await asyncio.to_thread(
+            self._prepare, image, model, page_number=page_number)
+        (content, input_tokens, output_tokens), model = await self._call_model(
+            model, data, mime, prior_page, page_number)
+
+        # 提取结果是简短的JSON，不按文本长度判断退化
+        if self.preprocess and not self.extraction_schema and looks_degraded(content, density):
+            # 按 RERENDER_SCALE 倍DPI重新渲染；_prepare 据此在原尺寸的目标上放大一次，不会叠加
+            dpi = int(RENDER_DPI * RERENDER_SCALE)
+            image = await asyncio.to_thread(render_page, self.file_path, page_number, dpi)
+            data, mime, density = await asyncio.to_thread(
+                self._prepare, image, model, RERENDER_SCALE, True)
+            (content, extra_in, extra_out), model = await self._call_model(
+                model, data, mime, prior_page, page_number)
+            input_tokens += extra_in
+            output_tokens += extra_out
+            self.preprocess_stats['rerendered_pages'] += 1
+
+        latency = time.monotonic() - started
+        if route:
+            self._record_route(route, model, latency, input_tokens, output_tokens)
+        return PageResult(
+            page=page_number,
+            content=content,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            model=model,
+            latency=latency,
+            cache=cache,
+        )
+
+    def _text_layer_stats(self):
+        routes = [p.route for p in self.text_pages.values()]
+        return {
+            'mode': self.text_layer,
+            'local': routes.count(ROUTE_LOCAL),
+            'text_prompt': routes.count(ROUTE_TEXT),
+            'vision': routes.count(ROUTE_VISION),
+        }
+
+    async def _process_and_checkpoint(self, page_number, prior_page=None):
+        result = await self.process_page(page_number, prior_page)
+        await asyncio.to_thread(self.checkpoint.save_page, result)
+        self._emit_page(result)
+        return result
+
+    async def _dispatch(self, page_numbers, completed):
+        """
+        把页面分发给模型，每页完成后立即写入断点
+
+        返回 (结果列表, {失败页码: 异常})；单页失败不影响其他页面
+        """
+        # 保持格式需要顺序处理，不分片
+        if self.workers > 1 and not self.maintain_format and len(page_numbers) > 1:
+            return await dispatch_sharded(self, page_numbers)
+
+        results, failures = [], {}
+        if self.maintain_format:
+            # 保持格式需要上一页结果，只能顺序处理；某页失败后后续页面无法继续
+            for number in page_numbers:
+                prior = completed.get(number - 1)
+                try:
+                    result = await self._process_and_checkpoint(number, prior.content if prior else None)
+                except Exception as e:
+                    failures.update({n: e for n in page_numbers if n >= number})
+                    break
+                results.append(result)
+                completed[number] = result
+            return results, failures
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def guarded(number):
+            async with semaphore:
+                return await self._process_and_checkpoint(number)
+
+        outcomes = await asyncio.gather(*(guarded(n) for n in page_numbers), return_exceptions=True)
+        for number, outcome in zip(page_numbers, outcomes):
+            if isinstance(outcome, Exception):
+                failures[number] = outcome
+            else:
+                results.append(outcome)
+        return results, failures
+
+    async def run(self):
+        started = time.monotonic()
+        total = page_cache.page_count(self.file_path)
+        if total is None:
+            total = await asyncio.to_thread(count_pages, self.file_path)
+        page_numbers = resolve_pages(self.select_pages, total)
+        if self.on_event:
+            self.on_event({'type': 'start', 'pages': page_numbers, 'total': total})
+
+        # 续跑时读取已完成页面的断点
+        completed = {}
+        if self.resume:
+            saved = await asyncio.to_thread(self.checkpoint.load_pages)
+            completed = {n: PageResult(**{**saved[n], 'cache': 'checkpoint'}) for n in page_numbers if n in saved}
+        resumed_pages = sorted(completed)
+        for number in resumed_pages:
+            self._emit_page(completed[number])
+
+        # 预扫描空白页和重复页，它们不需要调用模型；续跑时已完成的页面不再渲染
+        blank_pages, duplicates = [], {}
+        if self.skip_blank_duplicates:
+            blank_pages, duplicates = await asyncio.to_thread(
+                scan_pages, self.file_path, [n for n in page_numbers if n not in completed])
+        skipped = set(blank_pages) | set(duplicates)
+        pending = [n for n in page_numbers if n not in skipped and n not in completed]
+
+        # 评估文本层，决定哪些页面无需走视觉模型
+        if self.text_layer != 'off':
+            self.text_pages = await asyncio.to_thread(
+                analyse_pdf, self.file_path, pending, self.model, self.text_layer)
+
+        results, failures = await self._dispatch(pending, completed)
+        by_page = {**completed, **{r.page: r for r in results}}
+        for number in blank_pages:
+            by_page[number] = PageResult(page=number, content='', status='blank')
+        for number, source in duplicates.items():
+            if source in by_page:
+                by_page[number] = PageResult(page=number, content=by_page[source].content,
+                                             model=by_page[source].model, status='duplicate')
+        # 空白页、重复页和分片进程处理的页面在合并后推送
+        for number in sorted(by_page):
+            self._emit_page(by_page[number])
+
+        missing = [n for n in page_numbers if n not in by_page]
+        if missing:
+            first_error = next(iter(failures.values()), None)
+            await asyncio.to_thread(self.checkpoint.update_manifest, status='failed',
+                                    failed_pages=missing, error=str(first_error))
+            raise PipelineError(missing, first_error)
+        results = [by_page[n] for n in page_numbers]
+
+        file_name = output_file_name(self.file_path)
+        await asyncio.to_thread(write_markdown, self.output_dir, file_name, results)
+
+        # 记录本次调用模型的单页Token与延迟，用于预估后续任务
+        new_pages = [r for r in results if r.page not in completed]
+        await asyncio.to_thread(usage_stats.record_pages, new_pages,
+                                EXTRACT_KIND if self.extraction_schema else None)
+
+        extraction = None
+        if self.extraction_schema:
+            extraction = merge_pages(results, self.extraction_schema)
+            extraction['comparison'] = await asyncio.to_thread(compare_with_markdown, new_pages, self.model)
+            await asyncio.to_thread(_write_json, os.path.join(self.output_dir, EXTRACTION_FILE), extraction)
+
+        return PipelineResult(
+            completion_time=(time.monotonic() - started) * 1000,
+            file_name=file_name,
+            input_tokens=sum(r.input_tokens for r in results),
+            output_tokens=sum(r.output_tokens for r in results),
+            pages=results,
+            stats={
+                'preprocessing': self.preprocess_stats,
+                'api_calls': self.api_calls,
+                'skipped': {'blank': blank_pages, 'duplicate': duplicates},
+                'text_layer': self._text_layer_stats(),
+                'routing': self._routing_stats(),
+                'calls': self.call_metrics.snapshot(),
+                'resumed_pages': resumed_pages,
+                'sharding': {'workers': self.workers, 'shards': self.shard_stats} if self.shard_stats else None,
+                'extraction': extraction,
+            },
+        )
+
+
+async def run_pipeline(on_event=None, **options):
+    """
+    页级流水线入口，参数与 zerox() 保持一致；每页结果写入断点，失败后可续跑
+
+    on_event 不为空时流式调用模型，并推送每页的增量Markdown
+    """
+    checkpoint = CheckpointStore(options['output_dir'])
+    checkpoint.reset()
+    checkpoint.save_manifest(options, status='running')
+    result = await PipelineJob(checkpoint=checkpoint, on_event=on_event, **options).run()
+    checkpoint.update_manifest(status='completed', failed_pages=[], error=None)
+    return result
+
+
+async def resume_pipeline(output_dir, on_event=None, **overrides):
+    """续跑失败的任务：沿用原任务参数，只重新处理缺失或失败的页面"""
+    checkpoint = CheckpointStore(output_dir)
+    if not checkpoint.exists():
+        raise FileNotFoundError(f'没有可续跑的任务: {output_dir}')
+    options = {**checkpoint.load_manifest()['options'], **overrides}
+    checkpoint.update_manifest(options=options, status='running')
+    result = await PipelineJob(checkpoint=checkpoint, resume=True, on_event=on_event, **options).run()
+    checkpoint.update_manifest(status='completed', failed_pages=[], error=None)
+    return result
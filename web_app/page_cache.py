@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+上传时的预渲染缓存
+文件上传后在后台统计页数、渲染并预处理前若干页，开始处理时直接复用；
+缓存有总大小上限和过期时间，文件删除或过期后清除
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# 缓存总大小上限（字节）
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# 上传后缓存保留的时间（秒）
+CACHE_TTL = 900
+
+# 上传后预渲染的页数
+WARM_PAGES = 20
+
+# 预渲染每批的页数（PDF一次调用渲染多页，减少进程启动开销）
+WARM_BATCH = 5
+
+# 缓存占用超过上限的该比例后不再预渲染，避免挤掉正在处理的文件
+WARM_FILL_RATIO = 0.8
+
+
+def image_size(image):
+    """PIL图像占用的内存"""
+    return image.width * image.height * len(image.getbands())
+
+
+class PageCache:
+    """
+    按文件登记的页面缓存
+
+    只缓存已登记（刚上传）的文件；同一个键正在计算时其他线程等待结果，
+    避免后台预渲染和处理任务重复渲染同一页
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._files = {}
+        self._inflight = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def configure(self, max_bytes=None, ttl=None):
+        if max_bytes:
+            self.max_bytes = int(max_bytes)
+        if ttl:
+            self.ttl = float(ttl)
+
+    @staticmethod
+    def _path(file_path):
+        return os.path.abspath(file_path)
+
+    def register(self, file_path, page_count):
+        """登记刚上传的文件，缓存到期时间从此刻算起"""
+        with self._lock:
+            self._files[self._path(file_path)] = {'pages': page_count, 'expires': time.time() + self.ttl}
+
+    def is_registered(self, file_path):
+        with self._lock:
+            self._purge_expired()
+            return self._path(file_path) in self._files
+
+    def page_count(self, file_path):
+        with self._lock:
+            self._purge_expired()
+            info = self._files.get(self._path(file_path))
+            return info['pages'] if info else None
+
+    def filled(self):
+        with self._lock:
+            return self._bytes / self.max_bytes
+
+    def _remove(self, key):
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = {path for path, info in self._files.items() if info['expires'] <= now}
+        for path in expired:
+            del self._files[path]
+        if expired:
+            for key in [k for k in self._entries if k[1] in expired]:
+                self._remove(key)
+
+    def _store(self, key, value, size):
+        if key[1] not in self._files or size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self._counts['evictions'] += 1
+
+    def contains(self, kind, file_path, extra):
+        """是否已缓存（不计入命中统计）"""
+        with self._lock:
+            return (kind, self._path(file_path), *extra) in self._entries
+
+    def put(self, kind, file_path, extra, value, size):
+        with self._lock:
+            self._store((kind, self._path(file_path), *extra), value, size)
+
+    def claim(self, kind, file_path, extras):
+        """
+        把尚未缓存、也没有其他线程在计算的键登记为计算中，返回登记成功的 extra
+
+        调用方计算完成后必须对每个返回的 extra 调用 release，等待中的线程才会继续
+        """
+        path = self._path(file_path)
+        claimed = []
+        with self._lock:
+            self._purge_expired()
+            if path not in self._files:
+                return claimed
+            for extra in extras:
+                key = (kind, path, *extra)
+                if key not in self._entries and key not in self._inflight:
+                    self._inflight[key] = threading.Event()
+                    self._counts['misses'] += 1
+                    claimed.append(extra)
+        return claimed
+
+    def release(self, kind, file_path, extra, value=None, size=0):
+        """结束 claim 登记的计算；value 为None（计算失败）时不缓存，等待的线程自行计算"""
+        key = (kind, self._path(file_path), *extra)
+        with self._lock:
+            if value is not None:
+                self._store(key, value, size)
+            owner = self._inflight.pop(key, None)
+        if owner:
+            owner.set()
+
+    def get_or_compute(self, kind, file_path, extra, compute, size_of):
+        """
+        读取缓存；未命中时计算并写入
+
+        文件未登记时直接计算，不缓存
+        """
+        key = (kind, self._path(file_path), *extra)
+        while True:
+            with self._lock:
+                self._purge_expired()
+                if key[1] not in self._files:
+                    owner = None
+                    break
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self._counts['hits'] += 1
+                    return self._entries[key][0]
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    owner = self._inflight[key] = threading.Event()
+                    self._counts['misses'] += 1
+                    break
+            # 其他线程正在计算同一个键，等它完成后重新检查
+            waiting.wait()
+
+        if owner is None:
+            return compute()
+        try:
+            value = compute()
+            with self._lock:
+                self._store(key, value, size_of(value))
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            owner.set()
+
+    def evict(self, file_path):
+        """文件被删除时清除其缓存"""
+        path = self._path(file_path)
+        with self._lock:
+            self._files.pop(path, None)
+            for key in [k for k in self._entries if k[1] == path]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self):
+        with self._lock:
+            self._purge_expired()
+            return {
+                **self._counts,
+                'files': len(self._files),
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+page_cache = PageCache()
+
+# 预渲染在单独的低并发线程池中执行，不占用处理任务的线程
+_warm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='page-warmup')
+
+
+def cached_render(file_path, page_number, dpi=None):
+    """渲染单页，优先使用上传时的预渲染结果"""
+    from ocr_pipeline import render_page, RENDER_DPI
+
+    dpi = dpi or RENDER_DPI
+    return page_cache.get_or_compute(
+        'render', file_path, (page_number, dpi),
+        lambda: render_page(file_path, page_number, dpi), image_size)
+
+
+def cached_prepare(file_path, page_number, image, model_id, grayscale='auto', encoding='auto'):
+    """按默认缩放预处理单页，优先使用上传时的预处理结果"""
+    from preprocess import prepare_page_image
+
+    return page_cache.get_or_compute(
+        'prepared', file_path, (page_number, model_id, grayscale, encoding),
+        lambda: prepare_page_image(image, model_id, grayscale=grayscale, encoding=encoding),
+        lambda prepared: len(prepared.data))
+
+
+def _render_batch(file_path, numbers):
+    """
+    渲染连续的多页并写入缓存：PDF一次调用渲染整批，图片逐页渲染
+
+    整批先登记为计算中，处理任务同时请求这些页面时等待本批结果而不是重复渲染；
+    已缓存或正被其他线程渲染的页面不在本批中渲染
+    """
+    from ocr_pipeline import RENDER_DPI
+    from page_filter import page_runs
+
+    if not file_path.lower().endswith('.pdf'):
+        return [cached_render(file_path, number) for number in numbers]
+    from pdf2image import convert_from_path
+    claimed = [number for number, _ in page_cache.claim('render', file_path, [(n, RENDER_DPI) for n in numbers])]
+    rendered = {}
+    try:
+        for first, last in page_runs(claimed, limit=len(numbers)):
+            images = convert_from_path(file_path, dpi=RENDER_DPI, first_page=first, last_page=last)
+            rendered.update(zip(range(first, last + 1), images))
+    finally:
+        for number in claimed:
+            image = rendered.get(number)
+            page_cache.release('render', file_path, (number, RENDER_DPI), image,
+                               image_size(image) if image is not None else 0)
+    return [rendered[number] if number in rendered else cached_render(file_path, number) for number in numbers]
+
+
+def _warm(file_path, model_id, pages):
+    total = page_cache.page_count(file_path) or 0
+    numbers = list(range(1, min(total, pages) + 1))
+    for start in range(0, len(numbers), WARM_BATCH):
+        # 文件已删除、缓存已过期或缓存快满时停止
+        if not page_cache.is_registered(file_path) or page_cache.filled() >= WARM_FILL_RATIO:
+            return
+        batch = numbers[start:start + WARM_BATCH]
+        images = _render_batch(file_path, batch)
+        if model_id:
+            for number, image in zip(batch, images):
+                cached_prepare(file_path, number, image, model_id)
+
+
+def warm(file_path, page_count, model_id=None, pages=WARM_PAGES):
+    """登记文件并在后台预渲染前 pages 页；model_id 不为空时同时按该模型预处理"""
+    page_cache.register(file_path, page_count)
+
+    def run():
+        try:
+            _warm(file_path, model_id, pages)
+        except Exception as e:
+            # 预渲染只是优化，失败时处理任务会重新渲染
+            print(f"⚠️  预渲染失败 {os.path.basename(file_path)}: {e}")
+
+    return _warm_executor.submit(run)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+空白页与重复页检测
+在调用模型前用低分辨率渲染做一次廉价预扫描：
+空白页用像素统计识别，近似重复页用感知哈希识别
+"""
+
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops, ImageFilter
+
+# 预扫描渲染DPI
+SCAN_DPI = 50
+
+# 预扫描每批渲染的页数，避免大文档一次性占用内存
+SCAN_BATCH = 20
+
+# 深色像素占比低于该值视为空白页
+BLANK_INK_RATIO = 0.0015
+
+# 差值哈希边长（HASH_SIZE² 位）与允许的汉明距离
+HASH_SIZE = 16
+HASH_DISTANCE = 6
+
+# 哈希命中后再用缩略图分块确认：任一块的平均灰度差超过阈值即视为不同页
+# （同一模板的发票往往只有发票号、金额等小区域不同）
+THUMB_SIZE = 256
+THUMB_BLOCKS = 32
+THUMB_MAX_DIFF = 4
+
+
+@dataclass
+class PageSignature:
+    """单页预扫描结果"""
+    page: int
+    blank: bool
+    hash: int
+    thumb: object
+
+
+def _trim_border(gray, ratio=0.03):
+    """去掉扫描件边缘常见的黑边"""
+    dx, dy = int(gray.width * ratio), int(gray.height * ratio)
+    return gray.crop((dx, dy, gray.width - dx, gray.height - dy))
+
+
+def is_blank(gray):
+    """根据深色像素占比判断空白页"""
+    cleaned = _trim_border(gray).filter(ImageFilter.MedianFilter(3))
+    histogram = cleaned.histogram()
+    total = sum(histogram)
+    return total == 0 or sum(histogram[:128]) / total < BLANK_INK_RATIO
+
+
+def difference_hash(gray, size=HASH_SIZE):
+    """差值哈希：比较相邻像素亮度"""
+    small = gray.resize((size + 1, size))
+    pixels = small.tobytes()
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def signature(page_number, image):
+    """计算单页签名"""
+    gray = image.convert('L')
+    return PageSignature(
+        page=page_number,
+        blank=is_blank(gray),
+        hash=difference_hash(gray),
+        thumb=gray.resize((THUMB_SIZE, THUMB_SIZE)),
+    )
+
+
+def _same_page(a, b):
+    if bin(a.hash ^ b.hash).count('1') > HASH_DISTANCE:
+        return False
+    # 同一模板的不同发票哈希也会接近，再用缩略图确认每个区域都一致
+    diff = ImageChops.difference(a.thumb, b.thumb)
+    blocks = diff.resize((THUMB_BLOCKS, THUMB_BLOCKS), Image.BOX)
+    return max(blocks.tobytes()) <= THUMB_MAX_DIFF
+
+
+def page_runs(page_numbers, limit=SCAN_BATCH):
+    """把页码按连续区间分批，每批最多 limit 页：[1, 2, 3, 300] -> [(1, 3), (300, 300)]"""
+    runs = []
+    for number in sorted(set(page_numbers)):
+        if runs and number == runs[-1][1] + 1 and number - runs[-1][0] < limit:
+            runs[-1][1] = number
+        else:
+            runs.append([number, number])
+    return [tuple(run) for run in runs]
+
+
+def scan_pages(file_path, page_numbers):
+    """
+    预扫描页面（只渲染选中的页面，连续的页面一次渲染一批）
+
+    返回 (空白页列表, {重复页: 首次出现的页})
+    """
+    from ocr_pipeline import render_page
+
+    if not page_numbers:
+        return [], {}
+
+    signatures = []
+    if file_path.lower().endswith('.pdf'):
+        from pdf2image import convert_from_path
+        for start, end in page_runs(page_numbers):
+            images = convert_from_path(file_path, dpi=SCAN_DPI, first_page=start, last_page=end)
+            for number, image in zip(range(start, end + 1), images):
+                signatures.append(signature(number, image))
+    else:
+        for number in page_numbers:
+            signatures.append(signature(number, render_page(file_path, number)))
+
+    blank_pages, duplicates, originals = [], {}, []
+    for sig in signatures:
+        if sig.blank:
+            blank_pages.append(sig.page)
+            continue
+        source = next((o for o in originals if _same_page(o, sig)), None)
+        if source:
+            duplicates[sig.page] = source.page
+        else:
+            originals.append(sig)
+    return blank_pages, duplicates
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+页面图像预处理
+在调用模型之前裁剪页边距、按文本密度和模型切片规则选择分辨率与编码，
+以减少输入Token和上传字节
+"""
+
+import io
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops, ImageOps
+
+# zerox 默认的页面渲染高度（固定密度基线）
+BASELINE_HEIGHT = 1056
+
+# 各模型的图像计费规则
+# tile 模式：先缩放到 max_side 以内，再将短边缩放到 short_side，按 tile 像素切片计费
+# fixed 模式：每张图像固定 Token 数，分辨率只影响上传字节
+MODEL_IMAGE_RULES = {
+    'gpt-4o-mini': {'mode': 'tile', 'max_side': 2048, 'short_side': 768, 'tile': 512,
+                    'base_tokens': 2833, 'tile_tokens': 5667},
+    'gpt-4o': {'mode': 'tile', 'max_side': 2048, 'short_side': 768, 'tile': 512,
+               'base_tokens': 85, 'tile_tokens': 170},
+    'gemini': {'mode': 'fixed', 'max_side': 3072, 'tokens': 258},
+}
+
+# 文本密度分档 -> (目标长边像素, 为省切片允许的最大缩小比例)
+DENSITY_TIERS = [
+    (0.03, 1024, 0.35),   # 稀疏页面（封面、分隔页）
+    (0.08, 1536, 0.15),   # 普通正文
+    (1.01, 2048, 0.05),   # 密集表格、发票明细
+]
+
+# 重新渲染时的放大倍数
+RERENDER_SCALE = 1.5
+
+
+@dataclass
+class PreparedImage:
+    """预处理后的页面图像"""
+    data: bytes
+    mime: str
+    width: int
+    height: int
+    density: float
+    tokens_before: int
+    tokens_after: int
+    bytes_before: int
+    bytes_after: int
+
+
+def get_image_rules(model_id):
+    """根据模型ID获取图像计费规则"""
+    name = model_id.split('/')[-1]
+    if name.startswith('gemini'):
+        return MODEL_IMAGE_RULES['gemini']
+    # 按前缀由长到短匹配，避免 gpt-4o-mini 命中 gpt-4o
+    for key in sorted(MODEL_IMAGE_RULES, key=len, reverse=True):
+        if name.startswith(key):
+            return MODEL_IMAGE_RULES[key]
+    return MODEL_IMAGE_RULES['gpt-4o']
+
+
+def _tile_scaled_size(width, height, rules):
+    """按 tile 规则计算模型侧实际使用的尺寸"""
+    scale = min(1.0, rules['max_side'] / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, rules['short_side'] / min(width, height))
+    return width * scale, height * scale
+
+
+def estimate_image_tokens(width, height, model_id):
+    """估算一张图像的输入Token数"""
+    rules = get_image_rules(model_id)
+    if rules['mode'] == 'fixed':
+        return rules['tokens']
+    w, h = _tile_scaled_size(width, height, rules)
+    tiles = -(-int(w) // rules['tile']) * -(-int(h) // rules['tile'])
+    return rules['base_tokens'] + rules['tile_tokens'] * tiles
+
+
+def crop_margins(image, threshold=245, padding=16):
+    """裁剪接近白色的页边距"""
+    gray = image.convert('L')
+    mask = gray.point(lambda p: 255 if p < threshold else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return image
+    left, top, right, bottom = bbox
+    left = max(0, left - padding)
+    top = max(0, top - padding)
+    right = min(image.width, right + padding)
+    bottom = min(image.height, bottom + padding)
+    return image.crop((left, top, right, bottom))
+
+
+def text_density(image):
+    """估算页面文本密度（深色像素占比）"""
+    # 直方图在原分辨率上统计，缩略图会把细小文字平均成浅灰
+    histogram = image.convert('L').histogram()
+    total = sum(histogram)
+    return sum(histogram[:160]) / total if total else 0.0
+
+
+def is_grayscale(image, tolerance=12):
+    """判断图像是否基本无彩色"""
+    if image.mode in ('1', 'L', 'LA'):
+        return True
+    thumb = image.convert('RGB')
+    thumb.thumbnail((128, 128))
+    # 逐像素的通道最大值减最小值
+    r, g, b = thumb.split()
+    spread = ImageChops.subtract(ImageChops.lighter(ImageChops.lighter(r, g), b),
+                                 ImageChops.darker(ImageChops.darker(r, g), b))
+    return spread.getextrema()[1] <= tolerance
+
+
+def choose_target_size(width, height, density, model_id):
+    """按文本密度和模型切片规则选择目标尺寸"""
+    target, max_shrink = DENSITY_TIERS[-1][1:]
+    for limit, side, shrink in DENSITY_TIERS:
+        if density < limit:
+            target, max_shrink = side, shrink
+            break
+
+    rules = get_image_rules(model_id)
+    scale = min(1.0, min(target, rules['max_side']) / max(width, height))
+
+    if rules['mode'] == 'tile':
+        # 模型侧会再缩放一次，直接按模型侧尺寸发送，避免上传多余像素
+        w, h = _tile_scaled_size(width * scale, height * scale, rules)
+        scale *= w / (width * scale)
+        # 越过切片边界不多时整体缩小，省掉一整排切片；页面越密允许的缩小越少
+        for index in (1, 0) if h >= w else (0, 1):
+            side = (width * scale, height * scale)[index]
+            overflow = side % rules['tile']
+            if side > rules['tile'] and 0 < overflow <= side * max_shrink:
+                scale *= (side - overflow) / side
+
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def encode_image(image, encoding='auto', quality=80):
+    """编码图像，auto 模式下选择体积更小的 PNG/JPEG"""
+    candidates = []
+    if encoding in ('auto', 'png'):
+        buf = io.BytesIO()
+        image.save(buf, format='PNG', optimize=True)
+        candidates.append((buf.getvalue(), 'image/png'))
+    if encoding in ('auto', 'jpeg'):
+        buf = io.BytesIO()
+        image.convert('L' if image.mode == 'L' else 'RGB').save(buf, format='JPEG', quality=quality)
+        candidates.append((buf.getvalue(), 'image/jpeg'))
+    return min(candidates, key=lambda c: len(c[0]))
+
+
+def baseline_size(image):
+    """zerox 固定密度渲染下的页面尺寸"""
+    scale = BASELINE_HEIGHT / image.height
+    return max(1, int(image.width * scale)), BASELINE_HEIGHT
+
+
+def encode_baseline(image):
+    """按 zerox 固定密度编码页面（不做任何预处理）"""
+    resized = image.convert('RGB').resize(baseline_size(image))
+    buf = io.BytesIO()
+    resized.save(buf, format='PNG')
+    return buf.getvalue(), 'image/png', resized.width, resized.height
+
+
+def prepare_page_image(image, model_id, crop=True, grayscale='auto', encoding='auto', scale=1.0):
+    """
+    预处理单页图像
+
+    scale 大于 1 时用于输出退化后的高分辨率重试：image 是按 scale 倍DPI重新渲染的页面，
+    目标尺寸按原渲染尺寸选择后放大 scale 倍（只放大这一次），不超过源图像素和模型上限
+    """
+    baseline, _, base_w, base_h = encode_baseline(image)
+    tokens_before = estimate_image_tokens(base_w, base_h, model_id)
+
+    if crop:
+        image = crop_margins(image)
+    density = text_density(image)
+
+    if grayscale is True or (grayscale == 'auto' and is_grayscale(image)):
+        image = ImageOps.grayscale(image)
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    if scale != 1.0:
+        # 在原渲染尺寸下选择目标尺寸，再整体放大 scale 倍
+        width, height = choose_target_size(max(1, int(image.width / scale)), max(1, int(image.height / scale)),
+                                           density, model_id)
+        factor = min(scale, image.width / width, get_image_rules(model_id)['max_side'] / max(width, height))
+        width, height = max(1, int(width * factor)), max(1, int(height * factor))
+    else:
+        width, height = choose_target_size(image.width, image.height, density, model_id)
+    if (width, height) != image.size:
+        image = image.resize((width, height), Image.LANCZOS)
+
+    data, mime = encode_image(image, encoding)
+    return PreparedImage(
+        data=data,
+        mime=mime,
+        width=width,
+        height=height,
+        density=density,
+        tokens_before=tokens_before,
+        tokens_after=estimate_image_tokens(width, height, model_id),
+        bytes_before=len(baseline),
+        bytes_after=len(data),
+    )
+
+
+def looks_degraded(content, density):
+    """判断模型输出是否疑似因分辨率不足而退化"""
+    text = (content or '').strip()
+    if not text:
+        return density > 0.01
+    if text.count('�') > 3 or text.lower().count('illegible') > 2:
+        return True
+    # 页面墨迹较多但输出极短，通常是没有看清
+    return density > 0.05 and len(text) < 80
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+单个任务的性能剖析（管理员按需开启）
+开启剖析的任务在 cProfile 和 tracemalloc 下运行，同时在事件循环中定期测量调度延迟、采样各协程的等待位置；
+pstats 文件和JSON报告保存在输出目录的 profiles/<任务ID>/ 中，可通过任务API下载。
+未开启剖析的任务不经过这里，没有额外开销
+"""
+
+import os
+import json
+import time
+import asyncio
+import cProfile
+import pstats
+import threading
+import tracemalloc
+from collections import Counter
+
+# 剖析结果目录（输出目录下，每个任务一个子目录）
+PROFILE_DIR = 'profiles'
+REPORT_FILE = 'report.json'
+PSTATS_FILE = 'cprofile.prof'
+
+# 事件循环调度延迟的测量间隔（秒）
+LAG_INTERVAL = 0.05
+
+# 每测量多少次延迟采样一次任务状态和内存（第一次测量后也采样一次）
+TASK_SAMPLE_EVERY = 4
+
+# 延迟直方图的桶上界（毫秒），最后一个桶不设上界
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# tracemalloc 记录的调用栈深度
+TRACEMALLOC_FRAMES = 10
+
+# 内存增长超过上次快照的比例时重新快照，保留接近峰值时的分配位置；每个任务最多快照次数
+SNAPSHOT_GROWTH = 1.2
+MAX_SNAPSHOTS = 8
+
+# 报告中列出的函数数、分配位置数、任务等待位置数和时间线采样数
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 30
+TOP_WAITING = 30
+MAX_TIMELINE = 2000
+
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+# 同一进程内可能同时有多个剖析任务，tracemalloc 在最后一个任务结束时才停止
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _tracemalloc_owned = True
+        if _tracemalloc_users == 0:
+            tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        # 由 PYTHONTRACEMALLOC 等外部开启的跟踪保持不变
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+def profile_dir(output_dir, job_id):
+    return os.path.join(output_dir, PROFILE_DIR, job_id)
+
+
+def load_report(output_dir, job_id):
+    """读取任务的剖析报告；没有时抛出 FileNotFoundError"""
+    with open(os.path.join(profile_dir(output_dir, job_id), REPORT_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ))
+
+
+def _top_allocations(snapshot):
+    if snapshot is None:
+        return []
+    return [
+        {'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+         'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+        for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+    ]
+
+
+def _top_functions(profiler, key):
+    stats = pstats.Stats(profiler).stats
+    index = {'cumulative': 3, 'internal': 2}[key]
+    rows = sorted(stats.items(), key=lambda item: item[1][index], reverse=True)[:TOP_FUNCTIONS]
+    return [
+        {'function': f'{file}:{line}({name})', 'calls': calls, 'primitive_calls': primitive,
+         'tottime': round(tottime, 4), 'cumtime': round(cumtime, 4)}
+        for (file, line, name), (primitive, calls, tottime, cumtime, _) in rows
+    ]
+
+
+def _waiting_at(task):
+    """任务当前等待的位置：沿 await 链找到最内层的协程帧（跳过 asyncio 自身的帧，如 sleep、to_thread）"""
+    coro, frame, innermost = task.get_coro(), None, None
+    while coro is not None:
+        current = getattr(coro, 'cr_frame', None) or getattr(coro, 'gi_frame', None)
+        if current is not None:
+            innermost = current
+            if not current.f_code.co_filename.startswith(_ASYNCIO_DIR):
+                frame = current
+        coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None)
+    frame = frame or innermost
+    if frame is None:
+        return 'running'
+    return f'{frame.f_code.co_filename}:{frame.f_lineno}({frame.f_code.co_name})'
+
+
+class JobProfiler:
+    """
+    在剖析下运行一个任务（async with 包住任务的协程）
+
+    cProfile 只覆盖事件循环所在线程（to_thread 中的渲染、预处理显示为等待时间），
+    tracemalloc 统计整个进程的分配；多进程分片时工作进程中的页面处理不在剖析范围内
+    """
+
+    def __init__(self, output_dir, job_id, attempt=1):
+        self.path = profile_dir(output_dir, job_id)
+        self.job_id = job_id
+        self.attempt = attempt
+        self.summary = None
+        self._profiler = None
+        self._profiler_error = None
+        self._sampler = None
+        self._lags = []
+        self._waiting = Counter()
+        self._timeline = []
+        self._task_samples = 0
+        self._max_tasks = 0
+        self._peak_snapshot = None
+        self._snapshot_size = 0
+        self._snapshots = 0
+
+    async def __aenter__(self):
+        self._started = time.monotonic()
+        self._started_at = time.time()
+        _start_tracemalloc()
+        self._profiler = cProfile.Profile()
+        try:
+            self._profiler.enable()
+        except ValueError as e:
+            # 本线程已有其他剖析工具在运行
+            self._profiler, self._profiler_error = None, str(e)
+        self._sampler = asyncio.create_task(self._sample(), name='job-profiler')
+        return self
+
+    async def __aexit__(self, *exc):
+        self._sampler.cancel()
+        try:
+            await self._sampler
+        except asyncio.CancelledError:
+            pass
+        if self._profiler:
+            self._profiler.disable()
+        end_snapshot = _snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        _stop_tracemalloc()
+        try:
+            self._write(end_snapshot, current, peak, time.monotonic() - self._started, exc[1])
+        except OSError as e:
+            print(f"⚠️  保存性能剖析结果失败: {e}")
+        return False
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        ticks = 0
+        while True:
+            expected = loop.time() + LAG_INTERVAL
+            await asyncio.sleep(LAG_INTERVAL)
+            self._lags.append(max(0.0, loop.time() - expected))
+            ticks += 1
+            if ticks % TASK_SAMPLE_EVERY == 1:
+                self._sample_tasks(loop)
+
+    def _sample_tasks(self, loop):
+        current = asyncio.current_task(loop)
+        tasks = [t for t in asyncio.all_tasks(loop) if t is not current]
+        self._task_samples += 1
+        self._max_tasks = max(self._max_tasks, len(tasks))
+        self._waiting.update(_waiting_at(t) for t in tasks)
+
+        traced, _ = tracemalloc.get_traced_memory()
+        if len(self._timeline) < MAX_TIMELINE:
+            self._timeline.append([round(time.monotonic() - self._started, 2), len(tasks),
+                                   round(traced / 1024 / 1024, 2)])
+        if self._snapshots < MAX_SNAPSHOTS and traced > self._snapshot_size * SNAPSHOT_GROWTH:
+            self._peak_snapshot, self._snapshot_size = _snapshot(), traced
+            self._snapshots += 1
+
+    def _lag_report(self):
+        lags_ms = [lag * 1000 for lag in self._lags]
+        histogram = [{'le_ms': bound, 'count': 0} for bound in LAG_BUCKETS_MS] + [{'le_ms': None, 'count': 0}]
+        for lag in lags_ms:
+            bucket = next((i for i, bound in enumerate(LAG_BUCKETS_MS) if lag <= bound), len(LAG_BUCKETS_MS))
+            histogram[bucket]['count'] += 1
+        return {
+            'interval_ms': LAG_INTERVAL * 1000,
+            'samples': len(lags_ms),
+            'max_ms': round(max(lags_ms, default=0), 2),
+            'mean_ms': round(sum(lags_ms) / len(lags_ms), 2) if lags_ms else 0,
+            'histogram': histogram,
+        }
+
+    def _write(self, end_snapshot, current, peak, duration, error):
+        os.makedirs(self.path, exist_ok=True)
+        if self._profiler:
+            self._profiler.dump_stats(os.path.join(self.path, PSTATS_FILE))
+            cprofile = {
+                'thread': 'event-loop',
+                'by_cumulative': _top_functions(self._profiler, 'cumulative'),
+                'by_internal': _top_functions(self._profiler, 'internal'),
+            }
+        else:
+            cprofile = {'error': self._profiler_error}
+        report = {
+            'job_id': self.job_id,
+            'attempt': self.attempt,
+            'started_at': self._started_at,
+            'duration': round(duration, 3),
+            'error': str(error) if error else None,
+            'cprofile': cprofile,
+            'memory': {
+                # 同时有多个剖析任务时峰值为进程内的共同峰值
+                'peak_mb': round(peak / 1024 / 1024, 2),
+                'end_mb': round(current / 1024 / 1024, 2),
+                'near_peak_mb': round(self._snapshot_size / 1024 / 1024, 2),
+                'near_peak_top': _top_allocations(self._peak_snapshot),
+                'end_top': _top_allocations(end_snapshot),
+            },
+            'loop_lag': self._lag_report(),
+            'tasks': {
+                'samples': self._task_samples,
+                'max_tasks': self._max_tasks,
+                'waiting': [{'location': location, 'samples': count}
+                            for location, count in self._waiting.most_common(TOP_WAITING)],
+                'timeline': self._timeline,
+            },
+        }
+        tmp = os.path.join(self.path, REPORT_FILE + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.path, REPORT_FILE))
+        self.summary = {
+            'duration': report['duration'],
+            'peak_mb': report['memory']['peak_mb'],
+            'max_lag_ms': report['loop_lag']['max_ms'],
+            'max_tasks': self._max_tasks,
+        }
+
+
+async def profiled(awaitable, profiler=None):
+    """profiler 为None时直接等待，不做任何剖析"""
+    if profiler is None:
+        return await awaitable
+    async with profiler:
+        return await awaitable
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+按页读取处理结果
+流水线写Markdown时同时写入每页的字节偏移索引，按页码范围读取时只读取对应的片段；
+每页预渲染的HTML缓存在输出目录中，内容不变时直接复用。
+
+另写一份每页一行的JSON（内容、模型、token、耗时、缓存情况）和定长记录的二进制偏移索引，
+下游（搜索索引、导出、预览）按页码范围 mmap 读取，可以逐页增量处理而不必解析整份结果
+"""
+
+import os
+import json
+import mmap
+import struct
+import time
+import hashlib
+import shutil
+from pathlib import Path
+
+# 页与页之间的分隔（与 zerox 的输出保持一致）
+PAGE_SEPARATOR = '\n\n'
+
+# 页索引文件名
+INDEX_FILE = 'page_index.json'
+
+# 预渲染HTML的缓存目录
+RENDER_DIR = 'rendered'
+
+# 每页一行的JSON结果（pages.<代号>.jsonl，每次写入一代）及其偏移索引
+JSONL_PREFIX = 'pages.'
+JSONL_SUFFIX = '.jsonl'
+JSONL_INDEX_FILE = 'pages.idx'
+
+# 偏移索引头：标识、版本、数据文件代号、数据字节数（24字节）
+INDEX_HEADER = struct.Struct('<4sHxxQQ')
+INDEX_MAGIC = b'ZXPL'
+INDEX_VERSION = 1
+
+# 偏移索引的记录：页码、字节偏移、字节数（小端定长，每页16字节，按页码升序）
+INDEX_RECORD = struct.Struct('<IQI')
+
+# 单次请求最多返回的页数
+MAX_PAGES_PER_REQUEST = 100
+
+
+def write_markdown(output_dir, file_name, results):
+    """写入整份Markdown和每页的字节偏移索引，返回Markdown路径"""
+    os.makedirs(output_dir, exist_ok=True)
+    md_path = os.path.join(output_dir, f'{file_name}.md')
+    separator = PAGE_SEPARATOR.encode('utf-8')
+    entries, offset = [], 0
+    with open(md_path, 'wb') as f:
+        for index, result in enumerate(results):
+            if index:
+                f.write(separator)
+                offset += len(separator)
+            data = result.content.encode('utf-8')
+            f.write(data)
+            entries.append({'page': result.page, 'offset': offset, 'length': len(data),
+                            'status': result.status, 'model': result.model})
+            offset += len(data)
+
+    tmp = os.path.join(output_dir, INDEX_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'markdown': os.path.basename(md_path), 'pages': entries}, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(output_dir, INDEX_FILE))
+    write_jsonl(output_dir, results)
+    # 重新处理后旧的预渲染结果不再有用
+    shutil.rmtree(os.path.join(output_dir, RENDER_DIR), ignore_errors=True)
+    return md_path
+
+
+def jsonl_name(generation):
+    return f'{JSONL_PREFIX}{generation:016x}{JSONL_SUFFIX}'
+
+
+def write_jsonl(output_dir, results):
+    """
+    写入每页一行的JSON和二进制偏移索引
+
+    每次写入使用新一代的数据文件，索引头记录代号和数据大小；替换索引是唯一的切换点，
+    读取方总是看到同一代的索引和数据。切换后删除旧的数据文件（已打开的读取方不受影响）
+    """
+    generation = time.time_ns()
+    data_path = os.path.join(output_dir, jsonl_name(generation))
+    index_path = os.path.join(output_dir, JSONL_INDEX_FILE)
+    records, offset = [], 0
+    with open(data_path + '.tmp', 'wb') as f:
+        for result in sorted(results, key=lambda r: r.page):
+            line = json.dumps({
+                'page': result.page,
+                'markdown': result.content,
+                'model': result.model,
+                'status': result.status,
+                'input_tokens': result.input_tokens,
+                'output_tokens': result.output_tokens,
+                'latency': round(result.latency, 3),
+                'cache': result.cache or None,
+            }, ensure_ascii=False).encode('utf-8') + b'\n'
+            f.write(line)
+            records.append(INDEX_RECORD.pack(result.page, offset, len(line)))
+            offset += len(line)
+    os.replace(data_path + '.tmp', data_path)
+    with open(index_path + '.tmp', 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, generation, offset))
+        f.write(b''.join(records))
+    os.replace(index_path + '.tmp', index_path)
+
+    current = os.path.basename(data_path)
+    for name in os.listdir(output_dir):
+        if name.startswith(JSONL_PREFIX) and name.endswith(JSONL_SUFFIX) and name != current:
+            try:
+                os.remove(os.path.join(output_dir, name))
+            except OSError:
+                # Windows 下仍被映射的旧文件无法删除，下次写入时再清理
+                pass
+
+
+class PageLines:
+    """
+    按页码范围读取每页一行的JSON结果
+
+    偏移索引和数据文件都以 mmap 映射，二分查找起始页后直接切出对应字节，
+    读取量只与请求的页数有关；页面按页码顺序存放，一个范围对应一段连续字节
+    """
+
+    # 打开时数据文件恰好被新一代替换，重新读取索引的次数
+    OPEN_RETRIES = 3
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.index_path = os.path.join(output_dir, JSONL_INDEX_FILE)
+        self.path = None
+        self.generation = None
+        self._files, self._data, self._index = [], None, None
+
+    @staticmethod
+    def exists(output_dir):
+        return os.path.exists(os.path.join(output_dir, JSONL_INDEX_FILE))
+
+    @staticmethod
+    def read_header(index_path):
+        """返回索引头中的 (代号, 数据大小)"""
+        with open(index_path, 'rb') as f:
+            return PageLines._parse_header(f.read(INDEX_HEADER.size))
+
+    @staticmethod
+    def _parse_header(data):
+        if len(data) < INDEX_HEADER.size:
+            raise ValueError('页索引不完整')
+        magic, version, generation, size = INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError('页索引格式不支持')
+        return generation, size
+
+    def _map(self, path):
+        f = open(path, 'rb')
+        self._files.append(f)
+        # 空文件不能映射（没有页面的结果）
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+
+    def open(self):
+        for _ in range(self.OPEN_RETRIES):
+            try:
+                self._index = self._map(self.index_path)
+                self.generation, size = self._parse_header(self._index)
+                self.path = os.path.join(self.output_dir, jsonl_name(self.generation))
+                try:
+                    self._data = self._map(self.path)
+                except FileNotFoundError:
+                    # 读取索引后结果被重新写入、旧数据已删除，重新读取新索引
+                    self.close()
+                    continue
+                if len(self._data) != size:
+                    raise ValueError('页数据与索引不一致')
+                return self
+            except Exception:
+                self.close()
+                raise
+        raise FileNotFoundError('结果正在被重新写入')
+
+    def close(self):
+        for mapped in (self._index, self._data):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for f in self._files:
+            f.close()
+        self._files.clear()
+        self._index = self._data = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return (len(self._index) - INDEX_HEADER.size) // INDEX_RECORD.size
+
+    def _record(self, position):
+        return INDEX_RECORD.unpack_from(self._index, INDEX_HEADER.size + position * INDEX_RECORD.size)
+
+    def _first_at_least(self, page):
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._record(middle)[0] < page:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def span(self, start, end, limit=None):
+        """页码在 [start, end] 内（最多 limit 页）的 (字节偏移, 字节数, 页数)"""
+        first = self._first_at_least(start)
+        last = self._first_at_least(end + 1)
+        if limit is not None:
+            last = min(last, first + limit)
+        if first >= last:
+            return 0, 0, 0
+        offset = self._record(first)[1]
+        _, last_offset, last_length = self._record(last - 1)
+        return offset, last_offset + last_length - offset, last - first
+
+    def iter_bytes(self, start, end, chunk_size=64 * 1024):
+        """逐块产出范围内的原始JSON Lines"""
+        offset, length, _ = self.span(start, end)
+        for position in range(offset, offset + length, chunk_size):
+            yield self._data[position:min(position + chunk_size, offset + length)]
+
+    def get(self, start, end, limit=None):
+        """解析范围内的页面"""
+        offset, length, _ = self.span(start, end, limit)
+        return [json.loads(line) for line in self._data[offset:offset + length].splitlines()]
+
+
+def _markdown_to_html(content):
+    """服务端渲染Markdown；未安装 markdown 包时返回None，由浏览器渲染"""
+    try:
+        import markdown
+    except ImportError:
+        return None
+    return markdown.markdown(content, extensions=['tables', 'fenced_code'])
+
+
+class ResultPages:
+    """一个输出目录中的分页结果"""
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+
+    def _load_index(self):
+        index_path = self.output_dir / INDEX_FILE
+        if index_path.exists():
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            return self.output_dir / index['markdown'], index['pages']
+        # zerox 处理的文件没有页索引，整份结果作为一页
+        md_files = list(self.output_dir.glob('*.md'))
+        if not md_files:
+            raise FileNotFoundError('结果不存在')
+        size = md_files[0].stat().st_size
+        return md_files[0], [{'page': 1, 'offset': 0, 'length': size, 'status': 'ok', 'model': ''}]
+
+    def index(self):
+        """每页的页码、字节数、状态和模型（不含内容）"""
+        _, entries = self._load_index()
+        return [{k: e[k] for k in ('page', 'length', 'status', 'model')} for e in entries]
+
+    def _html(self, page, content):
+        """读取或生成一页的预渲染HTML，缓存文件名含内容摘要"""
+        digest = hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]
+        cache_path = self.output_dir / RENDER_DIR / f'page_{page:05d}_{digest}.html'
+        if cache_path.exists():
+            return cache_path.read_text(encoding='utf-8')
+        html = _markdown_to_html(content)
+        if html is not None:
+            cache_path.parent.mkdir(exist_ok=True)
+            tmp = cache_path.with_suffix('.tmp')
+            tmp.write_text(html, encoding='utf-8')
+            os.replace(tmp, cache_path)
+        return html
+
+    def get(self, start, end, html=True):
+        """读取页码在 [start, end] 内的页面，最多 MAX_PAGES_PER_REQUEST 页"""
+        if PageLines.exists(self.output_dir):
+            with PageLines(self.output_dir) as lines:
+                pages = lines.get(start, end, limit=MAX_PAGES_PER_REQUEST)
+            if html:
+                for page in pages:
+                    page['html'] = self._html(page['page'], page['markdown'])
+            return pages
+
+        md_path, entries = self._load_index()
+        selected = [e for e in entries if start <= e['page'] <= end][:MAX_PAGES_PER_REQUEST]
+        pages = []
+        with open(md_path, 'rb') as f:
+            for entry in selected:
+                f.seek(entry['offset'])
+                content = f.read(entry['length']).decode('utf-8')
+                page = {'page': entry['page'], 'markdown': content,
+                        'status': entry['status'], 'model': entry['model']}
+                if html:
+                    page['html'] = self._html(entry['page'], content)
+                pages.append(page)
+        return pages
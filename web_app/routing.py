@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+按页面复杂度路由模型
+在本地为每页估算表格、文本密度和手写程度，
+简单页面交给快速模型，复杂页面交给精确模型
+"""
+
+from dataclasses import dataclass
+
+from PIL import Image
+
+from preprocess import text_density
+
+# 同一提供商内的 快速模型 -> 精确模型
+MODEL_PAIRS = {
+    'gemini/gemini-1.5-flash': 'gemini/gemini-1.5-pro',
+    'gpt-4o-mini': 'gpt-4o',
+}
+
+# 复杂度达到该值的页面交给精确模型
+DEFAULT_THRESHOLD = 0.5
+
+# 分析用的缩略图宽度
+ANALYSIS_WIDTH = 600
+
+# 行/列中深色像素超过该比例视为表格线
+RULE_RATIO = 0.5
+
+ROUTE_FAST = 'fast'
+ROUTE_ACCURATE = 'accurate'
+
+
+@dataclass
+class PageComplexity:
+    """单页复杂度评估"""
+    density: float
+    table: float
+    handwriting: float
+    score: float
+
+
+def model_pair(model_id):
+    """返回 (快速模型, 精确模型)；没有配对时返回 None"""
+    for fast, accurate in MODEL_PAIRS.items():
+        if model_id in (fast, accurate):
+            return fast, accurate
+    return None
+
+
+def _binarize(image):
+    gray = image.convert('L')
+    height = max(1, int(gray.height * ANALYSIS_WIDTH / gray.width))
+    return gray.resize((ANALYSIS_WIDTH, height), Image.BILINEAR).point(lambda p: 255 if p < 140 else 0)
+
+
+def _projection(binary):
+    """按行、按列统计深色像素占比（用 BOX 缩放在C层完成求均值）"""
+    width, height = binary.size
+    rows = [v / 255 for v in binary.resize((1, height), Image.BOX).tobytes()]
+    cols = [v / 255 for v in binary.resize((width, 1), Image.BOX).tobytes()]
+    return rows, cols
+
+
+def _table_score(rows, cols):
+    """表格线越多得分越高：横线和竖线同时出现时基本可以确定是表格"""
+    def count_rules(profile, ratio):
+        count, inside = 0, False
+        for value in profile:
+            is_rule = value >= ratio
+            if is_rule and not inside:
+                count += 1
+            inside = is_rule
+        return count
+
+    horizontal = count_rules(rows, RULE_RATIO)
+    vertical = count_rules(cols, RULE_RATIO * 0.3)
+    return min(1.0, horizontal / 8) * 0.6 + min(1.0, vertical / 4) * 0.4
+
+
+def _handwriting_score(rows):
+    """
+    印刷文字的行与行之间有清晰的空白行，手写或倾斜文字的行投影连成一片
+    用内容区域内空白行的占比估算
+    """
+    inked = [i for i, value in enumerate(rows) if value > 0.002]
+    if len(inked) < 20:
+        return 0.0
+    body = rows[inked[0]:inked[-1] + 1]
+    gaps = sum(1 for value in body if value <= 0.002) / len(body)
+    # 印刷文本空白行通常占 30% 以上
+    return max(0.0, min(1.0, (0.3 - gaps) / 0.25))
+
+
+def score_page(image):
+    """评估页面复杂度，得分范围 0-1"""
+    binary = _binarize(image)
+    rows, cols = _projection(binary)
+    density = text_density(image)
+    table = _table_score(rows, cols)
+    handwriting = _handwriting_score(rows)
+    score = max(table, handwriting, min(1.0, density / 0.15))
+    return PageComplexity(density=density, table=table, handwriting=handwriting, score=score)
+
+
+def choose_model(image, model_id, threshold=DEFAULT_THRESHOLD):
+    """返回 (路由, 模型ID, 复杂度)；所选模型没有配对时始终使用它"""
+    pair = model_pair(model_id)
+    complexity = score_page(image)
+    if not pair:
+        return ROUTE_ACCURATE, model_id, complexity
+    if complexity.score >= threshold:
+        return ROUTE_ACCURATE, pair[1], complexity
+    return ROUTE_FAST, pair[0], complexity
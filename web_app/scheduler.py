@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+优先级通道与公平调度
+任务分为 interactive / normal / bulk 三个通道：通道之间按权重做加权公平排队，
+同一通道内按用户/客户端轮转，等待超过通道上限的任务优先处理，避免低优先级任务饿死。
+同一套策略用于Web进程内的同步处理准入和共享任务队列的领取
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+LANE_INTERACTIVE = 'interactive'
+LANE_NORMAL = 'normal'
+LANE_BULK = 'bulk'
+LANES = (LANE_INTERACTIVE, LANE_NORMAL, LANE_BULK)
+DEFAULT_LANE = LANE_NORMAL
+
+# 通道权重：都有任务等待时，每处理 1 个 bulk 任务约处理 4 个 normal、8 个 interactive
+LANE_WEIGHTS = {LANE_INTERACTIVE: 8, LANE_NORMAL: 4, LANE_BULK: 1}
+
+# 防饿死：等待超过该时间（秒）的任务不再参与公平排队，按等待时间最长优先
+MAX_WAIT = {LANE_INTERACTIVE: 30, LANE_NORMAL: 120, LANE_BULK: 600}
+
+# 每个通道保留的等待时间样本数
+WAIT_WINDOW = 500
+
+# 客户端虚拟时间表超过该大小时清理不在排队中的条目
+MAX_CLIENTS = 1000
+
+
+def normalize_lane(value):
+    """解析优先级参数；为空时使用 normal，未知值报错"""
+    if not value:
+        return DEFAULT_LANE
+    lane = str(value).lower()
+    if lane not in LANES:
+        raise ValueError(f'未知的优先级: {value}（可选 {", ".join(LANES)}）')
+    return lane
+
+
+@dataclass
+class Ticket:
+    """一个等待调度的任务"""
+    key: object
+    lane: str = DEFAULT_LANE
+    client: str = None
+    enqueued_at: float = field(default_factory=time.time)
+    cost: float = 1.0
+
+
+class FairPolicy:
+    """
+    两级加权公平排队（按虚拟时间）
+
+    通道的虚拟时间每处理一个任务增加 cost / 权重，选择完成时间最早的通道；
+    通道内每个客户端的虚拟时间每处理一个任务增加 cost，选择虚拟时间最小的客户端。
+    空闲后重新出现的通道/客户端从当前时钟开始计，不会因为空闲积攒额度
+    """
+
+    def __init__(self, weights=None, max_wait=None):
+        self.weights = {**LANE_WEIGHTS, **(weights or {})}
+        self.max_wait = {**MAX_WAIT, **(max_wait or {})}
+        self._clock = 0.0
+        self._lane_time = {}
+        self._lane_clock = {}
+        self._client_time = {}
+        self._active_lanes = set()
+        self._active_clients = set()
+        self._lock = threading.Lock()
+
+    def _activate(self, tickets):
+        """新出现（上次选择时没有排队任务）的通道和客户端从当前时钟开始计"""
+        lanes = {t.lane for t in tickets}
+        for lane in lanes - self._active_lanes:
+            self._lane_time[lane] = max(self._lane_time.get(lane, 0.0), self._clock)
+        self._active_lanes = lanes
+        clients = {(t.lane, t.client) for t in tickets}
+        for key in clients - self._active_clients:
+            self._client_time[key] = max(self._client_time.get(key, 0.0), self._lane_clock.get(key[0], 0.0))
+        self._active_clients = clients
+
+    def select(self, tickets, now=None):
+        """选出下一个要处理的任务（不记账）"""
+        if not tickets:
+            return None
+        now = now or time.time()
+        with self._lock:
+            self._activate(tickets)
+            overdue = [t for t in tickets if now - t.enqueued_at >= self.max_wait[t.lane]]
+            if overdue:
+                return min(overdue, key=lambda t: t.enqueued_at)
+
+            lane = min(self._active_lanes,
+                       key=lambda l: (self._lane_time[l] + 1.0 / self.weights[l], LANES.index(l)))
+            candidates = [t for t in tickets if t.lane == lane]
+            client = min({t.client for t in candidates},
+                         key=lambda c: (self._client_time[(lane, c)], str(c)))
+            return min((t for t in candidates if t.client == client), key=lambda t: t.enqueued_at)
+
+    def charge(self, ticket):
+        """记录任务已被处理，推进通道和客户端的虚拟时间"""
+        with self._lock:
+            lane_key, client_key = ticket.lane, (ticket.lane, ticket.client)
+            # 持续排队的通道/客户端从自己上次的完成时间接着计，不与时钟取大，否则低权重通道会丢失份额；
+            # 新出现的已在 _activate 中对齐到时钟
+            start = self._lane_time.get(lane_key, self._clock)
+            self._clock = max(self._clock, start)
+            self._lane_time[lane_key] = start + ticket.cost / self.weights[lane_key]
+            client_start = self._client_time.get(client_key, self._lane_clock.get(lane_key, 0.0))
+            self._lane_clock[lane_key] = max(self._lane_clock.get(lane_key, 0.0), client_start)
+            self._client_time[client_key] = client_start + ticket.cost
+            if len(self._client_time) > MAX_CLIENTS:
+                # 不在排队中的客户端下次出现时会从通道时钟重新开始，可以删除
+                self._client_time = {key: value for key, value in self._client_time.items()
+                                     if key in self._active_clients}
+
+
+class LaneMetrics:
+    """按通道记录等待时间"""
+
+    def __init__(self, window=WAIT_WINDOW):
+        self._waits = {lane: deque(maxlen=window) for lane in LANES}
+        self._served = dict.fromkeys(LANES, 0)
+        self._lock = threading.Lock()
+
+    def record_wait(self, lane, seconds):
+        with self._lock:
+            self._waits[lane].append(seconds)
+            self._served[lane] += 1
+
+    def snapshot(self, depths=None):
+        depths = depths or {}
+        result = {}
+        with self._lock:
+            for lane in LANES:
+                waits = sorted(self._waits[lane])
+                count = len(waits)
+                result[lane] = {
+                    'depth': depths.get(lane, 0),
+                    'served': self._served[lane],
+                    'avg_wait': sum(waits) / count if count else None,
+                    'p50_wait': waits[count // 2] if count else None,
+                    'p95_wait': waits[min(count - 1, int(0.95 * count))] if count else None,
+                    'max_wait': waits[-1] if count else None,
+                }
+        return result
+
+
+class AdmissionScheduler:
+    """
+    进程内的处理准入：最多同时运行 max_running 个任务，
+    其余请求按优先级通道和客户端公平排队等待
+    """
+
+    def __init__(self, max_running=4, policy=None):
+        self.max_running = max(1, int(max_running))
+        self.policy = policy or FairPolicy()
+        self.metrics = LaneMetrics()
+        self._waiting = []
+        self._running = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, lane=DEFAULT_LANE, client=None):
+        """占用一个处理名额，离开时释放"""
+        ticket = Ticket(key=object(), lane=lane, client=client, enqueued_at=time.time())
+        with self._cond:
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    if self._running < self.max_running:
+                        chosen = self.policy.select(self._waiting)
+                        if chosen is ticket:
+                            break
+                        # 轮到的是别的请求，唤醒它
+                        self._cond.notify_all()
+                    # 定期醒来重新评估，等待时间超限的任务需要提升
+                    self._cond.wait(1.0)
+            except BaseException:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+                raise
+            self._waiting.remove(ticket)
+            self.policy.charge(ticket)
+            self._running += 1
+        self.metrics.record_wait(lane, time.time() - ticket.enqueued_at)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            depths = {lane: sum(1 for t in self._waiting if t.lane == lane) for lane in LANES}
+            running = self._running
+        return {'running': running, 'max_running': self.max_running,
+                'lanes': self.metrics.snapshot(depths)}
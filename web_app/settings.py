@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+应用配置与API密钥
+Web应用和后台工作进程共用
+"""
+
+import os
+import hmac
+import json
+from pathlib import Path
+
+CONFIG_FILE = Path(__file__).parent / 'config.json'
+
+# ========== 配置持久化工具 ==========
+def load_config() -> dict:
+    try:
+        if CONFIG_FILE.exists():
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception:
+        pass
+    return {}
+
+
+# 上传文件和处理结果（含断点）的目录：环境变量优先，其次 config.json 的 storage，默认为当前目录下的 uploads/、outputs/。
+# 多个节点共享任务队列时，所有Web实例和工作进程必须把这两个目录指向同一个共享存储（NFS、SMB 等挂载点）
+STORAGE_ENV = {'upload_folder': 'ZEROX_UPLOAD_FOLDER', 'output_folder': 'ZEROX_OUTPUT_FOLDER'}
+
+
+def _storage_folder(key, default):
+    return os.environ.get(STORAGE_ENV[key]) or load_config().get('storage', {}).get(key) or default
+
+
+UPLOAD_FOLDER = _storage_folder('upload_folder', 'uploads')
+OUTPUT_FOLDER = _storage_folder('output_folder', 'outputs')
+
+
+def save_config(cfg: dict) -> None:
+    try:
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+            json.dump(cfg, f, ensure_ascii=False, indent=2)
+    except Exception:
+        pass
+
+
+def apply_config_to_env() -> None:
+    cfg = load_config()
+    api = cfg.get('api_keys', {})
+    if api.get('openai'):
+        os.environ['OPENAI_API_KEY'] = api['openai']
+    if api.get('gemini'):
+        os.environ['GEMINI_API_KEY'] = api['gemini']
+    if api.get('azure'):
+        os.environ['AZURE_API_KEY'] = api['azure']
+
+
+# 管理员令牌的环境变量（优先于 config.json 的 admin.token）；都未配置时管理功能不可用
+ADMIN_TOKEN_ENV = 'ZEROX_ADMIN_TOKEN'
+
+
+def is_admin_token(token):
+    """请求携带的令牌是否为管理员令牌"""
+    expected = os.environ.get(ADMIN_TOKEN_ENV) or load_config().get('admin', {}).get('token')
+    return bool(expected and token) and hmac.compare_digest(str(token), str(expected))
+
+
+def get_api_key_for_model(model_id):
+    """根据模型ID获取对应的API密钥"""
+    cfg = load_config()
+    api = cfg.get('api_keys', {})
+    if model_id.startswith('gpt-4'):
+        return os.environ.get('OPENAI_API_KEY') or api.get('openai')
+    elif model_id.startswith('gemini'):
+        return os.environ.get('GEMINI_API_KEY') or api.get('gemini')
+    elif model_id.startswith('azure'):
+        return os.environ.get('AZURE_API_KEY') or api.get('azure')
+    return None
+
+
+def get_provider_for_model(model_id):
+    """根据模型ID获取提供商"""
+    if model_id.startswith('gpt-4'):
+        return 'openai'
+    elif model_id.startswith('gemini'):
+        return 'gemini'
+    elif model_id.startswith('azure'):
+        return 'azure'
+    return None
+
+
+def set_api_key_env(model_id, api_key):
+    """把模型对应的API密钥写入环境变量（LiteLLM从环境变量读取）"""
+    env_key = {
+        'openai': 'OPENAI_API_KEY',
+        'gemini': 'GEMINI_API_KEY',
+        'azure': 'AZURE_API_KEY'
+    }.get(get_provider_for_model(model_id))
+    if env_key:
+        os.environ[env_key] = api_key
+
+
+def get_failover_model(model_id, requested=None):
+    """
+    获取备用模型：requested（任务的 failover_model）优先，否则取 config.json 的 failover 中按提供商配置的模型
+
+    默认不做故障转移，文档页面只会发给明确配置的备用提供商；备用模型未配置API密钥时返回None
+    """
+    backup = requested or load_config().get('failover', {}).get(get_provider_for_model(model_id))
+    if not backup or backup == model_id:
+        return None
+    api_key = get_api_key_for_model(backup)
+    if not api_key:
+        return None
+    set_api_key_env(backup, api_key)
+    return backup
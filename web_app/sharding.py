@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+多进程页面分片
+把文档的待处理页面按连续页码区间分给多个工作进程，
+每个进程有自己的事件循环并分得一部分并发额度；协调进程按页码顺序合并结果
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from hedging import CallMetrics, latency_tracker
+
+# 传给工作进程的环境变量（API密钥可能在进程池启动之后才设置）
+FORWARD_ENV = ('OPENAI_API_KEY', 'GEMINI_API_KEY', 'AZURE_API_KEY', 'AZURE_API_BASE', 'AZURE_API_VERSION')
+
+# 工作进程启动时执行的初始化函数（基准测试用它替换模型调用）
+worker_initializer = None
+
+# 按进程数复用进程池，避免每个请求都重新启动解释器
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+@dataclass
+class ShardResult:
+    """单个分片的处理结果"""
+    pages: list
+    failures: dict
+    preprocess_stats: dict
+    route_stats: dict
+    call_counts: dict
+    pid: int = 0
+
+
+def split_pages(page_numbers, workers):
+    """把页面按连续区间尽量均匀地分成 workers 份"""
+    workers = max(1, min(workers, len(page_numbers)))
+    size, extra = divmod(len(page_numbers), workers)
+    shards, start = [], 0
+    for i in range(workers):
+        end = start + size + (i < extra)
+        shards.append(page_numbers[start:end])
+        start = end
+    return shards
+
+
+def split_concurrency(concurrency, workers):
+    """把并发额度分给各工作进程，每个进程至少1"""
+    size, extra = divmod(concurrency, workers)
+    return [max(1, size + (i < extra)) for i in range(workers)]
+
+
+def get_executor(workers):
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            # 使用 spawn：父进程里有Flask和线程池的线程，fork 后可能死锁
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=worker_initializer,
+            )
+            _executors[workers] = executor
+        return executor
+
+
+def _discard_executor(workers):
+    with _executors_lock:
+        executor = _executors.pop(workers, None)
+    if executor:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executors():
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_shard(options, page_numbers, concurrency, text_pages, env, latency_samples):
+    """工作进程入口：在独立的事件循环中处理一个分片，每页仍写入断点"""
+    from ocr_pipeline import PipelineJob
+
+    os.environ.update(env)
+    latency_tracker.load(latency_samples)
+    job = PipelineJob(**{**options, 'concurrency': concurrency, 'workers': 1})
+    job.text_pages = text_pages
+    results, failures = asyncio.run(job._dispatch(page_numbers, {}))
+    return ShardResult(
+        pages=results,
+        # 异常对象不一定能序列化，只回传错误信息
+        failures={number: f'{type(e).__name__}: {e}' for number, e in failures.items()},
+        preprocess_stats=job.preprocess_stats,
+        route_stats=job.route_stats,
+        call_counts=job.call_metrics.snapshot(),
+        pid=os.getpid(),
+    )
+
+
+def _merge(job, shard):
+    """把分片统计合并到协调进程的任务上"""
+    for key, value in shard.preprocess_stats.items():
+        if key != 'enabled':
+            job.preprocess_stats[key] += value
+    for route, stats in shard.route_stats.items():
+        merged = job.route_stats.setdefault(route, dict.fromkeys(stats, 0))
+        for key, value in stats.items():
+            merged[key] = value if key == 'model' else merged[key] + value
+    for name in CallMetrics.FIELDS:
+        if shard.call_counts.get(name):
+            job.call_metrics.incr(name, shard.call_counts[name])
+
+
+async def dispatch_sharded(job, page_numbers):
+    """
+    把页面分给多个工作进程处理
+
+    返回值与 PipelineJob._dispatch 相同：(结果列表, {失败页码: 异常})
+    """
+    from ocr_pipeline import PageResult
+
+    shards = split_pages(page_numbers, job.workers)
+    shares = split_concurrency(job.concurrency, len(shards))
+    executor = get_executor(job.workers)
+    env = {key: os.environ[key] for key in FORWARD_ENV if key in os.environ}
+    samples = latency_tracker.export()
+
+    loop = asyncio.get_running_loop()
+    futures = [
+        loop.run_in_executor(
+            executor, run_shard, job.options, shard, share,
+            {n: job.text_pages[n] for n in shard if n in job.text_pages}, env, samples)
+        for shard, share in zip(shards, shares)
+    ]
+    outcomes = await asyncio.gather(*futures, return_exceptions=True)
+
+    results, failures = [], {}
+    for shard, share, outcome in zip(shards, shares, outcomes):
+        if isinstance(outcome, Exception):
+            if isinstance(outcome, BrokenProcessPool):
+                _discard_executor(job.workers)
+            # 工作进程异常退出：已完成的页面已写入断点，其余页面视为失败
+            saved = await asyncio.to_thread(job.checkpoint.load_pages)
+            for number in shard:
+                if number in saved:
+                    results.append(PageResult(**{**saved[number], 'cache': 'checkpoint'}))
+                else:
+                    failures[number] = outcome
+            job.shard_stats.append({'pages': [shard[0], shard[-1]], 'concurrency': share,
+                                    'error': str(outcome) or type(outcome).__name__})
+            continue
+        _merge(job, outcome)
+        job.shard_stats.append({'pages': [shard[0], shard[-1]], 'concurrency': share,
+                                'pid': outcome.pid, 'failed': len(outcome.failures)})
+        results.extend(outcome.pages)
+        failures.update({n: RuntimeError(message) for n, message in outcome.failures.items()})
+    return results, failures
@@ -30,6 +30,11 @@ class HistoryManager {
             this.loadHistoryList();
         });
 
+        // 批量导出按钮
+        document.getElementById('exportHistory')?.addEventListener('click', () => {
+            this.exportResults();
+        });
+
         // 清空历史按钮
         document.getElementById('clearHistory')?.addEventListener('click', () => {
             this.clearAllHistory();
@@ -242,6 +247,25 @@ class HistoryManager {
         return filtered;
     }
 
+    // 按当前的日期和文件名筛选批量导出服务器上的结果（浏览器直接下载zip流）
+    exportResults() {
+        const params = new URLSearchParams({pages: '1'});
+        const dateFilter = document.getElementById('filterDate').value;
+        if (dateFilter) {
+            params.set('from', dateFilter);
+            params.set('to', dateFilter);
+        }
+        const searchQuery = document.getElementById('searchFiles').value.trim();
+        if (searchQuery) {
+            params.set('q', searchQuery);
+        }
+        if (!dateFilter && !searchQuery) {
+            // 未筛选时导出全部结果
+            params.set('from', '1970-01-01');
+        }
+        window.location.href = `/api/export?${params}`;
+    }
+
     // 更新分页
     updatePagination(totalItems) {
         const pagination = document.getElementById('historyPagination');
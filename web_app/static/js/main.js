@@ -175,9 +175,13 @@ const API = {
     },
 
     // 上传文件
-    async uploadFile(file) {
+    async uploadFile(file, modelId) {
         const formData = new FormData();
         formData.append('file', file);
+        // 服务端按所选模型提前预处理页面
+        if (modelId) {
+            formData.append('model_id', modelId);
+        }
         
         try {
             const response = await fetch('/api/upload', {
@@ -214,7 +218,9 @@ const API = {
             
             const data = await response.json();
             if (!response.ok) {
-                throw new Error(data.error || '处理失败');
+                const error = new Error(data.error || '处理失败');
+                error.data = data;
+                throw error;
             }
             
             return data;
@@ -224,6 +230,136 @@ const API = {
         }
     },
 
+    // 预估各模型的处理耗时和Token
+    async estimateFile(fileId, options = {}) {
+        try {
+            const response = await fetch('/api/estimate', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ file_id: fileId, options: options })
+            });
+            
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.error || '预估失败');
+            }
+            
+            return data;
+        } catch (error) {
+            console.error('预估失败:', error);
+            throw error;
+        }
+    },
+
+    // 流式处理文件：onEvent 依次收到 start / delta / page 事件，返回最终结果
+    async processFileStream(fileId, modelId, options = {}, onEvent = () => {}) {
+        const response = await fetch('/api/process/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                file_id: fileId,
+                model_id: modelId,
+                options: options
+            })
+        });
+
+        if (!response.ok) {
+            const data = await response.json();
+            const error = new Error(data.error || '处理失败');
+            error.data = data;
+            throw error;
+        }
+
+        // 逐块读取 Server-Sent Events
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            const messages = buffer.split('\n\n');
+            buffer = messages.pop();
+            for (const message of messages) {
+                if (!message.startsWith('data: ')) {
+                    continue;
+                }
+                const event = JSON.parse(message.slice(6));
+                if (event.type === 'result') {
+                    return { success: true, result: event.result };
+                }
+                if (event.type === 'error') {
+                    const error = new Error(event.error || '处理失败');
+                    error.data = event;
+                    throw error;
+                }
+                onEvent(event);
+            }
+        }
+        throw new Error('连接已断开，处理结果将在完成后保存');
+    },
+
+    // 获取处理结果的页索引
+    async getResultIndex(fileId) {
+        const response = await fetch(`/api/results/${encodeURIComponent(fileId)}/index`);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || '获取结果失败');
+        }
+        return data;
+    },
+
+    // 按页码范围获取处理结果
+    async getResultPages(fileId, start, end) {
+        const response = await fetch(`/api/results/${encodeURIComponent(fileId)}/pages?start=${start}&end=${end}`);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || '获取结果失败');
+        }
+        return data;
+    },
+
+    // 获取已保存的结构化提取Schema
+    async getSchemas() {
+        const response = await fetch('/api/schemas');
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || '获取Schema失败');
+        }
+        return data;
+    },
+
+    // 续跑失败的任务
+    async resumeFile(fileId) {
+        try {
+            const response = await fetch('/api/resume', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ file_id: fileId })
+            });
+            
+            const data = await response.json();
+            if (!response.ok) {
+                const error = new Error(data.error || '续跑失败');
+                error.data = data;
+                throw error;
+            }
+            
+            return data;
+        } catch (error) {
+            console.error('续跑失败:', error);
+            throw error;
+        }
+    },
+
     // 下载结果
     async downloadResult(fileId) {
         try {
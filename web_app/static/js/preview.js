@@ -3,6 +3,152 @@
  * 处理Markdown预览和结果展示
  */
 
+// 每页占位高度的估算：按Markdown字节数，最少 120px
+const PAGE_MIN_HEIGHT = 120;
+const PAGE_BYTES_PER_PIXEL = 2.5;
+
+// 距可见区域多远（px）时开始加载页面，超出该距离两倍时卸载
+const PAGE_PRELOAD_MARGIN = 800;
+
+// 单次请求的最多页数（与服务端上限一致）
+const PAGES_PER_REQUEST = 100;
+
+// 分页结果的虚拟滚动预览：只加载、渲染和高亮可见区域附近的页面
+class PagedPreview {
+    constructor(container, fileId, pages, mode = 'preview') {
+        this.container = container;
+        this.fileId = fileId;
+        this.mode = mode;
+        this.cache = new Map();
+        this.rendered = new Set();
+        this.wanted = new Set();
+        this.loading = new Set();
+        this.slots = new Map();
+
+        container.innerHTML = '';
+        pages.forEach(info => {
+            const slot = document.createElement('div');
+            slot.className = 'result-page';
+            slot.dataset.page = info.page;
+            slot.style.minHeight = `${Math.max(PAGE_MIN_HEIGHT, info.length / PAGE_BYTES_PER_PIXEL)}px`;
+            container.appendChild(slot);
+            this.slots.set(info.page, slot);
+        });
+
+        this.loadObserver = new IntersectionObserver(entries => this.onIntersect(entries, true), {
+            root: container, rootMargin: `${PAGE_PRELOAD_MARGIN}px 0px`
+        });
+        this.unloadObserver = new IntersectionObserver(entries => this.onIntersect(entries, false), {
+            root: container, rootMargin: `${PAGE_PRELOAD_MARGIN * 2}px 0px`
+        });
+        this.slots.forEach(slot => {
+            this.loadObserver.observe(slot);
+            this.unloadObserver.observe(slot);
+        });
+    }
+
+    onIntersect(entries, loading) {
+        entries.forEach(entry => {
+            const page = parseInt(entry.target.dataset.page);
+            if (loading && entry.isIntersecting) {
+                this.wanted.add(page);
+            } else if (!loading && !entry.isIntersecting) {
+                this.wanted.delete(page);
+                this.unload(page);
+            }
+        });
+        if (loading) {
+            this.scheduleFetch();
+        }
+    }
+
+    // 合并同一帧内需要的页面，按连续页码范围批量请求
+    scheduleFetch() {
+        if (this.fetchTimer) {
+            return;
+        }
+        this.fetchTimer = setTimeout(() => {
+            this.fetchTimer = null;
+            const missing = [...this.wanted].filter(p => !this.cache.has(p) && !this.loading.has(p));
+            this.wanted.forEach(page => {
+                if (this.cache.has(page)) {
+                    this.render(page);
+                }
+            });
+            if (missing.length === 0) {
+                return;
+            }
+            const start = Math.min(...missing);
+            const end = Math.min(Math.max(...missing), start + PAGES_PER_REQUEST - 1);
+            const requested = missing.filter(p => p <= end);
+            requested.forEach(p => this.loading.add(p));
+            API.getResultPages(this.fileId, start, end).then(data => {
+                data.pages.forEach(page => this.cache.set(page.page, page));
+                requested.forEach(p => this.loading.delete(p));
+                this.wanted.forEach(page => this.render(page));
+                // 超出单次请求页数的部分继续加载
+                if (missing.length > requested.length) {
+                    this.scheduleFetch();
+                }
+            }).catch(error => {
+                requested.forEach(p => this.loading.delete(p));
+                Utils.showToast('加载失败', error.message, 'error');
+            });
+        }, 50);
+    }
+
+    render(page) {
+        const data = this.cache.get(page);
+        const slot = this.slots.get(page);
+        if (!data || !slot || this.rendered.has(page) || this.destroyed) {
+            return;
+        }
+        if (this.mode === 'preview') {
+            // 服务端未安装Markdown渲染库时在浏览器中渲染
+            slot.innerHTML = data.html !== null && data.html !== undefined ? data.html : marked.parse(data.markdown);
+            if (typeof hljs !== 'undefined') {
+                slot.querySelectorAll('pre code').forEach(block => hljs.highlightElement(block));
+            }
+        } else {
+            const pre = document.createElement('pre');
+            pre.className = 'mb-0';
+            pre.style.whiteSpace = 'pre-wrap';
+            pre.textContent = data.markdown;
+            slot.replaceChildren(pre);
+        }
+        slot.style.minHeight = '';
+        this.rendered.add(page);
+    }
+
+    // 远离可见区域的页面换回等高的空占位，DOM大小不随文档增长
+    unload(page) {
+        const slot = this.slots.get(page);
+        if (!slot || !this.rendered.has(page)) {
+            return;
+        }
+        slot.style.minHeight = `${slot.offsetHeight}px`;
+        slot.innerHTML = '';
+        this.rendered.delete(page);
+    }
+
+    // 切换预览/源码：重新渲染当前已渲染的页面
+    setMode(mode) {
+        this.mode = mode;
+        const pages = [...this.rendered];
+        pages.forEach(page => {
+            this.rendered.delete(page);
+            this.render(page);
+        });
+    }
+
+    destroy() {
+        this.destroyed = true;
+        this.loadObserver.disconnect();
+        this.unloadObserver.disconnect();
+        clearTimeout(this.fetchTimer);
+    }
+}
+
 // 预览相关功能
 class PreviewManager {
     constructor() {
@@ -26,6 +172,10 @@ class PreviewManager {
         if (resultContent) {
             // 使用MutationObserver监听DOM变化
             const observer = new MutationObserver((mutations) => {
+                // 分页预览在渲染每页时自行高亮，不扫描整个结果区
+                if (this.paged) {
+                    return;
+                }
                 mutations.forEach((mutation) => {
                     if (mutation.type === 'childList' || mutation.type === 'characterData') {
                         this.updateCodeHighlighting();
@@ -131,8 +281,95 @@ class PreviewManager {
         URL.revokeObjectURL(url);
     }
 
+    // 开始流式预览：按页码顺序为每页预留位置
+    startStream(pages) {
+        const resultContent = document.getElementById('resultContent');
+        if (!resultContent) {
+            return;
+        }
+        resultContent.innerHTML = '';
+        resultContent.classList.add('preview-mode');
+        this.streamPages = new Map();
+        this.streamDirty = new Set();
+        pages.forEach(page => {
+            const element = document.createElement('div');
+            element.className = 'stream-page text-muted mb-3';
+            element.dataset.page = page;
+            element.innerHTML = `<small>第 ${page} 页处理中...</small>`;
+            resultContent.appendChild(element);
+            this.streamPages.set(page, { element: element, text: '', done: false });
+        });
+    }
+
+    // 追加一页的增量Markdown；reset 为 true 时替换该页已有内容
+    appendStreamDelta(page, text, reset = false) {
+        const state = this.streamPages && this.streamPages.get(page);
+        if (!state || state.done) {
+            return;
+        }
+        state.text = reset ? text : state.text + text;
+        this.scheduleStreamRender(page);
+    }
+
+    // 一页处理完成，以最终结果替换
+    finishStreamPage(page, content) {
+        const state = this.streamPages && this.streamPages.get(page);
+        if (!state) {
+            return;
+        }
+        state.text = content;
+        state.done = true;
+        this.scheduleStreamRender(page);
+    }
+
+    // 每帧最多渲染一次，只重新渲染有变化的页面
+    scheduleStreamRender(page) {
+        this.streamDirty.add(page);
+        if (this.streamFrame) {
+            return;
+        }
+        this.streamFrame = requestAnimationFrame(() => {
+            this.streamFrame = null;
+            this.streamDirty.forEach(dirty => {
+                const state = this.streamPages.get(dirty);
+                state.element.innerHTML = this.formatMarkdown(state.text);
+                state.element.classList.toggle('text-muted', !state.done);
+            });
+            this.streamDirty.clear();
+        });
+    }
+
+    // 结束流式预览
+    endStream() {
+        if (this.streamFrame) {
+            cancelAnimationFrame(this.streamFrame);
+            this.streamFrame = null;
+        }
+        this.streamPages = null;
+    }
+
+    // 以分页方式显示结果：只获取页索引，页面内容滚动到附近时再加载
+    async showPaged(fileId, mode = 'preview') {
+        const resultContent = document.getElementById('resultContent');
+        if (!resultContent) {
+            return;
+        }
+        this.closePaged();
+        const index = await API.getResultIndex(fileId);
+        resultContent.classList.toggle('preview-mode', mode === 'preview');
+        this.paged = new PagedPreview(resultContent, fileId, index.pages, mode);
+    }
+
+    closePaged() {
+        if (this.paged) {
+            this.paged.destroy();
+            this.paged = null;
+        }
+    }
+
     // 清理预览内容
     clearPreview() {
+        this.closePaged();
         const resultContent = document.getElementById('resultContent');
         if (resultContent) {
             resultContent.innerHTML = '';
@@ -61,6 +61,8 @@ class FileUploader {
     }
 
     initEventListeners() {
+        this.loadSchemas();
+
         // 选择文件按钮
         if (selectFileBtn) {
             selectFileBtn.addEventListener('click', () => {
@@ -87,6 +89,14 @@ class FileUploader {
             // 用户可以通过按钮点击或拖拽来选择文件
         }
 
+        // 处理选项变化时重新预估
+        ['textLayerMode', 'concurrency', 'maintainFormat', 'selectPages'].forEach(id => {
+            const element = document.getElementById(id);
+            if (element) {
+                element.addEventListener('change', () => this.updateEstimates());
+            }
+        });
+
         // 移除文件按钮
         if (removeFileBtn) {
             removeFileBtn.addEventListener('click', this.removeFile.bind(this));
@@ -113,7 +123,8 @@ class FileUploader {
             Utils.showLoading('上传文件', '正在上传文件到服务器...');
             Utils.updateProgress(30);
             
-            const uploadResult = await API.uploadFile(file);
+            const selectedModel = document.querySelector('input[name="modelSelect"]:checked');
+            const uploadResult = await API.uploadFile(file, selectedModel ? selectedModel.value : null);
             
             Utils.updateProgress(100);
             setTimeout(() => {
@@ -126,6 +137,9 @@ class FileUploader {
                 originalFile: file
             };
 
+            this.showPagePicker(uploadResult.file.page_count);
+            this.updateEstimates();
+
             // 启用处理按钮
             this.enableProcessButton();
 
@@ -183,9 +197,92 @@ class FileUploader {
         }
     }
 
+    // 显示页数和页码选择（页数未知时不显示）
+    showPagePicker(pageCount) {
+        const pagePicker = document.getElementById('pagePicker');
+        const filePageCount = document.getElementById('filePageCount');
+        const selectPages = document.getElementById('selectPages');
+        if (!pagePicker || !filePageCount || !selectPages) {
+            return;
+        }
+        selectPages.value = '';
+        if (pageCount) {
+            filePageCount.textContent = pageCount;
+            pagePicker.style.display = 'block';
+        } else {
+            pagePicker.style.display = 'none';
+        }
+    }
+
+    // 解析页码选择，如 "1-3,5"；留空返回null（处理全部页面），格式错误或超出页数时抛出异常
+    parsePageSelection(text, pageCount) {
+        if (!text || !text.trim()) {
+            return null;
+        }
+        const pages = new Set();
+        for (const part of text.split(/[,，]/)) {
+            const match = part.trim().match(/^(\d+)(?:\s*-\s*(\d+))?$/);
+            if (!match) {
+                throw new Error(`无法识别的页码: ${part.trim()}`);
+            }
+            const start = parseInt(match[1]);
+            const end = match[2] ? parseInt(match[2]) : start;
+            if (start < 1 || end < start || (pageCount && end > pageCount)) {
+                throw new Error(`页码超出范围: ${part.trim()}（共 ${pageCount} 页）`);
+            }
+            for (let page = start; page <= end; page++) {
+                pages.add(page);
+            }
+        }
+        return [...pages].sort((a, b) => a - b);
+    }
+
+    // 在模型选择旁显示预估耗时和Token（只支持PDF和图片）
+    async updateEstimates() {
+        const labels = document.querySelectorAll('.model-estimate');
+        if (!this.currentFile || !this.currentFile.page_count) {
+            labels.forEach(label => { label.textContent = ''; });
+            return;
+        }
+
+        const options = this.getProcessingOptions();
+        const selectPages = document.getElementById('selectPages');
+        try {
+            const pages = this.parsePageSelection(selectPages ? selectPages.value : '', this.currentFile.page_count);
+            if (pages) {
+                options.select_pages = pages;
+            }
+        } catch (error) {
+            // 页码有误时按全部页面预估，开始处理时再提示
+        }
+
+        try {
+            const fileId = this.currentFile.id;
+            const data = await API.estimateFile(fileId, options);
+            if (!this.currentFile || this.currentFile.id !== fileId) {
+                return;
+            }
+            labels.forEach(label => {
+                const estimate = data.estimates[label.dataset.model];
+                if (!estimate) {
+                    label.textContent = '';
+                    return;
+                }
+                const tokens = estimate.input_tokens + estimate.output_tokens;
+                label.textContent = `预计 ${Utils.formatTime(estimate.seconds_fast)}-${Utils.formatTime(estimate.seconds)}，` +
+                    `约 ${tokens.toLocaleString()} Token，${estimate.api_calls} 次调用`;
+                label.title = estimate.history_samples ? `基于最近 ${estimate.history_samples} 页的统计` : '暂无历史数据，按默认值估算';
+            });
+        } catch (error) {
+            labels.forEach(label => { label.textContent = ''; });
+        }
+    }
+
     // 移除文件
     removeFile() {
         this.currentFile = null;
+        this.showPagePicker(null);
+        this.updateEstimates();
 
         // 隐藏文件信息
         if (fileInfo) {
@@ -281,6 +378,21 @@ class FileUploader {
         // 获取高级选项
         const options = this.getProcessingOptions();
 
+        // 结果按页加载，响应中不返回全文
+        options.inline_content = false;
+
+        // 页码选择
+        const selectPages = document.getElementById('selectPages');
+        try {
+            const pages = this.parsePageSelection(selectPages ? selectPages.value : '', this.currentFile.page_count);
+            if (pages) {
+                options.select_pages = pages;
+            }
+        } catch (error) {
+            Utils.showToast('页码错误', error.message, 'error');
+            return;
+        }
+
         try {
             // 设置处理状态
             isProcessing = true;
@@ -298,11 +410,27 @@ class FileUploader {
                 }
             }, 2000);
             
-            const result = await API.processFile(
-                this.currentFile.id,
-                selectedModel.value,
-                options
-            );
+            // 部分页面失败时已完成的页面已保存，可以只续跑失败的页面
+            const fileId = this.currentFile.id;
+            let request = () => API.processFileStream(fileId, selectedModel.value, options,
+                event => this.handleStreamEvent(event));
+            let result;
+            while (!result) {
+                try {
+                    result = await request();
+                } catch (error) {
+                    const failed = error.data && error.data.resumable ? error.data.failed_pages : null;
+                    if (!failed || !confirm(`${failed.length} 页处理失败，已完成的页面已保存。是否续跑失败的页面？`)) {
+                        clearInterval(progressInterval);
+                        throw error;
+                    }
+                    Utils.showLoading('OCR处理中', '正在续跑失败的页面...');
+                    request = () => API.resumeFile(fileId);
+                }
+            }
+            if (window.previewManager) {
+                window.previewManager.endStream();
+            }
 
             clearInterval(progressInterval);
             Utils.updateProgress(100);
@@ -324,6 +452,53 @@ class FileUploader {
         }
     }
 
+    // 处理流式事件：开始后关闭加载框，在结果区按页码顺序逐页显示
+    handleStreamEvent(event) {
+        const preview = window.previewManager;
+        if (!preview) {
+            return;
+        }
+        if (event.type === 'start') {
+            Utils.hideLoading();
+            const initialState = document.getElementById('initialState');
+            const processingState = document.getElementById('processingState');
+            const resultState = document.getElementById('resultState');
+            if (initialState) initialState.style.display = 'none';
+            if (processingState) processingState.style.display = 'none';
+            if (resultState) resultState.style.display = 'block';
+            this.streamDone = 0;
+            this.streamTotal = event.pages.length;
+            preview.startStream(event.pages);
+        } else if (event.type === 'delta') {
+            preview.appendStreamDelta(event.page, event.text, event.reset);
+        } else if (event.type === 'page') {
+            preview.finishStreamPage(event.page, event.content);
+            this.streamDone += 1;
+            const pageCount = document.getElementById('pageCount');
+            if (pageCount) {
+                pageCount.textContent = `${this.streamDone}/${this.streamTotal}`;
+            }
+        }
+    }
+
+    // 加载已保存的结构化提取Schema
+    async loadSchemas() {
+        const select = document.getElementById('extractionSchema');
+        if (!select) return;
+        try {
+            const data = await API.getSchemas();
+            data.schemas.forEach(schema => {
+                const option = document.createElement('option');
+                option.value = schema.name;
+                option.textContent = `${schema.title}（${schema.fields.length} 个字段）`;
+                option.title = schema.description;
+                select.appendChild(option);
+            });
+        } catch (error) {
+            console.warn('加载Schema失败:', error);
+        }
+    }
+
     // 获取处理选项
     getProcessingOptions() {
         const options = {};
@@ -334,12 +509,36 @@ class FileUploader {
             options.maintain_format = maintainFormat.checked;
         }
 
+        // 按页面复杂度路由模型
+        const modelRouting = document.getElementById('modelRouting');
+        if (modelRouting) {
+            options.routing = modelRouting.checked;
+        }
+
         // 并发数
         const concurrency = document.getElementById('concurrency');
         if (concurrency) {
             options.concurrency = parseInt(concurrency.value);
         }
 
+        // 文本层快速通道
+        const textLayerMode = document.getElementById('textLayerMode');
+        if (textLayerMode) {
+            options.text_layer = textLayerMode.value;
+        }
+
+        // 优先级通道
+        const priorityLane = document.getElementById('priorityLane');
+        if (priorityLane) {
+            options.priority = priorityLane.value;
+        }
+
+        // 结构化提取
+        const extractionSchema = document.getElementById('extractionSchema');
+        if (extractionSchema && extractionSchema.value) {
+            options.schema = extractionSchema.value;
+        }
+
         // 自定义提示
         const customPrompt = document.getElementById('customPrompt');
         if (customPrompt && customPrompt.value.trim()) {
@@ -378,8 +577,26 @@ class FileUploader {
         // 更新统计信息
         this.updateStatistics(result);
 
-        // 显示结果内容
-        this.displayResultContent(result.content);
+        // 显示结果内容：结构化提取显示字段表；未返回全文时按页加载，只渲染可见区域附近的页面
+        if (result.extraction) {
+            if (window.previewManager) {
+                window.previewManager.closePaged();
+            }
+            this.displayExtraction(result.extraction);
+        } else if (result.content === null || result.content === undefined) {
+            const resultContent = document.getElementById('resultContent');
+            if (resultContent) {
+                resultContent.style.setProperty('background-color', '#ffffff', 'important');
+            }
+            window.previewManager.showPaged(this.currentFile.id).catch(error => {
+                Utils.showToast('加载结果失败', error.message, 'error');
+            });
+        } else {
+            if (window.previewManager) {
+                window.previewManager.closePaged();
+            }
+            this.displayResultContent(result.content);
+        }
 
         // 设置结果状态
         const initialState = document.getElementById('initialState');
@@ -406,15 +623,54 @@ class FileUploader {
         }
         if (inputTokens) {
             inputTokens.textContent = result.input_tokens.toLocaleString();
+            // 预处理前后的图像Token估算
+            const pre = result.preprocessing;
+            inputTokens.title = pre
+                ? `图像Token估算: ${pre.input_tokens_before.toLocaleString()} → ${pre.input_tokens_after.toLocaleString()}`
+                : '';
         }
         if (outputTokens) {
             outputTokens.textContent = result.output_tokens.toLocaleString();
         }
         if (pageCount) {
             pageCount.textContent = result.pages;
+            // 跳过的空白页/重复页
+            const skipped = result.skipped;
+            pageCount.title = skipped
+                ? `模型调用: ${result.api_calls} 次，跳过空白页 ${skipped.blank.length} 页、重复页 ${Object.keys(skipped.duplicate).length} 页`
+                : '';
         }
     }
 
+    // 显示结构化提取结果：字段、值、来源页码，以及与 Markdown 模式的单页对比
+    displayExtraction(extraction) {
+        const resultContent = document.getElementById('resultContent');
+        if (!resultContent) return;
+        const escape = value => String(value).replace(/[&<>"]/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c]));
+        const rows = Object.entries(extraction.fields).map(([name, value]) => {
+            const source = extraction.pages[name];
+            const pages = Array.isArray(source) ? [...new Set(source)].join(', ') : (source || '');
+            const shown = value === null ? '<span class="text-muted">未找到</span>'
+                : escape(typeof value === 'object' ? JSON.stringify(value, null, 1) : value);
+            return `<tr><th>${escape(name)}</th><td class="extraction-value">${shown}</td><td>${pages}</td></tr>`;
+        }).join('');
+
+        let summary = extraction.valid
+            ? '<div class="alert alert-success py-2">校验通过</div>'
+            : `<div class="alert alert-warning py-2">${[...extraction.errors, ...Object.entries(extraction.page_errors).map(([page, error]) => `第 ${page} 页: ${error}`)].map(escape).join('<br>')}</div>`;
+        const comparison = extraction.comparison;
+        if (comparison && comparison.markdown) {
+            const current = comparison.extraction;
+            summary += `<p class="text-muted small">单页输出Token ${Math.round(current.output_tokens)}（Markdown 模式 ${Math.round(comparison.markdown.output_tokens)}），`
+                + `单页中位延迟 ${current.p50_latency.toFixed(1)}s（Markdown 模式 ${comparison.markdown.p50_latency.toFixed(1)}s）</p>`;
+        }
+
+        resultContent.innerHTML = `${summary}<table class="table table-sm extraction-table">`
+            + `<thead><tr><th>字段</th><th>值</th><th>页码</th></tr></thead><tbody>${rows}</tbody></table>`;
+        resultContent.classList.add('preview-mode');
+        resultContent.style.setProperty('background-color', '#ffffff', 'important');
+    }
+
     // 显示结果内容
     displayResultContent(content) {
         const resultContent = document.getElementById('resultContent');
@@ -543,6 +799,11 @@ class FileUploader {
         if (downloadBtn) {
             downloadBtn.onclick = () => {
                 if (currentResult && this.currentFile) {
+                    if (currentResult.content === null || currentResult.content === undefined) {
+                        // 分页结果直接从服务端下载，不在浏览器中拼接全文
+                        window.location.href = `/api/download/${encodeURIComponent(this.currentFile.id)}`;
+                        return;
+                    }
                     const filename = `${this.currentFile.original_name.replace(/\.[^/.]+$/, '')}_ocr_result.md`;
                     Utils.downloadFile(currentResult.content, filename);
                 }
@@ -552,10 +813,16 @@ class FileUploader {
         // 复制按钮
         const copyBtn = document.getElementById('copyBtn');
         if (copyBtn) {
-            copyBtn.onclick = () => {
-                if (currentResult) {
-                    Utils.copyToClipboard(currentResult.content);
+            copyBtn.onclick = async () => {
+                if (!currentResult) {
+                    return;
+                }
+                let content = currentResult.content;
+                if (content === null || content === undefined) {
+                    const response = await fetch(`/api/download/${encodeURIComponent(this.currentFile.id)}`);
+                    content = await response.text();
                 }
+                Utils.copyToClipboard(content);
             };
         }
 
@@ -565,6 +832,9 @@ class FileUploader {
             clearBtn.onclick = () => {
                 this.removeFile();
                 currentResult = null;
+                if (window.previewManager) {
+                    window.previewManager.closePaged();
+                }
             };
         }
 
@@ -575,7 +845,11 @@ class FileUploader {
 
         if (previewBtn && sourceBtn && resultContent) {
             previewBtn.onclick = () => {
-                if (currentResult) {
+                const paged = window.previewManager && window.previewManager.paged;
+                if (paged) {
+                    resultContent.classList.add('preview-mode');
+                    paged.setMode('preview');
+                } else if (currentResult) {
                     // 检查内容格式
                     if (currentResult.content.trim().startsWith('<')) {
                         resultContent.innerHTML = currentResult.content;
@@ -637,7 +911,11 @@ class FileUploader {
             };
 
             sourceBtn.onclick = () => {
-                if (currentResult) {
+                const paged = window.previewManager && window.previewManager.paged;
+                if (paged) {
+                    resultContent.classList.remove('preview-mode');
+                    paged.setMode('source');
+                } else if (currentResult) {
                     resultContent.textContent = currentResult.content;
                     resultContent.classList.remove('preview-mode');
                     resultContent.style.color = '#212529';
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+处理进度的流式推送
+流水线在事件循环线程中产生事件（开始、每页增量Markdown、每页完成、最终结果），
+Web请求线程以 Server-Sent Events 转发给浏览器
+"""
+
+import json
+import queue
+
+# 没有事件时发送心跳的间隔（秒），避免代理断开空闲连接
+HEARTBEAT_INTERVAL = 15
+
+# 单次最多合并的事件数
+MAX_BATCH = 500
+
+_CLOSED = object()
+
+
+class EventStream:
+    """线程安全的事件队列；emit 可直接作为流水线的 on_event 回调"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def emit(self, event):
+        self._queue.put(event)
+
+    def close(self):
+        self._queue.put(_CLOSED)
+
+    def _drain(self, first):
+        """取出已积压的事件，把同一页连续的增量合并为一个，减少推送次数"""
+        batch, closed = [first], False
+        while len(batch) < MAX_BATCH:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is _CLOSED:
+                closed = True
+                break
+            batch.append(event)
+
+        merged = []
+        for event in batch:
+            last = merged[-1] if merged else None
+            if (event.get('type') == 'delta' and last and last.get('type') == 'delta'
+                    and last['page'] == event['page'] and not event.get('reset')):
+                last['text'] += event['text']
+            else:
+                merged.append(dict(event))
+        return merged, closed
+
+    def iter_sse(self, heartbeat=HEARTBEAT_INTERVAL):
+        """按 SSE 格式逐条输出事件，直到 close()"""
+        while True:
+            try:
+                first = self._queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            if first is _CLOSED:
+                return
+            events, closed = self._drain(first)
+            yield ''.join(f'data: {json.dumps(e, ensure_ascii=False)}\n\n' for e in events)
+            if closed:
+                return
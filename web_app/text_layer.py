@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+PDF文本层快速通道
+对数字生成的PDF逐页评估文本层的覆盖率和质量：
+简单页面在本地直接转换为Markdown，表格类页面以纯文本提示交给模型，
+扫描件或文本层不可用的页面仍走视觉模型
+"""
+
+import re
+from dataclasses import dataclass
+
+from preprocess import estimate_image_tokens, BASELINE_HEIGHT
+
+# 文本层可用的最少字符数
+MIN_CHARS = 200
+
+# 可读字符（字母、数字、常用标点）占非空白字符的最低比例
+MIN_READABLE_RATIO = 0.85
+
+# 超长“单词”（缺少空格的抽取结果）占比超过该值视为文本层质量差
+MAX_LONG_WORD_RATIO = 0.05
+LONG_WORD = 20
+
+# 含金额/日期/百分比或多个数字字段的行占比超过该值视为表格类页面
+TABULAR_LINE_RATIO = 0.15
+
+# 单张图像覆盖页面面积（按72DPI估算）超过该比例视为扫描件
+SCAN_IMAGE_COVERAGE = 0.6
+
+# 处理方式
+ROUTE_LOCAL = 'local'
+ROUTE_TEXT = 'text'
+ROUTE_VISION = 'vision'
+
+TEXT_PROMPT = (
+    "The following text was extracted from the text layer of one PDF page. "
+    "Line breaks and column order may be imperfect. Convert it to markdown following the rules above, "
+    "reconstructing tables as HTML where the text is tabular. Do not add content that is not in the text."
+)
+
+_BULLET = re.compile(r'^\s*[•▪◦●■\-\*]\s+')
+_PAGE_NUMBER = re.compile(r'^\s*(?:page\s+)?\d+\s*(?:of|/)\s*\d+\s*$', re.IGNORECASE)
+_NUMERIC_FIELD = re.compile(r'\d[\d,]*(?:\.\d+)?')
+_AMOUNT = re.compile(r'\$\s?\d[\d,]*(?:\.\d+)?|\d+(?:\.\d+)?%|\b\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4}\b')
+_DOT_LEADER = re.compile(r'(?:\.\s?){6,}')
+_READABLE = re.compile(r'[\w.,;:!?()\[\]%$&@#\'"/\-+*=<>…–—’‘“”]')
+
+
+@dataclass
+class TextLayerPage:
+    """单页文本层评估结果"""
+    page: int
+    text: str
+    chars: int
+    readable_ratio: float
+    long_word_ratio: float
+    tabular: bool
+    scanned: bool
+    route: str
+    # 页面尺寸（磅）
+    width: float = 0.0
+    height: float = 0.0
+
+
+def _page_images(page):
+    """返回页面上图像的像素尺寸列表"""
+    resources = page.get('/Resources')
+    resources = resources.get_object() if resources else {}
+    xobjects = resources.get('/XObject')
+    xobjects = xobjects.get_object() if xobjects else {}
+    sizes = []
+    for ref in xobjects.values():
+        obj = ref.get_object()
+        if obj.get('/Subtype') == '/Image':
+            sizes.append((int(obj.get('/Width', 0)), int(obj.get('/Height', 0))))
+    return sizes
+
+
+def _looks_scanned(page):
+    """页面上有一张接近整页的大图时，多半是扫描件（文本层可能来自不可靠的OCR）"""
+    page_area = float(page.mediabox.width) * float(page.mediabox.height)
+    return any(w * h >= page_area * SCAN_IMAGE_COVERAGE for w, h in _page_images(page))
+
+
+def _is_tabular(lines):
+    """金额、日期较多或有目录式点引导线的页面，本地转换会丢失表格结构"""
+    if not lines:
+        return False
+    if any(_DOT_LEADER.search(line) for line in lines):
+        return True
+    numeric = sum(1 for line in lines
+                  if _AMOUNT.search(line) or len(_NUMERIC_FIELD.findall(line)) >= 3)
+    return numeric / len(lines) > TABULAR_LINE_RATIO
+
+
+def measure_page(page, page_number):
+    """抽取单页文本层并评估质量（不依赖模型）"""
+    text = page.extract_text() or ''
+    compact = re.sub(r'\s+', '', text)
+    chars = len(compact)
+    readable = len(_READABLE.findall(compact)) / chars if chars else 0.0
+    words = text.split()
+    long_words = sum(1 for w in words if len(w) > LONG_WORD) / len(words) if words else 0.0
+    lines = [line for line in text.splitlines() if line.strip()]
+    return TextLayerPage(page=page_number, text=text, chars=chars, readable_ratio=readable,
+                         long_word_ratio=long_words, tabular=_is_tabular(lines),
+                         scanned=_looks_scanned(page), route=ROUTE_VISION,
+                         width=float(page.mediabox.width), height=float(page.mediabox.height))
+
+
+def choose_route(info, model_id, allow_local=True):
+    """按文本层质量和模型的图像计费选择处理方式"""
+    usable = (info.chars >= MIN_CHARS and info.readable_ratio >= MIN_READABLE_RATIO
+              and info.long_word_ratio <= MAX_LONG_WORD_RATIO and not info.scanned)
+    if not usable:
+        return ROUTE_VISION
+    if allow_local and not info.tabular:
+        return ROUTE_LOCAL
+    # 只有文本提示比图像更省Token时才改走文本（Gemini 每张图固定计费，长文本反而更贵）
+    width = int(BASELINE_HEIGHT * info.width / info.height)
+    if len(info.text) // 4 < estimate_image_tokens(width, BASELINE_HEIGHT, model_id):
+        return ROUTE_TEXT
+    return ROUTE_VISION
+
+
+def analyse_page(page, page_number, model_id, allow_local=True):
+    """评估单页文本层并选择处理方式"""
+    info = measure_page(page, page_number)
+    info.route = choose_route(info, model_id, allow_local)
+    return info
+
+
+def analyse_pdf(file_path, page_numbers, model_id, mode='hybrid'):
+    """评估所选页面的文本层，返回 {页码: TextLayerPage}"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file_path)
+    results = {}
+    for number in page_numbers:
+        try:
+            results[number] = analyse_page(reader.pages[number - 1], number, model_id,
+                                           allow_local=(mode == 'hybrid'))
+        except Exception:
+            # 个别页面解析失败时退回视觉模型
+            continue
+    return results
+
+
+def text_to_markdown(text):
+    """把文本层转换为Markdown：识别列表、全大写标题和页码，合并折行段落"""
+    blocks, paragraph = [], []
+
+    def flush():
+        if paragraph:
+            blocks.append(' '.join(paragraph))
+            paragraph.clear()
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            flush()
+        elif _PAGE_NUMBER.match(line):
+            flush()
+            blocks.append(f'<page_number>{line}<page_number>')
+        elif _BULLET.match(line):
+            flush()
+            blocks.append('- ' + _BULLET.sub('', line))
+        elif line.isupper() and len(line) <= 60 and any(c.isalpha() for c in line):
+            flush()
+            blocks.append('## ' + line)
+        else:
+            paragraph.append(line)
+            # 以句末标点结束的行视为段落结尾
+            if line.endswith(('.', ':', '!', '?')):
+                flush()
+    flush()
+
+    # 连续的列表项之间不留空行
+    output = []
+    for block in blocks:
+        if output and block.startswith('- ') and output[-1].startswith('- '):
+            output[-1] += '\n' + block
+        else:
+            output.append(block)
+    return '\n\n'.join(output)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+OCR引擎的延迟加载与后台预热
+litellm（及 zerox）连同各供应商模块导入需要数秒，Web进程启动时不加载，首次处理时再导入；
+可选在启动后由后台线程预先导入。就绪检查分别报告“可以响应请求”和“OCR引擎已加载”
+"""
+
+import os
+import sys
+import time
+import threading
+
+# 启动后开始预热前的等待（秒），让服务先开始监听
+WARMUP_DELAY = 1.0
+
+# 设置为 1 时启动后在后台预热（也可在 config.json 的 startup.warmup 中开启）
+WARMUP_ENV = 'ZEROX_WARMUP'
+
+# 进程启动（本模块被导入）的时间
+STARTED_AT = time.time()
+
+
+class EngineLoader:
+    """导入OCR引擎并记录状态；状态为 cold、loading、loaded 或 failed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = 'cold'
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.warmup = False
+
+    def load(self):
+        """导入 litellm 和 zerox（可重复调用，只导入一次）；返回是否成功"""
+        with self._lock:
+            if self.state == 'loaded':
+                return True
+            self.state = 'loading'
+            started = time.monotonic()
+            try:
+                import litellm  # noqa: F401
+            except Exception as e:
+                self.state, self.error = 'failed', str(e)
+                print(f"⚠️  OCR引擎加载失败: {e}")
+                return False
+            try:
+                # zerox 只用于页级流水线以外的格式，未安装时不影响其他处理
+                import pyzerox.core.zerox  # noqa: F401
+            except ImportError:
+                pass
+            self.load_seconds = time.monotonic() - started
+            self.loaded_at = time.time()
+            self.state, self.error = 'loaded', None
+            return True
+
+    @property
+    def loaded(self):
+        # 直接调用 litellm 的代码路径也会导入它
+        return self.state == 'loaded' or 'litellm' in sys.modules
+
+    def start_warmup(self, delay=WARMUP_DELAY):
+        """启动后台预热线程"""
+        self.warmup = True
+
+        def run():
+            time.sleep(delay)
+            self.load()
+
+        threading.Thread(target=run, name='engine-warmup', daemon=True).start()
+
+    def status(self):
+        return {
+            'state': 'loaded' if self.loaded else self.state,
+            'loaded': self.loaded,
+            'load_seconds': self.load_seconds,
+            'loaded_after': self.loaded_at - STARTED_AT if self.loaded_at else None,
+            'warmup': self.warmup,
+            'error': self.error,
+        }
+
+
+engine = EngineLoader()
+
+
+def warmup_enabled(startup_config):
+    """按环境变量或 config.json 的 startup.warmup 决定是否在启动后预热"""
+    value = os.environ.get(WARMUP_ENV)
+    if value is not None:
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(startup_config.get('warmup', False))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+任务队列工作进程
+从共享队列领取任务并执行，处理期间定期续期租约；可以嵌入Web应用（后台线程）或单独运行：
+
+    python web_app/worker.py --queue redis://127.0.0.1:6379/0 --threads 2
+"""
+
+import os
+import sys
+import socket
+import argparse
+import threading
+import traceback
+
+# 添加Zerox OCR包到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'zerox', 'py_zerox'))
+
+from settings import apply_config_to_env
+from ocr_pipeline import PipelineError
+from jobs import JobError, execute
+from job_queue import create_queue, DEFAULT_QUEUE_URL
+
+# 队列为空时的轮询间隔（秒）
+POLL_INTERVAL = 2.0
+
+
+def default_worker_id(index=0):
+    """主机名 + 进程号 + 线程序号，跨节点唯一"""
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+class QueueWorker:
+    """单个工作线程：一次处理一个任务"""
+
+    def __init__(self, queue, worker_id=None, poll_interval=POLL_INTERVAL, visibility_timeout=None):
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout or queue.visibility_timeout
+
+    def _keep_alive(self, job_id, done):
+        """每隔三分之一可见性超时续期一次租约"""
+        while not done.wait(self.visibility_timeout / 3):
+            if not self.queue.heartbeat(job_id, self.worker_id, self.visibility_timeout):
+                print(f"⚠️  任务 {job_id} 的租约已失效，结果将不会写回")
+                return
+
+    def process(self, job):
+        done = threading.Event()
+        keeper = threading.Thread(target=self._keep_alive, args=(job.id, done), daemon=True)
+        keeper.start()
+        try:
+            result = execute(job.payload, attempt=job.attempts, job_id=job.id)
+        except JobError as e:
+            # 参数或配置错误重试也不会成功；找不到上传文件等环境问题重新排队，超过最大尝试次数后失败
+            self.queue.fail(job.id, self.worker_id, str(e), retry=e.retryable)
+        except PipelineError as e:
+            # 部分页面失败，已完成的页面保存在断点中，重试时只续跑失败的页面
+            self.queue.fail(job.id, self.worker_id, str(e), retry=True)
+        except Exception as e:
+            traceback.print_exc()
+            self.queue.fail(job.id, self.worker_id, f'{type(e).__name__}: {e}', retry=True)
+        else:
+            self.queue.complete(job.id, self.worker_id, result)
+        finally:
+            done.set()
+
+    def run_once(self):
+        """领取并处理一个任务；队列为空时返回False"""
+        job = self.queue.lease(self.worker_id, self.visibility_timeout)
+        if job is None:
+            return False
+        self.process(job)
+        return True
+
+    def run_forever(self, stop=None):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                if not self.run_once():
+                    stop.wait(self.poll_interval)
+            except Exception:
+                # 队列后端暂时不可用时等待后重试，不退出工作线程
+                traceback.print_exc()
+                stop.wait(self.poll_interval)
+
+
+def start_workers(queue, count, stop=None, **kwargs):
+    """启动 count 个后台工作线程"""
+    threads = []
+    for index in range(count):
+        worker = QueueWorker(queue, worker_id=default_worker_id(index), **kwargs)
+        thread = threading.Thread(target=worker.run_forever, args=(stop,),
+                                  name=f'queue-worker-{index}', daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Zerox OCR 任务队列工作进程')
+    parser.add_argument('--queue', help='队列URL，默认读取 ZEROX_QUEUE_URL 或使用输出目录中的 jobs.db')
+    parser.add_argument('--threads', type=int, default=1, help='工作线程数')
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL, help='队列为空时的轮询间隔（秒）')
+    parser.add_argument('--visibility-timeout', type=float, help='租约可见性超时（秒）')
+    args = parser.parse_args()
+
+    apply_config_to_env()
+    queue_url = args.queue or os.environ.get('ZEROX_QUEUE_URL') or DEFAULT_QUEUE_URL
+    queue = create_queue(queue_url)
+    stop = threading.Event()
+    threads = start_workers(queue, args.threads, stop, poll_interval=args.poll_interval,
+                            visibility_timeout=args.visibility_timeout)
+    print(f"🚀 工作进程已启动: {args.threads} 个线程, 队列 {queue_url}")
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(1)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+if __name__ == '__main__':
+    main()